@@ -1,10 +1,23 @@
 """Backend Server Exists here"""
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from routers import chat, screenshot, game_detection, settings
+from routers import chat, screenshot, game_detection, settings, health, metrics
+from services.container import container
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bind immediately and build heavy services (embedding model, Chroma, Gemini) in the background."""
+    if os.getenv('PIXLY_WARMUP', '1') != '0':
+        container.warmup(['screenshot_capture', 'llm_backend', 'vector_service'])
+    yield
+    container.shutdown()
 
+app = FastAPI(lifespan=lifespan)
+
+app.include_router(health.router, tags=["Health"])
+app.include_router(metrics.router, tags=["Metrics"])
 app.include_router(chat.router, tags=["Chat"])
 app.include_router(screenshot.router, prefix="/screenshots", tags=["Screenshots"])
 app.include_router(game_detection.router, prefix="/games", tags=["Game Detection"])
-app.include_router(settings.router, prefix="/settings", tags=["Settings"])
\ No newline at end of file
+app.include_router(settings.router, prefix="/settings", tags=["Settings"])
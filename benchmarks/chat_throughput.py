@@ -0,0 +1,131 @@
+"""
+End-to-end throughput benchmark for /chat and /chat/stream using the offline fake LLM backend.
+
+Serves the FastAPI app with uvicorn on a free localhost port (no external network
+and no API key needed), so it can run on a CI box:
+
+    uv run python benchmarks/chat_throughput.py --requests 200 --concurrency 16
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import socket
+import statistics
+import threading
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values (nearest rank)."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_chat(client, total, concurrency):
+    """Send total /chat requests with at most concurrency in flight; return per-request latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/chat", json={"message": f"benchmark question {i}"})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200 or response.json()["response"].startswith("Error"):
+                errors += 1
+
+    await asyncio.gather(*[one(i) for i in range(total)])
+    return latencies, errors
+
+
+async def run_stream(client, total, concurrency):
+    """Send total /chat/stream requests; return (time-to-first-chunk, total) latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    first_chunk, latencies = [], []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            async with client.stream("POST", "/chat/stream", json={"message": f"benchmark stream {i}"}) as response:
+                seen_first = False
+                async for line in response.aiter_lines():
+                    if line.startswith("data: ") and not seen_first:
+                        first_chunk.append(time.perf_counter() - start)
+                        seen_first = True
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one(i) for i in range(total)])
+    return first_chunk, latencies
+
+
+def start_server(app):
+    """Serve app with uvicorn on a free localhost port in a daemon thread; return (server, base_url)."""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def report(name, latencies, elapsed, errors=0):
+    print(f"{name}: {len(latencies)} requests in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.1f} req/s), errors={errors}")
+    print(f"  latency p50={percentile(latencies, 50) * 1000:.0f}ms "
+          f"p95={percentile(latencies, 95) * 1000:.0f}ms "
+          f"mean={statistics.mean(latencies) * 1000:.0f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake first-token latency (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="keep the response cache enabled")
+    args = parser.parse_args()
+
+    # Configure before the app (and chatbot module) are imported
+    os.environ["PIXLY_LLM_BACKEND"] = "fake"
+    os.environ["PIXLY_FAKE_LATENCY"] = str(args.latency)
+    os.environ["PIXLY_FAKE_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    os.environ["PIXLY_FAKE_FAILURE_RATE"] = str(args.failure_rate)
+    if not args.cache:
+        os.environ["PIXLY_RESPONSE_CACHE_SIZE"] = "0"
+
+    import httpx
+    from backend.backend import app
+
+    # A real server (rather than an in-process transport) so streamed chunks arrive incrementally
+    server, base_url = start_server(app)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        latencies, errors = await run_chat(client, args.requests, args.concurrency)
+        report("POST /chat", latencies, time.perf_counter() - start, errors)
+
+        start = time.perf_counter()
+        first_chunk, latencies = await run_stream(client, args.requests, args.concurrency)
+        report("POST /chat/stream", latencies, time.perf_counter() - start)
+        print(f"  time-to-first-chunk p50={percentile(first_chunk, 50) * 1000:.0f}ms "
+              f"p95={percentile(first_chunk, 95) * 1000:.0f}ms")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+"""
+Screenshot payload encryption benchmark: Fernet (the old format) vs the chunked
+AES-GCM format, for frame-sized payloads:
+
+    uv run python benchmarks/frame_crypto.py --sizes 64 512 2048 --rounds 50
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from cryptography.fernet import Fernet
+from services.frame_crypto import FrameCipher, KeyRing
+
+
+def measure(func, arg, rounds):
+    """Median seconds per call."""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 512, 2048], help="payload sizes in KB")
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--chunk-kb", type=int, default=1024)
+    args = parser.parse_args()
+
+    fernet = Fernet(Fernet.generate_key())
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ring = KeyRing.load_or_create(os.path.join(temp_dir, "keyring.json"))
+    aesgcm = FrameCipher(ring, chunk_size=args.chunk_kb * 1024)
+
+    for size_kb in args.sizes:
+        data = os.urandom(size_kb * 1024)
+        print(f"{size_kb} KB payload:")
+        for name, cipher in [("fernet", fernet), ("aes-gcm chunked", aesgcm)]:
+            token = cipher.encrypt(data)
+            encrypt = measure(cipher.encrypt, data, args.rounds)
+            decrypt = measure(cipher.decrypt, token, args.rounds)
+            mb = len(data) / 1e6
+            print(f"  {name:16s} encrypt {mb / encrypt:8.0f} MB/s  decrypt {mb / decrypt:8.0f} MB/s  "
+                  f"stored {len(token) / len(data) * 100:.1f}% of plaintext")
+
+
+if __name__ == "__main__":
+    main()
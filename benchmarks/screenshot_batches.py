@@ -0,0 +1,82 @@
+"""
+Sustained screenshot inserts per second into screenshots.db at different writer batch
+sizes (group commit) and durability levels (PRAGMA synchronous).
+
+Frames go through the capture pipeline's persist path: the real schema, triggers and
+blob store, submitted as batched writes with at most one batch waiting on the writer.
+Payloads are random bytes, pre-encrypted so only the database and blob writes are timed:
+
+    uv run python benchmarks/screenshot_batches.py --frames 2000 --frame-kb 64 --batch-sizes 1,8,32,128
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from threading import Semaphore
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from services.screenshot import ScreenshotCapture
+from services.screenshot_db import ScreenshotDatabase
+
+WINDOW = {'application': 'benchmark.exe', 'window_title': 'Benchmark', 'pid': 1}
+
+
+def run(batch_size, synchronous, frames, frame_kb):
+    """Persist frames as the pipeline does; returns (frames per second, commits)."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cwd = os.getcwd()
+        os.chdir(temp_dir)  # the capture keeps its key files in the working directory
+        db_path = os.path.join(temp_dir, "bench.db")
+        capture = ScreenshotCapture(db_path=db_path, capture_workers=0, dedup_threshold=-1)
+        # Reopen the writer with the settings under test (the schema is in place now)
+        capture.db.close()
+        capture.db = ScreenshotDatabase(db_path, synchronous=synchronous, batch_size=batch_size)
+        try:
+            start = datetime(2024, 1, 1)
+            payloads = []
+            for i in range(frames):
+                data = os.urandom(frame_kb * 1024)
+                payloads.append((data, capture._encrypt_data(data), (start + timedelta(seconds=i)).isoformat()))
+
+            slots = Semaphore(batch_size)
+            commits = capture.db.commits
+            started = time.perf_counter()
+            for data, encrypted, timestamp in payloads:
+                insert = capture._frame_insert(WINDOW, timestamp, None, img_data=data, encrypted_data=encrypted)
+                slots.acquire()
+                future = capture.db.submit(lambda conn, insert=insert: insert(conn, None), batch=True)
+                future.add_done_callback(lambda _: slots.release())
+            for _ in range(batch_size):
+                slots.acquire()
+            elapsed = time.perf_counter() - started
+            return frames / elapsed, capture.db.commits - commits
+        finally:
+            capture.close()
+            os.chdir(cwd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--frame-kb", type=int, default=64, help="payload size per frame")
+    parser.add_argument("--batch-sizes", default="1,8,32,128", help="comma-separated writer batch sizes")
+    parser.add_argument("--synchronous", default="NORMAL,FULL", help="comma-separated PRAGMA synchronous levels")
+    args = parser.parse_args()
+
+    print(f"{args.frames} frames of {args.frame_kb}KB")
+    for synchronous in args.synchronous.upper().split(','):
+        for batch_size in (int(size) for size in args.batch_sizes.split(',')):
+            fps, commits = run(batch_size, synchronous, args.frames, args.frame_kb)
+            print(f"  synchronous={synchronous:6s} batch={batch_size:>4}: {fps:8.0f} frames/s "
+                  f"({commits} commits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Screenshot database benchmark: connection-per-call (the old access pattern) vs the
+WAL writer queue with pooled read-only connections.
+
+A writer thread inserts frames while reader threads run the gallery and stats
+queries, like the capture thread and API threads do in the app:
+
+    uv run python benchmarks/screenshot_db.py --frames 500 --frame-kb 512 --readers 4
+"""
+
+import os
+import sys
+import time
+import argparse
+import sqlite3
+import statistics
+import tempfile
+import threading
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from services.screenshot_db import ScreenshotDatabase
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS screenshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        application TEXT NOT NULL,
+        window_title TEXT,
+        encrypted_data BLOB NOT NULL,
+        file_hash TEXT NOT NULL
+    )
+'''
+INSERT = '''
+    INSERT INTO screenshots (timestamp, application, window_title, encrypted_data, file_hash)
+    VALUES (?, ?, ?, ?, ?)
+'''
+RECENT = "SELECT id, timestamp, application, window_title, file_hash FROM screenshots ORDER BY timestamp DESC LIMIT 20"
+STATS = "SELECT application, COUNT(*) FROM screenshots GROUP BY application"
+BY_ID = "SELECT encrypted_data FROM screenshots WHERE id = ?"
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values (nearest rank)."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class PerCallConnections:
+    """The old pattern: open, use and close a default-pragma connection on every call."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def write(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+    def read(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        rows = conn.execute(sql, params).fetchall()
+        conn.close()
+        return rows
+
+    def close(self):
+        pass
+
+
+class WriterQueue:
+    """The new pattern: ScreenshotDatabase."""
+
+    def __init__(self, db_path):
+        self.db = ScreenshotDatabase(db_path)
+
+    def write(self, sql, params=()):
+        self.db.execute_write(sql, params)
+
+    def read(self, sql, params=()):
+        return self.db.read(sql, params)
+
+    def close(self):
+        self.db.close()
+
+
+def run(store, frames, payload, readers):
+    """Insert frames while reader threads query; return (insert seconds, read latencies, read errors)."""
+    store.write(SCHEMA)
+    done = threading.Event()
+    latencies, errors = [], []
+
+    def read_loop(worker):
+        queries = [(RECENT, ()), (STATS, ()), (BY_ID, (worker + 1,))]
+        i = 0
+        while not done.is_set():
+            sql, params = queries[i % len(queries)]
+            start = time.perf_counter()
+            try:
+                store.read(sql, params)
+                latencies.append(time.perf_counter() - start)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+            i += 1
+
+    threads = [threading.Thread(target=read_loop, args=(w,), daemon=True) for w in range(readers)]
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    for i in range(frames):
+        store.write(INSERT, (f"2025-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}", f"app{i % 5}.exe",
+                             "Benchmark", payload, f"{i:064x}"))
+    elapsed = time.perf_counter() - start
+
+    done.set()
+    for thread in threads:
+        thread.join()
+    store.close()
+    return elapsed, latencies, errors
+
+
+def report(name, frames, elapsed, latencies, errors):
+    print(f"{name}: {frames / elapsed:.0f} inserts/s ({elapsed:.2f}s for {frames} frames), "
+          f"{len(latencies)} reads, read errors={len(errors)}")
+    if latencies:
+        print(f"  read latency p50={percentile(latencies, 50) * 1000:.2f}ms "
+              f"p95={percentile(latencies, 95) * 1000:.2f}ms "
+              f"mean={statistics.mean(latencies) * 1000:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--frame-kb", type=int, default=512, help="payload size per frame")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent reader threads")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.frame_kb * 1024)
+    for name, store_class in [("per-call connections", PerCallConnections), ("writer queue + WAL", WriterQueue)]:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = store_class(os.path.join(temp_dir, "bench.db"))
+            elapsed, latencies, errors = run(store, args.frames, payload, args.readers)
+            report(name, args.frames, elapsed, latencies, errors)
+
+
+if __name__ == "__main__":
+    main()
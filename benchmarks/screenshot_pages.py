@@ -0,0 +1,93 @@
+"""
+Gallery page latency: LIMIT/OFFSET paging vs keyset pagination (get_screenshot_page)
+over a large screenshots table, near the newest frames and deep into the history.
+
+Rows are metadata only (no payloads), inserted directly:
+
+    uv run python benchmarks/screenshot_pages.py --rows 100000 --page-size 50
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from services.screenshot import ScreenshotCapture, encode_cursor
+from services.screenshot_db import epoch_ms
+
+APPLICATIONS = ['eldenring.exe', 'chrome.exe', 'discord.exe', 'minecraft.exe', 'explorer.exe']
+
+
+def fill(db_path, rows):
+    """Insert rows frames 30s apart, cycling through APPLICATIONS."""
+    start = datetime(2024, 1, 1)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany('''
+            INSERT INTO screenshots (timestamp, ts, application, window_title, encrypted_data, file_hash)
+            VALUES (?, ?, ?, 'Window', X'', 'hash')
+        ''', ((moment.isoformat(), epoch_ms(moment), APPLICATIONS[i % len(APPLICATIONS)])
+              for i, moment in ((i, start + timedelta(seconds=30 * i)) for i in range(rows))))
+    conn.close()
+
+
+def best_ms(func, repeat):
+    """Fastest of repeat calls, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cwd = os.getcwd()
+        os.chdir(temp_dir)  # the capture keeps its key files in the working directory
+        db_path = os.path.join(temp_dir, "bench.db")
+        capture = ScreenshotCapture(db_path=db_path, capture_workers=0)
+        try:
+            fill(db_path, args.rows)
+            print(f"{args.rows} rows, {args.page_size} per page")
+            for application in (None, APPLICATIONS[0]):
+                where = "WHERE application = ?" if application else ""
+                base = (application,) if application else ()
+                matching = capture.db.read_one(f"SELECT COUNT(*) FROM screenshots {where}", base)[0]
+                for depth in (0, 0.5, 0.99):
+                    offset = int(matching * depth) // args.page_size * args.page_size
+                    # Cursor of the row just before the page, as the previous page would return it
+                    before = capture.db.read_one(f'''
+                        SELECT ts, id FROM screenshots {where} ORDER BY ts DESC, id DESC LIMIT 1 OFFSET ?
+                    ''', base + (offset - 1,)) if offset else None
+                    cursor = encode_cursor(*before) if before else None
+
+                    offset_ms = best_ms(lambda: capture.db.read(f'''
+                        SELECT id, timestamp, application, window_title, file_hash FROM screenshots {where}
+                        ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?
+                    ''', base + (args.page_size, offset)), args.repeat)
+                    keyset_ms = best_ms(lambda: capture.get_screenshot_page(
+                        limit=args.page_size, application=application, cursor=cursor), args.repeat)
+                    print(f"  {application or 'all apps':14s} row {offset:>6}: "
+                          f"offset={offset_ms:.2f}ms keyset={keyset_ms:.2f}ms")
+        finally:
+            capture.close()
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -126,21 +126,48 @@ class ChatWindow(ctk.CTkFrame):
                 daemon=True
             ).start()
 
-    def get_response(self, message, image_data=None):
+    def get_response(self, message, image_data=None, image_bytes=None, screenshot_id=None):
         try:
-            payload = {"message": message}
-            if image_data:
-                payload["image_data"] = image_data
-                
-            response = requests.post(
-                "http://127.0.0.1:8000/chat",
-                json=payload
-            )
-            if response.status_code == 200:
-                ai_response = response.json()["response"]
-                self.after(0, self.add_assistant_message, ai_response)
+            if image_bytes:
+                # Raw PNG body: no base64 inflation; the backend downscales before the model call
+                request_args = {
+                    "url": "http://127.0.0.1:8000/chat/image/stream",
+                    "params": {"message": message},
+                    "data": image_bytes,
+                    "headers": {"Content-Type": "image/png"}
+                }
             else:
-                self.after(0, self.add_assistant_message, "Error: Could not get response")
+                payload = {"message": message}
+                if image_data:
+                    payload["image_data"] = image_data
+                if screenshot_id is not None:
+                    # Stored capture: the backend loads it, nothing is re-uploaded
+                    payload["screenshot_id"] = screenshot_id
+                request_args = {"url": "http://127.0.0.1:8000/chat/stream", "json": payload}
+                
+            # Stream the reply so text shows up as soon as the first tokens arrive
+            with requests.post(stream=True, **request_args) as response:
+                if response.status_code != 200:
+                    self.after(0, self.add_assistant_message, "Error: Could not get response")
+                    return
+                started = False
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event: done"):
+                        break
+                    if not line.startswith("data: "):
+                        continue
+                    delta = json.loads(line[len("data: "):]).get("delta", "")
+                    if not delta:
+                        continue
+                    if not started:
+                        started = True
+                        self.after(0, self.stop_typing)
+                        self.after(0, self.begin_assistant_message)
+                    self.after(0, self.append_assistant_text, delta)
+                if started:
+                    self.after(0, self.append_assistant_text, "\n\n")
+                else:
+                    self.after(0, self.add_assistant_message, "Error: Empty response")
         except Exception as e:
             self.after(0, self.add_assistant_message, f"Error: {str(e)}")
         finally:
@@ -168,6 +195,22 @@ class ChatWindow(ctk.CTkFrame):
         self.chat_text.see("end")
         self.chat_text.configure(state="disabled")
 
+    def begin_assistant_message(self):
+        """Start an assistant message that streamed chunks are appended to."""
+        self.chat_text.configure(state="normal")
+        try:
+            self.chat_text.insert("end", "Pixly : ", "assistant")
+        except Exception:
+            self.chat_text.insert("end", "Pixly : ")
+        self.chat_text.see("end")
+        self.chat_text.configure(state="disabled")
+
+    def append_assistant_text(self, text):
+        self.chat_text.configure(state="normal")
+        self.chat_text.insert("end", text)
+        self.chat_text.see("end")
+        self.chat_text.configure(state="disabled")
+
     def start_typing(self):
         self._typing_active = True
         self._typing_step = 0
@@ -227,23 +270,42 @@ class ChatWindow(ctk.CTkFrame):
             daemon=True
         ).start()
     
+    def ask_about_screenshot(self, screenshot_id):
+        """Ask about a stored screenshot by ID, using the typed prompt or the default one."""
+        message = self.message_input.get().strip()
+        if not message:
+            message = "Please analyze this screenshot and provide gaming advice based on what you see."
+        self.add_user_message(f"[📷 Screenshot #{screenshot_id}] {message}")
+        self.message_input.delete(0, "end")
+        
+        # Disable input while processing
+        self.message_input.configure(state="disabled")
+        self.send_button.configure(state="disabled")
+        self.screenshot_button.configure(state="disabled")
+        
+        self.start_typing()
+        threading.Thread(
+            target=self.get_response,
+            args=(message,),
+            kwargs={"screenshot_id": screenshot_id},
+            daemon=True
+        ).start()
+    
     def capture_and_send_screenshot(self, message):
         """Capture screenshot and send to backend."""
         try:
-            import base64
             import io
             from PIL import ImageGrab
             
             # Capture screenshot
             screenshot = ImageGrab.grab()
             
-            # Convert to base64
+            # Fast PNG compression: the upload is local and the backend re-encodes anyway
             buffer = io.BytesIO()
-            screenshot.save(buffer, format='PNG')
-            img_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
+            screenshot.save(buffer, format='PNG', compress_level=1)
             
-            # Send to backend with image data
-            self.get_response(message, img_data)
+            # Send to backend as raw bytes
+            self.get_response(message, image_bytes=buffer.getvalue())
             
         except Exception as e:
             self.after(0, self.update_chat, f"Error capturing screenshot: {str(e)}")
@@ -528,7 +590,7 @@ class SettingsWindow(ctk.CTkFrame):
         """Open screenshot viewer window."""
         try:
             # Get recent screenshots
-            response = requests.get("http://127.0.0.1:8000/screenshots/recent", params={"limit": 20})
+            response = requests.get("http://127.0.0.1:8000/screenshots/recent", params={"limit": 100})
             if response.status_code == 200:
                 screenshots = response.json()['screenshots']
                 self.open_screenshot_viewer(screenshots)
@@ -563,11 +625,17 @@ class SettingsWindow(ctk.CTkFrame):
             self.master.master.show_buttons()
 
 class ScreenshotViewer(ctk.CTkToplevel):
+    GRID_COLUMNS = 3
+    THUMBNAIL_SIZE = (240, 135)
+
     def __init__(self, parent, screenshots):
         super().__init__(parent)
         
         self.title("Screenshot Viewer")
-        self.geometry("800x600")
+        self.geometry("820x600")
+        self.thumbnail_labels = {}
+        # screenshot id -> (ETag, image bytes), revalidated with If-None-Match
+        self.image_cache = {}
         
         # Title
         title_label = ctk.CTkLabel(
@@ -577,53 +645,127 @@ class ScreenshotViewer(ctk.CTkToplevel):
         )
         title_label.pack(pady=10)
         
-        # Screenshot list
+        # Screenshot grid
         self.screenshot_list = ctk.CTkScrollableFrame(self)
         self.screenshot_list.pack(fill="both", expand=True, padx=10, pady=10)
+        for column in range(self.GRID_COLUMNS):
+            self.screenshot_list.grid_columnconfigure(column, weight=1)
         
         # Display screenshots
         for i, screenshot in enumerate(screenshots):
             self.create_screenshot_item(screenshot, i)
+        
+        # Thumbnails (a few KB each) load in the background and fill in as they arrive
+        threading.Thread(
+            target=self.load_thumbnails,
+            args=([screenshot[0] for screenshot in screenshots],),
+            daemon=True
+        ).start()
     
     def create_screenshot_item(self, screenshot, index):
-        """Create a screenshot item in the viewer."""
+        """Create a screenshot tile in the viewer grid."""
         item_frame = ctk.CTkFrame(self.screenshot_list)
-        item_frame.pack(fill="x", pady=5)
+        item_frame.grid(row=index // self.GRID_COLUMNS, column=index % self.GRID_COLUMNS,
+                        padx=5, pady=5, sticky="nsew")
+        
+        # Thumbnail placeholder; click to open the full frame
+        thumbnail_label = ctk.CTkLabel(
+            item_frame,
+            text="Loading...",
+            width=self.THUMBNAIL_SIZE[0],
+            height=self.THUMBNAIL_SIZE[1]
+        )
+        thumbnail_label.pack(padx=5, pady=(5, 0))
+        thumbnail_label.bind("<Button-1>", lambda event: self.view_screenshot(screenshot[0]))
+        self.thumbnail_labels[screenshot[0]] = thumbnail_label
         
         # Screenshot info
-        info_text = f"ID: {screenshot[0]} | App: {screenshot[2]} | Time: {screenshot[1]}"
+        info_text = f"#{screenshot[0]} {screenshot[2]}\n{screenshot[1][:19].replace('T', ' ')}"
         info_label = ctk.CTkLabel(
             item_frame,
             text=info_text,
-            font=ctk.CTkFont(size=12)
+            font=ctk.CTkFont(size=11)
         )
-        info_label.pack(side="left", padx=10, pady=10)
+        info_label.pack(padx=5)
+        
+        button_row = ctk.CTkFrame(item_frame, fg_color="transparent")
+        button_row.pack(pady=(0, 5))
         
         # View button
         view_btn = ctk.CTkButton(
-            item_frame,
+            button_row,
             text="View",
             command=lambda: self.view_screenshot(screenshot[0]),
-            width=80
+            width=60
+        )
+        view_btn.pack(side="left", padx=2)
+
+        # Ask button: chat about this capture without re-uploading it
+        ask_btn = ctk.CTkButton(
+            button_row,
+            text="Ask",
+            command=lambda: self.ask_about_screenshot(screenshot[0]),
+            width=60
         )
-        view_btn.pack(side="right", padx=10, pady=10)
+        ask_btn.pack(side="left", padx=2)
 
         # Delete button
         delete_btn = ctk.CTkButton(
-            item_frame,
+            button_row,
             text="Delete",
             command=lambda: self.delete_screenshot_item(item_frame, screenshot[0]),
-            width=80,
+            width=60,
             fg_color=("#B71C1C", "#B71C1C"),
             hover_color=("#D32F2F", "#D32F2F")
         )
-        delete_btn.pack(side="right", padx=5, pady=10)
+        delete_btn.pack(side="left", padx=2)
+    
+    def load_thumbnails(self, screenshot_ids):
+        """Fetch thumbnails over one keep-alive connection (runs on a worker thread)."""
+        import io
+        with requests.Session() as session:
+            for screenshot_id in screenshot_ids:
+                try:
+                    response = session.get(f"http://127.0.0.1:8000/screenshots/{screenshot_id}/thumbnail", timeout=5)
+                    if response.status_code != 200:
+                        self.after(0, self.show_thumbnail, screenshot_id, None)
+                        continue
+                    image = Image.open(io.BytesIO(response.content))
+                    image.load()
+                    self.after(0, self.show_thumbnail, screenshot_id, image)
+                except tk.TclError:
+                    # Viewer was closed
+                    return
+                except Exception as e:
+                    print(f"Error loading thumbnail {screenshot_id}: {e}")
+    
+    def show_thumbnail(self, screenshot_id, image):
+        """Put a loaded thumbnail into its tile."""
+        label = self.thumbnail_labels.get(screenshot_id)
+        if label is None or not label.winfo_exists():
+            return
+        if image is None:
+            label.configure(text="No preview")
+            return
+        # Fit inside the tile, keeping the aspect ratio
+        scale = min(self.THUMBNAIL_SIZE[0] / image.width, self.THUMBNAIL_SIZE[1] / image.height)
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        label.configure(image=ctk.CTkImage(light_image=image, dark_image=image, size=size), text="")
 
+    def ask_about_screenshot(self, screenshot_id):
+        """Switch the overlay to chat and ask about the stored screenshot."""
+        overlay = self.master.winfo_toplevel()
+        if hasattr(overlay, "show_chat"):
+            overlay.show_chat()
+            overlay.chat_window.ask_about_screenshot(screenshot_id)
+            overlay.lift()
+    
     def delete_screenshot_item(self, item_frame, screenshot_id):
         """Call backend to delete screenshot and remove from UI."""
         try:
             resp = requests.delete(f"http://127.0.0.1:8000/screenshots/{screenshot_id}", timeout=5)
             if resp.status_code == 200:
+                self.thumbnail_labels.pop(screenshot_id, None)
                 item_frame.destroy()
             else:
                 try:
@@ -637,19 +779,25 @@ class ScreenshotViewer(ctk.CTkToplevel):
     def view_screenshot(self, screenshot_id):
         """View a specific screenshot in a new window."""
         try:
-            # Get screenshot data
-            response = requests.get(f"http://127.0.0.1:8000/screenshots/{screenshot_id}")
-            if response.status_code == 200:
-                data = response.json()['data']
-                self.open_image_viewer(data, screenshot_id)
+            # Raw image bytes; a frame viewed before is only revalidated (304, no body)
+            headers = {}
+            cached = self.image_cache.get(screenshot_id)
+            if cached:
+                headers["If-None-Match"] = cached[0]
+            response = requests.get(f"http://127.0.0.1:8000/screenshots/{screenshot_id}/image",
+                                    headers=headers, timeout=10)
+            if response.status_code == 304 and cached:
+                self.open_image_viewer(cached[1], screenshot_id)
+            elif response.status_code == 200:
+                self.image_cache[screenshot_id] = (response.headers.get("ETag"), response.content)
+                self.open_image_viewer(response.content, screenshot_id)
             else:
                 print("Failed to load screenshot")
         except Exception as e:
             print(f"Error loading screenshot: {e}")
     
-    def open_image_viewer(self, image_data, screenshot_id):
+    def open_image_viewer(self, image_bytes, screenshot_id):
         """Open a new window to view the actual image."""
-        import base64
         from PIL import Image, ImageTk
         import io
         
@@ -660,7 +808,6 @@ class ScreenshotViewer(ctk.CTkToplevel):
         
         # Decode image data
         try:
-            image_bytes = base64.b64decode(image_data)
             image = Image.open(io.BytesIO(image_bytes))
             
             # Resize image to fit window
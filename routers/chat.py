@@ -1,8 +1,80 @@
-from fastapi import APIRouter
-from services.chatbot import chat_with_gemini
+import os
+import json
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from services.chatbot import chat_with_gemini, stream_chat_with_gemini
+from services.metrics import server_timing, format_server_timing, timed, chat_stage_seconds
+from services.response_cache import get_response_cache_stats, clear_response_cache
 from schemas.chat import ChatMessage
 router = APIRouter()
 
+DEFAULT_IMAGE_PROMPT = "Please analyze this screenshot and provide gaming advice based on what you see."
+MAX_IMAGE_BYTES = int(os.getenv('PIXLY_MAX_IMAGE_BYTES', str(32 * 1024 * 1024)))
+
+async def _timed_chat(**kwargs) -> Response:
+    """Run chat_with_gemini and return its JSON with per-stage durations in Server-Timing."""
+    with server_timing() as timings:
+        result = await chat_with_gemini(**kwargs)
+        with timed(chat_stage_seconds, 'serialize', stage='serialize'):
+            body = json.dumps(result)
+    return Response(body, media_type="application/json",
+                    headers={"Server-Timing": format_server_timing(timings)})
+
+def _event_stream_response(chunks) -> StreamingResponse:
+    """Wrap an async iterator of text chunks as server-sent events, ending with a done event."""
+    async def event_stream():
+        async for chunk in chunks:
+            yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _read_image_body(request: Request) -> bytes:
+    """Read a raw image upload, rejecting empty or oversized bodies."""
+    image_bytes = bytearray()
+    async for chunk in request.stream():
+        image_bytes.extend(chunk)
+        if len(image_bytes) > MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image larger than {MAX_IMAGE_BYTES} bytes")
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Request body must contain the image bytes")
+    return bytes(image_bytes)
+
 @router.post("/chat")
 async def chat(message: ChatMessage):
-    return await chat_with_gemini(message.message, message.image_data)
\ No newline at end of file
+    """Answer a chat message; per-stage durations are returned in the Server-Timing header."""
+    return await _timed_chat(message=message.message, image_data=message.image_data,
+                             screenshot_id=message.screenshot_id)
+
+@router.post("/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """Stream the chat response as server-sent events, one event per text chunk."""
+    return _event_stream_response(stream_chat_with_gemini(
+        message.message, message.image_data, screenshot_id=message.screenshot_id))
+
+@router.post("/chat/image")
+async def chat_image(request: Request, message: str = DEFAULT_IMAGE_PROMPT):
+    """Ask about an image sent as the raw request body (e.g. Content-Type: image/png), no base64."""
+    image_bytes = await _read_image_body(request)
+    return await _timed_chat(message=message, image_bytes=image_bytes)
+
+@router.post("/chat/image/stream")
+async def chat_image_stream(request: Request, message: str = DEFAULT_IMAGE_PROMPT):
+    """Streaming variant of /chat/image."""
+    image_bytes = await _read_image_body(request)
+    return _event_stream_response(stream_chat_with_gemini(message, image_bytes=image_bytes))
+
+@router.get("/chat/cache/stats")
+def chat_cache_stats():
+    """Get response cache hit/miss counters."""
+    return {"status": "ok", "stats": get_response_cache_stats()}
+
+@router.delete("/chat/cache")
+def clear_chat_cache():
+    """Drop every cached chat answer."""
+    clear_response_cache()
+    return {"status": "ok", "message": "Response cache cleared"}
@@ -3,7 +3,9 @@ from services.knowledge_manager import get_available_games as get_csv_games, val
 from services.vector_service import add_game_knowledge, search_knowledge, get_game_stats, list_available_games
 from schemas.game_detection import GameDetectionRequest
 from schemas.knowledge_search import KnowledgeSearchRequest
+from services.metrics import server_timing, format_server_timing, timed, knowledge_search_seconds
 from fastapi import APIRouter,HTTPException
+from fastapi.responses import JSONResponse
 
 router = APIRouter()
 # Game Detection endpoints
@@ -65,22 +67,27 @@ def process_game_knowledge(game_name: str):
 
 @router.post("/{game_name}/knowledge/search")
 def search_game_knowledge(game_name: str, request: KnowledgeSearchRequest):
-    """Search knowledge base for a specific game."""
+    """Search knowledge base for a specific game; stage durations are returned in the Server-Timing header."""
     try:
-        results = search_knowledge(
-            game_name=game_name,
-            query=request.query,
-            content_types=request.content_types,
-            limit=request.limit
-        )
+        with server_timing() as timings:
+            with timed(knowledge_search_seconds, 'search'):
+                results = search_knowledge(
+                    game_name=game_name,
+                    query=request.query,
+                    content_types=request.content_types,
+                    limit=request.limit
+                )
         
-        return {
-            "status": "ok",
-            "game_name": game_name,
-            "query": request.query,
-            "results": results,
-            "total_results": len(results)
-        }
+        return JSONResponse(
+            content={
+                "status": "ok",
+                "game_name": game_name,
+                "query": request.query,
+                "results": results,
+                "total_results": len(results)
+            },
+            headers={"Server-Timing": format_server_timing(timings)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching knowledge: {str(e)}")
 
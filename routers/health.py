@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.container import container
+router = APIRouter()
+
+@router.get("/health")
+def health():
+    """Liveness: the server is up and answering, even while services are still loading."""
+    return {"status": "ok"}
+
+@router.get("/ready")
+def ready():
+    """Readiness: which components are loaded. Returns 503 until all warmup components are built."""
+    status = container.status()
+    if not status['ready']:
+        return JSONResponse(status_code=503, content={"status": "loading", **status})
+    return {"status": "ok", **status}
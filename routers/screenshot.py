@@ -1,6 +1,59 @@
-from fastapi import APIRouter,HTTPException
-from services.screenshot import start_screenshot_capture, stop_screenshot_capture, get_recent_screenshots, get_screenshot_by_id, get_screenshot_stats, delete_screenshot
+from typing import Iterator, Optional, Tuple
+from fastapi import APIRouter,HTTPException,Request
+from fastapi.responses import Response, StreamingResponse
+from services.screenshot import start_screenshot_capture, stop_screenshot_capture, get_screenshot_page, get_screenshot_by_id, stream_screenshot_by_id, get_screenshot_stats, delete_screenshot, get_screenshot_thumbnail, get_screenshot_image_info, run_screenshot_retention, run_screenshot_reencryption
+from services.imaging import mime_type_of
 router = APIRouter()
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, as RFC 9110 requires for it)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header into an inclusive (start, end).
+
+    Returns None when the header should be ignored (other units, several ranges,
+    malformed), and raises ValueError when the range can't be satisfied.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = (part.strip() for part in spec.partition("-"))
+    if not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+def _take(chunks: Iterator[bytes], length: int) -> Iterator[bytes]:
+    """The first length bytes of a chunk iterator, which is closed after (releasing the payload file)."""
+    try:
+        for chunk in chunks:
+            if len(chunk) >= length:
+                yield chunk[:length]
+                return
+            yield chunk
+            length -= len(chunk)
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
 # Screenshot endpoints
 @router.post("/start")
 def start_screenshots(interval: int = 30):
@@ -14,11 +67,26 @@ def stop_screenshots():
     stop_screenshot_capture()
     return {"status": "ok", "message": "Screenshot capture stopped"}
 
+@router.post("/retention/run")
+def run_retention():
+    """Apply the retention policy now instead of waiting for the background job."""
+    result = run_screenshot_retention()
+    return {"status": "ok", "result": result}
+
+@router.post("/encryption/reencrypt")
+def run_reencryption():
+    """Re-encrypt stored screenshots with the active key now (also runs in the background while capturing)."""
+    result = run_screenshot_reencryption()
+    return {"status": "ok", "result": result}
+
 @router.get("/recent")
-def get_recent_screenshots_endpoint(limit: int = 10, application: str = None):
-    """Get recent screenshots."""
-    screenshots = get_recent_screenshots(limit=limit, application=application)
-    return {"status": "ok", "screenshots": screenshots}
+def get_recent_screenshots_endpoint(limit: int = 10, application: str = None, cursor: str = None):
+    """Get recent screenshots, one page at a time: pass next_cursor back as cursor for the following page."""
+    try:
+        page = get_screenshot_page(limit=limit, application=application, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"status": "ok", "screenshots": page['screenshots'], "next_cursor": page['next_cursor']}
 
 @router.get("/stats")
 def get_screenshot_stats_endpoint():
@@ -36,6 +104,73 @@ def get_screenshot_endpoint(screenshot_id: int):
     else:
         return {"status": "error", "message": "Screenshot not found"}
 
+@router.get("/{screenshot_id}/image")
+def get_screenshot_image_endpoint(screenshot_id: int, request: Request):
+    """
+    Get a screenshot as raw image bytes.
+
+    The strong ETag is the SHA-256 of the image (file_hash), so a client that
+    already has the frame gets a 304 without the server decrypting it, and
+    single byte ranges are served as 206 Partial Content, decrypting only the
+    chunks the range covers.
+    """
+    info = get_screenshot_image_info(screenshot_id)
+    if not info:
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    etag = f'"{info["file_hash"]}"'
+    headers = {
+        "ETag": etag,
+        # A screenshot's bytes never change, so the cached copy never needs revalidating
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    data = None
+    if info["byte_size"] is None or not info["mime_type"]:
+        # Rows stored before sizes and types were recorded are decrypted up front to learn them
+        data = get_screenshot_by_id(screenshot_id)
+        if data is None:
+            raise HTTPException(status_code=404, detail="Screenshot not found")
+    size = info["byte_size"] if data is None else len(data)
+    media_type = info["mime_type"] or mime_type_of(data)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            if data is not None:
+                return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+            chunks = stream_screenshot_by_id(screenshot_id, start)
+            if chunks is None:
+                raise HTTPException(status_code=404, detail="Screenshot not found")
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(_take(chunks, end - start + 1), status_code=206,
+                                     media_type=media_type, headers=headers)
+
+    if data is None:
+        data = get_screenshot_by_id(screenshot_id)
+        if data is None:
+            raise HTTPException(status_code=404, detail="Screenshot not found")
+    return Response(content=data, media_type=media_type, headers=headers)
+
+@router.get("/{screenshot_id}/thumbnail")
+def get_screenshot_thumbnail_endpoint(screenshot_id: int):
+    """Get a small JPEG thumbnail of a screenshot for the gallery."""
+    thumbnail = get_screenshot_thumbnail(screenshot_id)
+    if not thumbnail:
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    # Frames never change once captured, so the client may keep thumbnails
+    return Response(content=thumbnail, media_type="image/jpeg",
+                    headers={"Cache-Control": "private, max-age=86400"})
+
 @router.delete("/{screenshot_id}")
 def delete_screenshot_endpoint(screenshot_id: int):
     """Delete screenshot by ID."""
@@ -3,4 +3,6 @@ from typing import Optional, List
 
 class ChatMessage(BaseModel):
     message: str
-    image_data: Optional[str] = None
\ No newline at end of file
+    image_data: Optional[str] = None
+    # Ask about a stored capture instead of uploading the image again
+    screenshot_id: Optional[int] = None
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""Content-addressed file store for encrypted screenshot payloads, refcounted in screenshots.db"""
+import os
+import sqlite3
+import hashlib
+import time
+import secrets
+import argparse
+import tempfile
+from threading import Event
+from typing import BinaryIO, Callable, Optional
+from .screenshot_db import after_commit, after_rollback
+
+BLOB_DIR = os.getenv('PIXLY_BLOB_DIR', '')
+# Present while a process has the store open; left behind by a crash
+IN_USE_MARKER = '.in-use'
+
+class BlobStore:
+    def __init__(self, root: str):
+        """
+        Initialize a blob store rooted at a directory.
+
+        Blobs hold already-encrypted payloads. They are named by the SHA-256
+        of the plaintext and sharded into two levels of directories
+        (ab/cd/abcd...), so identical frames share one file and no directory
+        grows past a few thousand entries. The `blobs` table in the
+        screenshots database holds a refcount per blob; the file is removed
+        when the last row referencing it is deleted.
+
+        Files are never changed in place: each version of a blob is written
+        under a new name (<hash>.<token>, recorded in blobs.file) before its
+        row is committed, and replaced or released files are unlinked only
+        after the transaction commits. A rollback therefore never leaves a
+        row without its file. Files left behind by a crash (or a failed
+        unlink) are removed by sweep() on the next start; open_session()
+        tells whether one is needed.
+
+        Args:
+            root (str): Directory holding the blob files
+        """
+        self.root = root
+        # Set when files may have been orphaned; cleared by a completed sweep
+        self.dirty = False
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def hash_of(data: bytes) -> str:
+        """Content address of a plaintext payload."""
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, blob_hash: str, file: Optional[str] = None) -> str:
+        """File path of a blob; file is its blobs.file name (None: the plain hash, as older versions wrote)."""
+        return os.path.join(self.root, blob_hash[:2], blob_hash[2:4], file or blob_hash)
+
+    def exists(self, blob_hash: str, file: Optional[str] = None) -> bool:
+        return os.path.exists(self.path(blob_hash, file))
+
+    def write(self, blob_hash: str, encrypted_data: bytes, file: Optional[str] = None):
+        """Write an encrypted blob atomically (a crash never leaves a partial file under its name)."""
+        path = self.path(blob_hash, file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(encrypted_data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def stage(self, blob_hash: str, encrypted_data: bytes) -> str:
+        """Write a new version of a blob under a fresh name; returns the name for blobs.file."""
+        file = f"{blob_hash}.{secrets.token_hex(4)}"
+        self.write(blob_hash, encrypted_data, file)
+        return file
+
+    def open(self, blob_hash: str, file: Optional[str] = None) -> Optional[BinaryIO]:
+        """Open an encrypted blob for reading; None if the file is missing."""
+        try:
+            return open(self.path(blob_hash, file), 'rb')
+        except FileNotFoundError:
+            return None
+
+    def read(self, blob_hash: str, file: Optional[str] = None) -> Optional[bytes]:
+        """Read an encrypted blob; None if the file is missing."""
+        source = self.open(blob_hash, file)
+        if source is None:
+            return None
+        with source:
+            return source.read()
+
+    def delete(self, blob_hash: str, file: Optional[str] = None):
+        """Remove a blob file; failures are reported, and a file left behind is removed by sweep()."""
+        try:
+            os.unlink(self.path(blob_hash, file))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # On Windows a file open in a reader can't be removed yet; the next start sweeps it
+            self.dirty = True
+            print(f"Error removing blob {file or blob_hash}: {e}")
+
+    def open_session(self) -> bool:
+        """Mark the store in use; returns True if the last session didn't end cleanly (a sweep is due)."""
+        marker = os.path.join(self.root, IN_USE_MARKER)
+        self.dirty = self.dirty or os.path.exists(marker)
+        open(marker, 'a').close()
+        return self.dirty
+
+    def close_session(self):
+        """Clear the in-use mark, unless files may still be orphaned."""
+        if self.dirty:
+            return
+        try:
+            os.unlink(os.path.join(self.root, IN_USE_MARKER))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def create_schema(conn: sqlite3.Connection):
+        """Create the refcount table (and the screenshots.blob_hash column) if missing.
+
+        blobs.key_id is the encryption key a blob is written with (NULL: a Fernet token),
+        blobs.file the name of its current file (NULL: the plain hash).
+        """
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL
+            )
+        ''')
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(screenshots)")}
+        if 'blob_hash' not in columns:
+            conn.execute("ALTER TABLE screenshots ADD COLUMN blob_hash TEXT")
+        blob_columns = {row[1] for row in conn.execute("PRAGMA table_info(blobs)")}
+        if 'key_id' not in blob_columns:
+            conn.execute("ALTER TABLE blobs ADD COLUMN key_id INTEGER")
+        if 'file' not in blob_columns:
+            conn.execute("ALTER TABLE blobs ADD COLUMN file TEXT")
+
+    def add_ref(self, conn: sqlite3.Connection, blob_hash: str, encrypted_data: bytes, key_id: Optional[int] = None):
+        """
+        Take a reference to a blob inside a write transaction, writing the file if it is new.
+
+        Must run on the database writer thread: refcounts and file creation/removal are
+        serialized there, so a blob is never deleted between its refcount check and use.
+        key_id names the key encrypted_data is encrypted with (None for a Fernet token).
+        A new file is removed again if the write is rolled back.
+        """
+        updated = conn.execute('UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?', (blob_hash,))
+        if updated.rowcount:
+            return
+        file = self.stage(blob_hash, encrypted_data)
+        after_rollback(conn, lambda: self.delete(blob_hash, file))
+        conn.execute('INSERT INTO blobs (hash, size, refcount, key_id, file) VALUES (?, ?, 1, ?, ?)',
+                     (blob_hash, len(encrypted_data), key_id, file))
+
+    def release(self, conn: sqlite3.Connection, blob_hash: str) -> bool:
+        """
+        Drop a reference inside a write transaction. Returns True if it was the last one.
+
+        The file of a released blob is removed once the transaction commits, so a
+        rollback restores the row with its file intact.
+        """
+        conn.execute('UPDATE blobs SET refcount = refcount - 1 WHERE hash = ?', (blob_hash,))
+        row = conn.execute('SELECT refcount, file FROM blobs WHERE hash = ?', (blob_hash,)).fetchone()
+        if row is None or row[0] > 0:
+            return False
+        conn.execute('DELETE FROM blobs WHERE hash = ?', (blob_hash,))
+        after_commit(conn, lambda file=row[1]: self.delete(blob_hash, file))
+        return True
+
+    def sweep(self, read: Callable[[str, tuple], list], stop: Optional[Event] = None) -> int:
+        """
+        Remove files no blob row references: partial writes, and files of writes whose
+        transaction never committed (a crash before the commit or its callbacks).
+
+        Works one shard directory at a time, with read(sql, params) returning committed
+        rows, so it can run in the background while capture writes. Files newer than the
+        sweep are left alone: they may belong to a transaction still in progress. Returns
+        the files removed; a sweep stopped part-way leaves the store dirty.
+        """
+        # A little before now: file times come from a coarser clock than time.time()
+        started = time.time() - 2
+        self.dirty = False
+        removed = 0
+        for first in sorted(os.listdir(self.root)):
+            if len(first) != 2 or not os.path.isdir(os.path.join(self.root, first)):
+                continue
+            for second in sorted(os.listdir(os.path.join(self.root, first))):
+                if stop is not None and stop.is_set():
+                    self.dirty = True
+                    return removed
+                directory = os.path.join(self.root, first, second)
+                prefix = first + second
+                referenced = {row[0] for row in read(
+                    'SELECT COALESCE(file, hash) FROM blobs WHERE hash >= ? AND hash < ?', (prefix, prefix + 'g'))}
+                for entry in os.scandir(directory):
+                    if entry.name in referenced or not entry.is_file():
+                        continue
+                    try:
+                        if entry.stat().st_mtime >= started:
+                            continue
+                        os.unlink(entry.path)
+                        removed += 1
+                    except OSError as e:
+                        self.dirty = True
+                        print(f"Error removing orphaned blob {entry.name}: {e}")
+        return removed
+
+def default_blob_dir(db_path: str) -> str:
+    """Blob directory for a database: PIXLY_BLOB_DIR, or <db name>.blobs next to it."""
+    if BLOB_DIR:
+        return BLOB_DIR
+    return os.path.splitext(os.path.abspath(db_path))[0] + '.blobs'
+
+def migrate_database(db_path: str, key_path: str = "screenshot_key.key", blob_dir: str = None,
+                     batch_size: int = 100, vacuum: bool = True) -> dict:
+    """
+    Move inline encrypted_data payloads of an existing screenshots.db into the blob store.
+
+    Rows are migrated in batches, each in its own transaction, so the tool can be
+    stopped and re-run. Run it while the app is not capturing.
+
+    Args:
+        db_path (str): Path to screenshots.db
+        key_path (str): Fernet key the payloads are encrypted with
+        blob_dir (str): Blob directory (default_blob_dir(db_path) if None)
+        batch_size (int): Rows per transaction
+        vacuum (bool): VACUUM afterwards to return the freed pages to the filesystem (and
+            enable incremental auto-vacuum)
+
+    Returns:
+        dict: Rows migrated, blobs written and bytes moved
+    """
+    from cryptography.fernet import Fernet
+
+    with open(key_path, 'rb') as f:
+        cipher = Fernet(f.read())
+    store = BlobStore(blob_dir or default_blob_dir(db_path))
+    conn = sqlite3.connect(db_path)
+    stats = {'rows': 0, 'blobs': 0, 'bytes': 0}
+    try:
+        with conn:
+            store.create_schema(conn)
+        while True:
+            rows = conn.execute('''
+                SELECT id, encrypted_data FROM screenshots
+                WHERE blob_hash IS NULL AND length(encrypted_data) > 0
+                LIMIT ?
+            ''', (batch_size,)).fetchall()
+            if not rows:
+                break
+            with conn:
+                for screenshot_id, encrypted_data in rows:
+                    # Address by plaintext so identical frames collapse into one blob
+                    blob_hash = store.hash_of(cipher.decrypt(encrypted_data))
+                    if not conn.execute('SELECT 1 FROM blobs WHERE hash = ?', (blob_hash,)).fetchone():
+                        stats['blobs'] += 1
+                    store.add_ref(conn, blob_hash, encrypted_data)
+                    conn.execute("UPDATE screenshots SET blob_hash = ?, encrypted_data = X'' WHERE id = ?",
+                                 (blob_hash, screenshot_id))
+                    stats['rows'] += 1
+                    stats['bytes'] += len(encrypted_data)
+            print(f"Migrated {stats['rows']} screenshots ({stats['blobs']} blobs)")
+        if vacuum:
+            # Switch to incremental auto-vacuum while rebuilding, so retention can shrink the file later
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Move screenshot payloads out of screenshots.db into the blob store")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--db", default="screenshots.db")
+    parser.add_argument("--key", default="screenshot_key.key")
+    parser.add_argument("--blobs", default=None, help="blob directory (default: <db>.blobs)")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--no-vacuum", action="store_true")
+    args = parser.parse_args()
+
+    stats = migrate_database(args.db, args.key, args.blobs, args.batch_size, vacuum=not args.no_vacuum)
+    print(f"Done: {stats['rows']} screenshots, {stats['blobs']} blobs, {stats['bytes'] / 1e6:.1f} MB moved")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Pluggable frame grabbers and foreground-window providers for screenshot capture"""
+import os
+import itertools
+from typing import Dict, List, Optional, Tuple
+import psutil
+from PIL import Image, ImageDraw, ImageGrab
+
+try:
+    import win32api
+    import win32gui
+    import win32process
+except ImportError:  # not on Windows: the win32 provider reports an unknown window
+    win32api = None
+    win32gui = None
+    win32process = None
+
+CAPTURE_BACKEND = os.getenv('PIXLY_CAPTURE_BACKEND', 'imagegrab').lower()
+WINDOW_PROVIDER = os.getenv('PIXLY_WINDOW_PROVIDER', 'win32').lower()
+# What each frame covers: the whole desktop, the foreground window, or one monitor
+# (CAPTURE_MONITOR: index with the primary first, or -1 for the foreground window's)
+CAPTURE_REGION = os.getenv('PIXLY_CAPTURE_REGION', 'desktop').lower()
+CAPTURE_MONITOR = int(os.getenv('PIXLY_CAPTURE_MONITOR', '0'))
+CAPTURE_REGIONS = ('desktop', 'window', 'monitor')
+
+# (left, top, right, bottom) in virtual-desktop pixels, right and bottom exclusive
+BBox = Tuple[int, int, int, int]
+
+UNKNOWN_WINDOW = {'application': 'Unknown', 'window_title': 'Unknown', 'pid': 0}
+
+class ImageGrabBackend:
+    """Grab the desktop, or an area of it, with PIL.ImageGrab."""
+
+    def grab(self, bbox: BBox = None) -> Image.Image:
+        if bbox is None:
+            return ImageGrab.grab()
+        # Areas on secondary monitors can have negative coordinates
+        return ImageGrab.grab(bbox=bbox, all_screens=True)
+
+class SyntheticGrabBackend:
+    def __init__(self, size=(1280, 720), repeat: int = 1):
+        """
+        Generate deterministic frames without a display, for tests and benchmarks.
+
+        Each scene is a gradient with a block that moves between scenes, so
+        consecutive scenes differ in their perceptual hash.
+
+        Args:
+            size (tuple): Frame width and height
+            repeat (int): Grabs per scene (>1 produces runs of identical frames)
+        """
+        self.size = size
+        self.repeat = max(repeat, 1)
+        self._grabs = itertools.count()
+        self._background = Image.linear_gradient('L').resize(size).convert('RGB')
+
+    def grab(self, bbox: BBox = None) -> Image.Image:
+        """The next scene, cropped to bbox (relative to a desktop of size) if given."""
+        scene = next(self._grabs) // self.repeat
+        width, height = self.size
+        frame = self._background.copy()
+        block = (width // 3, height // 3)
+        x = (scene * width // 7) % (width - block[0])
+        y = (scene * height // 5) % (height - block[1])
+        color = ((scene * 67) % 256, (scene * 131) % 256, (scene * 29) % 256)
+        ImageDraw.Draw(frame).rectangle([x, y, x + block[0], y + block[1]], fill=color)
+        return frame if bbox is None else frame.crop(bbox)
+
+class Win32WindowProvider:
+    """Foreground window, its process and its bounds, plus the monitor layout, via pywin32 and psutil."""
+
+    def __init__(self):
+        if win32gui is not None:
+            try:
+                # Report window and monitor bounds in physical pixels, as ImageGrab captures them
+                import ctypes
+                ctypes.windll.user32.SetProcessDPIAware()
+            except Exception as e:
+                print(f"Error enabling DPI awareness: {e}")
+
+    def window_info(self) -> Dict:
+        if win32gui is None:
+            return dict(UNKNOWN_WINDOW)
+        try:
+            hwnd = win32gui.GetForegroundWindow()
+            window_title = win32gui.GetWindowText(hwnd)
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+            return {
+                'application': psutil.Process(pid).name(),
+                'window_title': window_title,
+                'pid': pid,
+                'bbox': tuple(win32gui.GetWindowRect(hwnd))
+            }
+        except Exception as e:
+            print(f"Error getting window info: {e}")
+            return dict(UNKNOWN_WINDOW)
+
+    def monitors(self) -> List[BBox]:
+        """Monitor bounds, the primary (the one at the origin) first."""
+        if win32api is None:
+            return []
+        try:
+            bounds = [tuple(rect) for _, _, rect in win32api.EnumDisplayMonitors()]
+        except Exception as e:
+            print(f"Error listing monitors: {e}")
+            return []
+        return sorted(bounds, key=lambda bbox: (bbox[0], bbox[1]) != (0, 0))
+
+class SyntheticWindowProvider:
+    def __init__(self, windows: List[Dict] = None, switch_every: int = 0, monitors: List[BBox] = None):
+        """
+        Report a scripted sequence of foreground windows.
+
+        Args:
+            windows (List[Dict]): Window infos to cycle through (one game window by default); a 'bbox'
+                entry gives the window's bounds
+            switch_every (int): Calls before moving to the next window (0 never switches)
+            monitors (List[BBox]): Monitor bounds to report, the primary first
+        """
+        self.windows = windows or [{'application': 'eldenring.exe', 'window_title': 'ELDEN RING', 'pid': 4242}]
+        self.switch_every = switch_every
+        self._monitors = list(monitors or [])
+        self._calls = itertools.count()
+
+    def window_info(self) -> Dict:
+        call = next(self._calls)
+        index = call // self.switch_every if self.switch_every else 0
+        return dict(self.windows[index % len(self.windows)])
+
+    def monitors(self) -> List[BBox]:
+        return list(self._monitors)
+
+GRAB_BACKENDS = {'imagegrab': ImageGrabBackend, 'synthetic': SyntheticGrabBackend}
+WINDOW_PROVIDERS = {'win32': Win32WindowProvider, 'synthetic': SyntheticWindowProvider}
+
+def _intersect(bbox: BBox, bounds: BBox) -> Optional[BBox]:
+    left, top = max(bbox[0], bounds[0]), max(bbox[1], bounds[1])
+    right, bottom = min(bbox[2], bounds[2]), min(bbox[3], bounds[3])
+    return (left, top, right, bottom) if right > left and bottom > top else None
+
+def capture_bbox(region: str, window_info: Dict, monitors: List[BBox], monitor: int = 0) -> Optional[BBox]:
+    """
+    Area of the desktop a capture region covers, or None for the whole desktop.
+
+    A window is clipped to the monitors (a maximized window's borders hang off
+    screen). When the window has no usable bounds (unknown, minimized off
+    screen) or the chosen monitor doesn't exist, the primary monitor is used.
+
+    Args:
+        region (str): One of CAPTURE_REGIONS
+        window_info (Dict): Foreground window, with its 'bbox' if the provider knows it
+        monitors (List[BBox]): Monitor bounds, the primary first (empty if unknown)
+        monitor (int): Monitor index for the 'monitor' region; -1 picks the foreground window's
+
+    Returns:
+        BBox: Area to grab
+    """
+    if region not in CAPTURE_REGIONS:
+        raise ValueError(f"Unknown capture region: {region}")
+    if region == 'desktop':
+        return None
+    bbox = window_info.get('bbox')
+    if region == 'window' and bbox:
+        # The visible parts of the window (all of it, if the layout is unknown)
+        parts = [part for part in (_intersect(bbox, bounds) for bounds in (monitors or [bbox])) if part]
+        if parts:
+            return (min(part[0] for part in parts), min(part[1] for part in parts),
+                    max(part[2] for part in parts), max(part[3] for part in parts))
+    if region == 'monitor' and monitor < 0 and bbox:
+        # The monitor holding the window's center
+        x, y = (bbox[0] + bbox[2]) // 2, (bbox[1] + bbox[3]) // 2
+        for bounds in monitors:
+            if bounds[0] <= x < bounds[2] and bounds[1] <= y < bounds[3]:
+                return bounds
+    if region == 'monitor' and 0 <= monitor < len(monitors):
+        return monitors[monitor]
+    return monitors[0] if monitors else None
+
+def make_grab_backend(name: str = None):
+    """Frame grabber by name (PIXLY_CAPTURE_BACKEND by default)."""
+    name = name or CAPTURE_BACKEND
+    if name not in GRAB_BACKENDS:
+        raise ValueError(f"Unknown capture backend: {name}")
+    return GRAB_BACKENDS[name]()
+
+def make_window_provider(name: str = None):
+    """Foreground-window provider by name (PIXLY_WINDOW_PROVIDER by default)."""
+    name = name or WINDOW_PROVIDER
+    if name not in WINDOW_PROVIDERS:
+        raise ValueError(f"Unknown window provider: {name}")
+    return WINDOW_PROVIDERS[name]()
@@ -0,0 +1,134 @@
+"""Resource governor for background capture: CPU budget, deferring heavy stages during games, catch-up"""
+import os
+import time
+from collections import deque
+from threading import Lock
+from typing import Callable, Dict, Optional
+from .metrics import screenshot_pipeline_dropped_total
+
+# CPU seconds per minute background capture may spend (grab, dedupe, encode, encrypt, persist); 0 disables
+CAPTURE_CPU_BUDGET = float(os.getenv('PIXLY_CAPTURE_CPU_BUDGET', '6'))
+# Hold grabbed frames before dedupe/encode while a known game is in the foreground. Off by default:
+# held frames are raw, full-resolution images, and nothing is saved until the game loses focus
+CAPTURE_DEFER_IN_GAME = os.getenv('PIXLY_CAPTURE_DEFER_IN_GAME', '0') not in ('0', 'false', 'no')
+# Raw frames held while deferring (about 11MB each at 1440p); when full, every other one is dropped
+CAPTURE_BACKLOG = int(os.getenv('PIXLY_CAPTURE_BACKLOG', '16'))
+# Niceness added to encoder worker processes (below-normal priority class on Windows); 0 leaves them alone
+ENCODER_NICE = int(os.getenv('PIXLY_ENCODER_NICE', '10'))
+
+def lower_priority(niceness: int = ENCODER_NICE):
+    """Lower the calling process's scheduling priority (the encoder pool's worker initializer)."""
+    if niceness <= 0:
+        return
+    try:
+        if os.name == 'nt':
+            import psutil
+            psutil.Process().nice(psutil.IDLE_PRIORITY_CLASS if niceness >= 19
+                                  else psutil.BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(niceness)
+    except Exception as e:
+        print(f"Error lowering encoder priority: {e}")
+
+class ResourceGovernor:
+    def __init__(self, cpu_budget: float = CAPTURE_CPU_BUDGET, defer_in_game: bool = CAPTURE_DEFER_IN_GAME,
+                 backlog_size: int = CAPTURE_BACKLOG, window: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Keep background capture from competing with the game for CPU.
+
+        Capture stages charge the CPU time they use. While a game is in the
+        foreground, or the last window's charges exceed the budget, grabbed
+        frames are held in a backlog instead of going through dedupe, encode
+        and the rest; once neither applies the backlog is caught up, oldest
+        first, before new frames. Frames keep their capture timestamps, so
+        deferred frames are stored as if processed on time.
+
+        Args:
+            cpu_budget (float): CPU seconds allowed per window (0 disables the budget)
+            defer_in_game (bool): Hold frames while a known game is in the foreground
+            backlog_size (int): Most frames held; when full, every other held frame is dropped
+            window (float): Seconds the budget is measured over
+            clock (callable): Monotonic time source
+        """
+        self.cpu_budget = cpu_budget
+        self.defer_in_game = defer_in_game
+        self.backlog_size = max(backlog_size, 1)
+        self.window = window
+        self.clock = clock
+        self._charges = deque()
+        self._backlog = deque()
+        self._lock = Lock()
+        self.last_reason = None
+        self.cpu_by_stage = {}
+        self.totals = {'deferred': 0, 'caught_up': 0, 'dropped': 0}
+
+    def charge(self, stage: str, cpu_seconds: float):
+        """Record CPU time a capture stage spent on one frame."""
+        if cpu_seconds <= 0:
+            return
+        with self._lock:
+            self._charges.append((self.clock(), cpu_seconds))
+            self.cpu_by_stage[stage] = self.cpu_by_stage.get(stage, 0.0) + cpu_seconds
+
+    def cpu_used(self) -> float:
+        """CPU seconds charged within the last window."""
+        with self._lock:
+            cutoff = self.clock() - self.window
+            while self._charges and self._charges[0][0] <= cutoff:
+                self._charges.popleft()
+            return sum(seconds for _, seconds in self._charges)
+
+    def over_budget(self) -> bool:
+        return self.cpu_budget > 0 and self.cpu_used() >= self.cpu_budget
+
+    def defer_reason(self, game: Optional[str]) -> Optional[str]:
+        """Why heavy stages should wait now ('game' or 'budget'), or None if they can run."""
+        if self.defer_in_game and game is not None:
+            reason = 'game'
+        elif self.over_budget():
+            reason = 'budget'
+        else:
+            reason = None
+        self.last_reason = reason
+        return reason
+
+    def defer(self, frame: Dict):
+        """Hold a grabbed frame; a full backlog is thinned to every other frame first."""
+        dropped = 0
+        with self._lock:
+            if len(self._backlog) >= self.backlog_size:
+                kept = list(self._backlog)[::2]
+                dropped = len(self._backlog) - len(kept)
+                self._backlog = deque(kept)
+            self._backlog.append(frame)
+            self.totals['deferred'] += 1
+            self.totals['dropped'] += dropped
+        if dropped:
+            screenshot_pipeline_dropped_total.inc(dropped, stage='governor')
+
+    def backlog(self) -> int:
+        return len(self._backlog)
+
+    def next_deferred(self) -> Optional[Dict]:
+        """The oldest held frame, or None."""
+        with self._lock:
+            if not self._backlog:
+                return None
+            self.totals['caught_up'] += 1
+            return self._backlog.popleft()
+
+    def stats(self) -> Dict:
+        used = self.cpu_used()
+        with self._lock:
+            by_stage = {stage: round(seconds, 3) for stage, seconds in self.cpu_by_stage.items()}
+            totals = dict(self.totals)
+        return {
+            'cpu_budget': self.cpu_budget,
+            'cpu_used': round(used, 3),
+            'window': self.window,
+            'deferring': self.last_reason,
+            'backlog': len(self._backlog),
+            'cpu_seconds_by_stage': by_stage,
+            **totals
+        }
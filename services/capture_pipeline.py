@@ -0,0 +1,387 @@
+"""Staged screenshot capture: grab -> dedupe -> encode -> encrypt -> persist, over bounded queues"""
+import os
+import time
+import queue
+from threading import Lock, Semaphore, Thread
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from .imaging import dhash, hamming_distance
+from .metrics import (timed, screenshot_stage_seconds, screenshot_failures_total, screenshot_frame_bytes,
+                      screenshots_deduplicated_total, screenshot_pipeline_dropped_total)
+
+# Frames waiting in front of each stage. When the grab queue is full the policy decides:
+# drop_oldest keeps the freshest frames, drop_newest keeps the queued ones, block makes
+# the capture loop wait. Later queues always block, so an accepted frame is never lost.
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIXLY_PIPELINE_QUEUE_SIZE', '2'))
+PIPELINE_DROP_POLICY = os.getenv('PIXLY_PIPELINE_DROP_POLICY', 'drop_oldest').lower()
+DROP_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+_STOP = object()
+
+class PipelineStage:
+    def __init__(self, name: str, func: Callable[[Dict], Optional[Dict]], queue_size: int = PIPELINE_QUEUE_SIZE,
+                 drop_policy: str = 'block', on_drop: Callable[[Dict], None] = None,
+                 on_cpu: Callable[[str, float], None] = None):
+        """
+        One worker thread applying func to the frames queued in front of it.
+
+        Args:
+            name (str): Stage name in stats and metrics
+            func (callable): Takes a frame dict, returns it for the next stage or None to stop it here
+            queue_size (int): Frames that can wait for this stage
+            drop_policy (str): What offer() does when the queue is full (see DROP_POLICIES)
+            on_drop (callable): Called with each frame dropped from the queue or failed in func
+            on_cpu (callable): Called with the stage name and the thread CPU seconds func took per frame
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.name = name
+        self.func = func
+        self.inbox = queue.Queue(maxsize=max(queue_size, 1))
+        self.drop_policy = drop_policy
+        self.on_drop = on_drop
+        self.on_cpu = on_cpu
+        self.next_stage = None
+        self.thread = None
+        self._lock = Lock()
+        self.started_at = None
+        self.counts = {'processed': 0, 'filtered': 0, 'dropped': 0, 'errors': 0}
+        self.busy_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.thread = Thread(target=self._run, name=f"pixly-capture-{self.name}", daemon=True)
+        self.thread.start()
+
+    def _dropped(self, frame):
+        with self._lock:
+            self.counts['dropped'] += 1
+        screenshot_pipeline_dropped_total.inc(stage=self.name)
+        if self.on_drop:
+            self.on_drop(frame)
+
+    def offer(self, frame: Dict) -> bool:
+        """Queue a frame according to the drop policy; returns False if a frame was dropped."""
+        if self.drop_policy == 'block':
+            self.inbox.put(frame)
+            return True
+        try:
+            self.inbox.put_nowait(frame)
+            return True
+        except queue.Full:
+            if self.drop_policy == 'drop_newest':
+                self._dropped(frame)
+                return False
+        # drop_oldest: make room by discarding the stalest waiting frame
+        while True:
+            try:
+                self._dropped(self.inbox.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                self.inbox.put_nowait(frame)
+                return False
+            except queue.Full:
+                continue
+
+    def stop(self):
+        """Let queued frames through, then end this stage and the ones after it."""
+        self.inbox.put(_STOP)
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while True:
+            frame = self.inbox.get()
+            if frame is _STOP:
+                if self.next_stage:
+                    self.next_stage.stop()
+                return
+            start = time.perf_counter()
+            cpu_start = time.thread_time()
+            try:
+                result = self.func(frame)
+            except Exception as e:
+                print(f"Error in capture {self.name} stage: {e}")
+                screenshot_failures_total.inc()
+                result, outcome = None, 'errors'
+                if self.on_drop:
+                    self.on_drop(frame)
+            else:
+                outcome = 'processed' if result is not None else 'filtered'
+            cpu = time.thread_time() - cpu_start
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - start
+                self.cpu_seconds += cpu
+                self.counts[outcome] += 1
+            if self.on_cpu:
+                self.on_cpu(self.name, cpu)
+            if result is not None and self.next_stage:
+                self.next_stage.offer(result)
+
+    def stats(self) -> Dict:
+        """Frames handled, dropped and per-second throughput since start."""
+        with self._lock:
+            counts = dict(self.counts)
+            busy = self.busy_seconds
+            cpu = self.cpu_seconds
+        handled = counts['processed'] + counts['filtered']
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        return {
+            **counts,
+            'queued': self.inbox.qsize(),
+            'avg_ms': round(busy / handled * 1000, 2) if handled else None,
+            'frames_per_second': round(handled / elapsed, 2) if elapsed else 0.0,
+            # Share of wall time the stage was working; the one near 1.0 is the bottleneck
+            'utilization': round(busy / elapsed, 3) if elapsed else 0.0,
+            'busy_seconds': round(busy, 3),
+            'cpu_seconds': round(cpu, 3)
+        }
+
+class CapturePipeline:
+    def __init__(self, capture, queue_size: int = PIPELINE_QUEUE_SIZE, drop_policy: str = PIPELINE_DROP_POLICY):
+        """
+        Run screenshot capture as stages connected by bounded queues.
+
+        The capture loop thread is the grab stage: it reads the foreground
+        window, grabs a frame and offers it to the dedupe stage. Dedupe,
+        encode, encrypt and persist each run on their own thread, so a slow
+        encode or insert overlaps the next grab instead of delaying it.
+        Frames keep their order through the stages, which lets a
+        near-duplicate reference a frame that is still being encoded.
+
+        Persist hands frames to the database writer as batched writes
+        without waiting for each commit, so a burst of frames is
+        group-committed (see ScreenshotDatabase). Up to one batch of frames
+        can wait on the writer; beyond that persist waits for a commit.
+
+        The capture's ResourceGovernor is charged with each stage's CPU time
+        and decides, per grab, whether the frame goes on or is held until
+        the game exits or the CPU budget frees up.
+
+        Args:
+            capture (ScreenshotCapture): Provides the grabber, window provider, settings and storage
+            queue_size (int): Frames that can wait in front of each stage
+            drop_policy (str): Policy of the grab queue (later queues block)
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.capture = capture
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.stages: List[PipelineStage] = []
+        self.running = False
+        self.last_static = False
+        # Unique frames accepted by dedupe but not yet persisted: (frame, phash)
+        self._in_flight = []
+        self._in_flight_lock = Lock()
+        self._grab_lock = Lock()
+        self._grab_counts = {'processed': 0, 'errors': 0}
+        self._grab_busy = 0.0
+        self._grab_cpu = 0.0
+        self._grab_started = None
+        # Frames submitted to the writer whose commit hasn't been handled yet
+        self._persist_limit = max(capture.db.batch_size, 1)
+        self._persist_slots = Semaphore(self._persist_limit)
+
+    def start(self):
+        if self.running:
+            return
+        charge = self.capture.governor.charge
+        self.stages = [
+            PipelineStage('dedupe', self._dedupe, self.queue_size, self.drop_policy, on_drop=self._forget,
+                          on_cpu=charge),
+            PipelineStage('encode', self._encode, self.queue_size, on_drop=self._forget, on_cpu=charge),
+            PipelineStage('encrypt', self._encrypt, self.queue_size, on_drop=self._forget, on_cpu=charge),
+            PipelineStage('persist', self._persist, self.queue_size, on_drop=self._forget, on_cpu=charge),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+        for stage in self.stages:
+            stage.start()
+        self._grab_started = time.monotonic()
+        self.running = True
+
+    def stop(self):
+        """Stop accepting frames and wait until the queued ones are stored."""
+        if not self.running:
+            return
+        self.running = False
+        # Frames held by the governor are still stored, game or not
+        self._catch_up(force=True)
+        self.stages[0].stop()
+        # Wait for the writer to commit (or fail) every submitted frame
+        for _ in range(self._persist_limit):
+            self._persist_slots.acquire()
+        for _ in range(self._persist_limit):
+            self._persist_slots.release()
+
+    def grab(self) -> Dict:
+        """
+        Grab stage: capture the foreground window and frame, and queue it for dedupe
+        (or hold it, if the governor defers heavy work right now).
+
+        Returns:
+            Dict: The window info and whether the last deduplicated frame was static
+        """
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        window_info = self.capture._get_active_window_info()
+        try:
+            with timed(screenshot_stage_seconds, stage='capture'):
+                image = self.capture._grab(window_info)
+        except Exception as e:
+            print(f"Error capturing screenshot: {e}")
+            screenshot_failures_total.inc()
+            image = None
+        cpu = time.thread_time() - cpu_start
+        with self._grab_lock:
+            self._grab_busy += time.perf_counter() - start
+            self._grab_cpu += cpu
+            self._grab_counts['processed' if image is not None else 'errors'] += 1
+        governor = self.capture.governor
+        governor.charge('grab', cpu)
+        if image is not None:
+            frame = {'image': image, 'window_info': window_info, 'timestamp': datetime.now().isoformat()}
+            if governor.defer_reason(self.capture._game_for(window_info['application'])) is None:
+                self._catch_up()
+            # Behind held frames, a new one waits its turn so frames stay in capture order
+            if governor.last_reason is not None or governor.backlog():
+                governor.defer(frame)
+            else:
+                self.stages[0].offer(frame)
+        return {'window_info': window_info, 'static': self.last_static}
+
+    def _catch_up(self, force: bool = False):
+        """Feed held frames to dedupe, oldest first, while the CPU budget allows (or all, if force)."""
+        governor = self.capture.governor
+        while force or not governor.over_budget():
+            frame = governor.next_deferred()
+            if frame is None:
+                return
+            # Blocks rather than dropping: these frames were already accepted
+            self.stages[0].inbox.put(frame)
+
+    def _forget(self, frame: Dict):
+        with self._in_flight_lock:
+            self._in_flight = [entry for entry in self._in_flight if entry[0] is not frame]
+
+    def _dedupe(self, frame: Dict) -> Optional[Dict]:
+        capture = self.capture
+        with timed(screenshot_stage_seconds, stage='phash'):
+            phash = dhash(frame['image'])
+        duplicate_of = capture._find_duplicate(phash)
+        original = None
+        if duplicate_of is None and capture.dedup_threshold >= 0:
+            with self._in_flight_lock:
+                for pending, pending_hash in reversed(self._in_flight):
+                    if hamming_distance(phash, pending_hash) <= capture.dedup_threshold:
+                        original = pending
+                        break
+        static = duplicate_of is not None or original is not None
+        self.last_static = static
+        capture._count_frame(static)
+        if static and capture.dedup_mode == 'skip':
+            screenshots_deduplicated_total.inc(mode='skip')
+            print(f"Screenshot skipped: {frame['window_info']['application']} matches a recent frame")
+            return None
+        frame.update(phash=phash, duplicate_of=duplicate_of, original=original)
+        if static:
+            # References borrow the original's data; nothing left to encode
+            del frame['image']
+        else:
+            with self._in_flight_lock:
+                self._in_flight.append((frame, phash))
+        return frame
+
+    def _encode(self, frame: Dict) -> Dict:
+        if 'image' in frame:
+            with timed(screenshot_stage_seconds, stage='encode'):
+                # Dedupe already hashed the frame
+                encoded = self.capture._encode_frame(frame.pop('image'), phash=False)
+            frame.update(data=encoded['data'], encode_ms=encoded['encode_ms'], thumbnail=encoded.get('thumbnail'))
+            if self.capture.capture_workers > 0:
+                # Spent in a worker process, outside this stage thread's CPU time
+                self.capture.governor.charge('encode', encoded['encode_ms'] / 1000)
+            screenshot_frame_bytes.observe(len(encoded['data']), format=self.capture.capture_settings['fmt'])
+        return frame
+
+    def _encrypt(self, frame: Dict) -> Dict:
+        if 'data' in frame:
+            with timed(screenshot_stage_seconds, stage='encrypt'):
+                frame['encrypted_data'] = self.capture._encrypt_data(frame['data'])
+                if frame.get('thumbnail'):
+                    frame['encrypted_thumbnail'] = self.capture._encrypt_data(frame['thumbnail'])
+        return frame
+
+    def _persist(self, frame: Dict) -> Dict:
+        capture = self.capture
+        insert = capture._frame_insert(
+            frame['window_info'], frame['timestamp'], frame['phash'], img_data=frame.get('data'),
+            encrypted_data=frame.get('encrypted_data', b''), encrypted_thumbnail=frame.get('encrypted_thumbnail'),
+            encode_ms=frame.get('encode_ms'))
+
+        def write(conn):
+            duplicate_of = frame['duplicate_of']
+            if frame['original'] is not None:
+                # The writer runs frames in submission order, so the original's insert (perhaps
+                # earlier in this same batch) has already set its id unless it failed
+                duplicate_of = frame['original'].get('id')
+                if duplicate_of is None:
+                    return None
+            frame['id'] = insert(conn, duplicate_of)
+            return frame['id'], duplicate_of
+
+        self._persist_slots.acquire()
+        started = time.perf_counter()
+        try:
+            future = capture.db.submit(write, batch=True)
+        except BaseException:
+            self._persist_slots.release()
+            raise
+        future.add_done_callback(lambda done: self._persisted(frame, done, started))
+        return frame
+
+    def _persisted(self, frame: Dict, future, started: float):
+        """Runs on the writer thread once the frame's batch has committed or failed."""
+        try:
+            screenshot_stage_seconds.observe(time.perf_counter() - started, stage='insert')
+            try:
+                result = future.result()
+            except Exception as e:
+                # Rolled back: a reference to this frame must not use the id it briefly had
+                frame.pop('id', None)
+                print(f"Error in capture persist stage: {e}")
+                screenshot_failures_total.inc()
+                return
+            if result is None:
+                print("Screenshot dropped: the frame it duplicates was not stored")
+                return
+            screenshot_id, duplicate_of = result
+            self.capture._frame_stored(screenshot_id, frame['window_info'], frame['timestamp'], frame['phash'],
+                                       duplicate_of)
+        finally:
+            self._forget(frame)
+            self._persist_slots.release()
+
+    def stats(self) -> Dict:
+        """Per-stage throughput, including the grab stage on the capture loop."""
+        with self._grab_lock:
+            grabbed = dict(self._grab_counts)
+            busy = self._grab_busy
+            cpu = self._grab_cpu
+        elapsed = time.monotonic() - self._grab_started if self._grab_started else 0
+        stages = {'grab': {
+            **grabbed,
+            'avg_ms': round(busy / grabbed['processed'] * 1000, 2) if grabbed['processed'] else None,
+            'frames_per_second': round(grabbed['processed'] / elapsed, 2) if elapsed else 0.0,
+            'utilization': round(busy / elapsed, 3) if elapsed else 0.0,
+            'busy_seconds': round(busy, 3),
+            'cpu_seconds': round(cpu, 3)
+        }}
+        for stage in self.stages:
+            stages[stage.name] = stage.stats()
+        return {'running': self.running, 'queue_size': self.queue_size,
+                'drop_policy': self.drop_policy, 'stages': stages}
@@ -0,0 +1,91 @@
+"""Adaptive capture rate: faster after a window or game switch, slower on static frames or outside games"""
+import os
+from typing import Optional
+
+# Interval bounds around the configured capture interval
+CAPTURE_MIN_INTERVAL = float(os.getenv('PIXLY_CAPTURE_MIN_INTERVAL', '5'))
+CAPTURE_MAX_INTERVAL = float(os.getenv('PIXLY_CAPTURE_MAX_INTERVAL', '300'))
+# Frames captured at the minimum interval after the foreground window or game changes
+CAPTURE_BOOST_FRAMES = int(os.getenv('PIXLY_CAPTURE_BOOST_FRAMES', '3'))
+# Interval multiplier per consecutive near-duplicate frame
+CAPTURE_STATIC_BACKOFF = float(os.getenv('PIXLY_CAPTURE_STATIC_BACKOFF', '1.5'))
+# Interval multiplier while the foreground application is not a known game
+CAPTURE_IDLE_FACTOR = float(os.getenv('PIXLY_CAPTURE_IDLE_FACTOR', '4'))
+
+class AdaptiveSchedule:
+    def __init__(self, interval: float = 30, min_interval: float = CAPTURE_MIN_INTERVAL,
+                 max_interval: float = CAPTURE_MAX_INTERVAL, boost_frames: int = CAPTURE_BOOST_FRAMES,
+                 static_backoff: float = CAPTURE_STATIC_BACKOFF, idle_factor: float = CAPTURE_IDLE_FACTOR):
+        """
+        Decide the delay before the next capture from what the last one saw.
+
+        Right after the foreground window or detected game changes, the next
+        boost_frames captures come at min_interval. Each consecutive
+        near-duplicate frame multiplies the interval by static_backoff, and
+        frames outside a known game by idle_factor, up to max_interval. Any
+        change resets the backoff.
+
+        Args:
+            interval (float): Base capture interval in seconds
+            min_interval (float): Shortest interval (never longer than interval)
+            max_interval (float): Longest interval (never shorter than interval)
+            boost_frames (int): Fast captures after a change (0 disables)
+            static_backoff (float): Multiplier per consecutive static frame (1 disables)
+            idle_factor (float): Multiplier when no game is in the foreground (1 disables)
+        """
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.boost_frames = boost_frames
+        self.static_backoff = static_backoff
+        self.idle_factor = idle_factor
+        self.reset()
+
+    def reset(self):
+        """Forget the previous window, so the next observation sets a new baseline."""
+        self._window = None
+        self._game = None
+        self._boost_left = 0
+        self._static_streak = 0
+        self.last_interval = self.interval
+        self.last_reason = 'base'
+
+    def observe(self, window: tuple, game: Optional[str], static: bool) -> float:
+        """
+        Record a capture and return the delay before the next one.
+
+        Args:
+            window (tuple): Identity of the foreground window (e.g. application and pid)
+            game (str): Game the window belongs to, or None
+            static (bool): Whether the frame was a near-duplicate of a recent one
+
+        Returns:
+            float: Seconds until the next capture
+        """
+        changed = self._window is not None and (window != self._window or game != self._game)
+        self._window, self._game = window, game
+        if changed:
+            self._boost_left = self.boost_frames
+            self._static_streak = 0
+        elif static:
+            self._static_streak += 1
+        else:
+            self._static_streak = 0
+
+        low = min(self.min_interval, self.interval)
+        high = max(self.max_interval, self.interval)
+        if self._boost_left > 0:
+            self._boost_left -= 1
+            delay, reason = low, 'switch'
+        else:
+            delay, reason = self.interval, 'base'
+            if self._static_streak:
+                # Capped exponent: the clamp below applies long before, and a long streak can't overflow
+                delay *= self.static_backoff ** min(self._static_streak, 64)
+                reason = 'static'
+            if game is None:
+                delay *= self.idle_factor
+                reason = 'idle' if reason == 'base' else reason
+        self.last_interval = min(max(delay, low), high)
+        self.last_reason = reason
+        return self.last_interval
@@ -1,113 +1,383 @@
 """ Includes gemini chatbot integration"""
 import os
-import google.generativeai as genai
+import time
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from services.screenshot import get_recent_screenshots, get_screenshot_by_id, get_screenshot_stats
-from services.game_detection import detect_current_game
-from services.vector_service import search_knowledge
+from services.game_detection import detect_current_game, get_cached_game
+from services.vector_service import search_knowledge, generate_embeddings
+from services.response_cache import response_cache
+from services.llm_backend import LLMBackend, create_backend
+from services.container import container
+from services.metrics import chat_stage_seconds, record_server_timing
+from services.imaging import prepare_vision_image
 import base64
 
-system_prompt_file = open("PROMPTS.txt","r")
-system_prompt = system_prompt_file.read()
 load_dotenv()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv('GOOGLE_API_KEY'),)
-model = genai.GenerativeModel(model_name="gemini-2.5-flash-lite",system_instruction=system_prompt)
+# Blocking work (psutil scans, embeddings/Chroma, Gemini calls) runs on bounded
+# executors so a slow request never stalls the event loop for everyone else.
+CHAT_MAX_WORKERS = int(os.getenv('PIXLY_CHAT_MAX_WORKERS', '8'))
+LLM_MAX_CONCURRENCY = int(os.getenv('PIXLY_LLM_MAX_CONCURRENCY', '4'))
+STAGE_TIMEOUTS = {
+    'detection': float(os.getenv('PIXLY_DETECTION_TIMEOUT', '3')),
+    'embedding': float(os.getenv('PIXLY_RETRIEVAL_TIMEOUT', '5')),
+    'retrieval': float(os.getenv('PIXLY_RETRIEVAL_TIMEOUT', '5')),
+    'screenshots': float(os.getenv('PIXLY_SCREENSHOTS_TIMEOUT', '3')),
+    'screenshot_stats': float(os.getenv('PIXLY_SCREENSHOTS_TIMEOUT', '3')),
+    'image': float(os.getenv('PIXLY_IMAGE_TIMEOUT', '5')),
+    'llm': float(os.getenv('PIXLY_LLM_TIMEOUT', '60')),
+}
+_context_executor = ThreadPoolExecutor(max_workers=CHAT_MAX_WORKERS, thread_name_prefix="pixly-context")
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="pixly-llm")
+
+def load_system_prompt() -> str:
+    """Read the persona / grounding instructions from PROMPTS.txt."""
+    with open("PROMPTS.txt", "r") as f:
+        return f.read()
+
+def _create_llm_backend() -> LLMBackend:
+    """Create the LLM backend (Gemini unless PIXLY_LLM_BACKEND says otherwise)."""
+    return create_backend(system_instruction=load_system_prompt())
+
+# Built on first use (or by the startup warmup)
+container.register('llm_backend', _create_llm_backend)
+
+def get_llm_backend() -> LLMBackend:
+    """Get the shared LLM backend."""
+    return container.get('llm_backend')
 
 def set_api_key(new_key: str):
-    """Update the Google API key at runtime and reinitialize the model."""
+    """Update the Google API key at runtime and reinitialize the LLM backend."""
     try:
         if not new_key:
             raise ValueError("Empty API key")
         os.environ['GOOGLE_API_KEY'] = new_key
-        genai.configure(api_key=new_key)
-        global model
-        model = genai.GenerativeModel(model_name="gemini-2.5-flash-lite", system_instruction=system_prompt)
+        container.set('llm_backend', _create_llm_backend())
         return True
     except Exception as e:
         print(f"Error setting API key: {e}")
         return False
 
-async def chat_with_gemini(message: str, image_data: str = None):
+def set_llm_backend(backend: LLMBackend):
+    """Swap the LLM backend at runtime (e.g. to the offline fake for benchmarks)."""
+    container.set('llm_backend', backend)
+
+async def _run_stage(stage: str, func, *args, **kwargs):
+    """Run a blocking call on the executor for its stage, bounded by the stage timeout.
+
+    The LLM stage gets its own executor so its worker count doubles as the limit
+    on concurrent Gemini calls. A timed-out call keeps running in its worker
+    thread, but the request stops waiting for it.
+    """
+    loop = asyncio.get_running_loop()
+    executor = _llm_executor if stage == 'llm' else _context_executor
+    # Carry the request context into the worker so metrics recorded there reach Server-Timing
+    context = contextvars.copy_context()
+    return await asyncio.wait_for(
+        loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs)),
+        timeout=STAGE_TIMEOUTS[stage]
+    )
+
+SCREENSHOT_KEYWORDS = ['screenshot', 'screen', 'capture', 'git', 'visual', 'see', 'show me']
+
+def _is_screenshot_query(message: str) -> bool:
+    """Check if the user is asking about their stored screenshots."""
+    return any(keyword in message.lower() for keyword in SCREENSHOT_KEYWORDS)
+
+def _record_stage(timings: dict, name: str, start: float, stage: str = None):
+    """Record the time since start under name (ms) and in the stage histogram and Server-Timing."""
+    elapsed = time.perf_counter() - start
+    if timings is not None:
+        timings[name] = round(elapsed * 1000, 2)
+    chat_stage_seconds.observe(elapsed, stage=stage or name)
+    record_server_timing(stage or name, elapsed * 1000)
+
+async def _timed_stage(timings: dict, name: str, stage: str, func, *args, **kwargs):
+    """Run a stage through _run_stage and record its wall time in milliseconds under name."""
+    start = time.perf_counter()
+    try:
+        return await _run_stage(stage, func, *args, **kwargs)
+    finally:
+        _record_stage(timings, name, start)
+
+async def _await_stage(task, default=None, label: str = "Stage"):
+    """Await a stage task, falling back to default if it timed out or failed."""
     try:
-        # Detect current game
-        detected_game = detect_current_game(message)
-        
-        # If image data is provided, use vision capabilities
-        if image_data:
-            import PIL.Image
-            import io
-            
-            # Decode base64 image
-            image_bytes = base64.b64decode(image_data)
-            image = PIL.Image.open(io.BytesIO(image_bytes))
-            
-            # Enhanced message for image analysis
-            enhanced_message = f"""
-            {message}
-            
-            LIVE SCREENSHOT PROVIDED: I can see a screenshot that the user just captured. 
-            Please analyze this image in the context of gaming and provide specific, actionable advice based on what you can see.
-            Focus on game mechanics, strategies, UI elements, or any gaming-related aspects visible in the screenshot.
-            """
-            
-            # Add game context if detected
-            if detected_game:
-                enhanced_message += f"\n\nDETECTED GAME: {detected_game.upper()}"
-            
-            # Generate content with image
-            response = model.generate_content([enhanced_message, image])
-            return {"response": response.text}
-        
-        # Check if user is asking about screenshots (existing functionality)
-        screenshot_keywords = ['screenshot', 'screen', 'capture', 'git', 'visual', 'see', 'show me']
-        if any(keyword in message.lower() for keyword in screenshot_keywords):
-            # Get recent screenshots
-            recent_screenshots = get_recent_screenshots(limit=5)
-            screenshot_stats = get_screenshot_stats()
-            
-            # Prepare screenshot context
-            screenshot_context = f"""
-            SCREENSHOT DATA AVAILABLE:
-            - Total screenshots stored: {screenshot_stats['total_screenshots']}
-            - Recent applications captured: {[app[0] for app in screenshot_stats['applications'][:5]]}
-            - Recent screenshots: {recent_screenshots}
-            
-            You can analyze these screenshots to help with gaming-related questions. 
-            The screenshots are automatically captured and show what applications the user was using.
-            """
-            
-            # Add screenshot context to the message
-            enhanced_message = f"{message}\n\n{screenshot_context}"
-            response = model.generate_content(enhanced_message)
-            return {"response": response.text}
+        return await task
+    except asyncio.TimeoutError:
+        print(f"{label} timed out")
+    except Exception as e:
+        print(f"Error in {label.lower()}: {e}")
+    return default
+
+def _load_vision_image(image_bytes: bytes = None, screenshot_id: int = None):
+    """Prepare the model input for an uploaded image or a stored screenshot (None if not found)."""
+    if screenshot_id is not None:
+        image_bytes = get_screenshot_by_id(screenshot_id)
+        if not image_bytes:
+            return None
+    return prepare_vision_image(image_bytes)
+
+async def _assemble_context(message: str, image_bytes: bytes = None, screenshot_id: int = None) -> dict:
+    """Gather the context a prompt needs, running independent stages concurrently.
+
+    Game detection, image preparation, screenshot lookups and knowledge
+    retrieval are started together. Retrieval starts speculatively on the last detected game while
+    detection refreshes; if detection settles on a different game the
+    speculative result is discarded and retrieval runs again for the new one.
+
+    Returns a dict with detected_game, image (the downscaled model input, for
+    vision questions), knowledge_results, recent_screenshots, screenshot_stats,
+    query_embedding (text questions only) and per-stage timings (ms),
+    including the total.
+    """
+    timings = {}
+    start = time.perf_counter()
+    has_image = bool(image_bytes) or screenshot_id is not None
+    wants_screenshots = not has_image and _is_screenshot_query(message)
+    wants_knowledge = not has_image and not wants_screenshots
+
+    detection = asyncio.create_task(_timed_stage(timings, 'detection', 'detection', detect_current_game, message))
+
+    # Loading, decrypting and downscaling a 4K frame is real work; overlap it with detection
+    image_task = None
+    if has_image:
+        image_task = asyncio.create_task(
+            _timed_stage(timings, 'image', 'image', _load_vision_image, image_bytes, screenshot_id))
+
+    recent_task = stats_task = None
+    if wants_screenshots:
+        recent_task = asyncio.create_task(
+            _timed_stage(timings, 'screenshots', 'screenshots', get_recent_screenshots, limit=5))
+        stats_task = asyncio.create_task(
+            _timed_stage(timings, 'screenshot_stats', 'screenshot_stats', get_screenshot_stats))
+
+    # The query embedding is shared by retrieval and the response cache
+    embedding_task = None
+    if wants_knowledge:
+        embedding_task = asyncio.create_task(
+            _timed_stage(timings, 'embedding', 'embedding', generate_embeddings, [message]))
+
+    async def retrieve(game):
+        try:
+            # Shielded so cancelling a speculative retrieval keeps the shared embedding alive
+            query_embedding = await asyncio.shield(embedding_task)
+        except Exception:
+            query_embedding = None
+        return await _timed_stage(timings, 'retrieval', 'retrieval', search_knowledge, game, message,
+                                  limit=3, query_embedding=query_embedding or None)
+
+    speculative_game = get_cached_game() if wants_knowledge else None
+    speculative = None
+    if speculative_game:
+        speculative = asyncio.create_task(retrieve(speculative_game))
+
+    detected_game = await _await_stage(detection, label="Game detection")
+
+    knowledge_results = []
+    if wants_knowledge and detected_game:
+        if speculative and detected_game == speculative_game:
+            knowledge_results = await _await_stage(speculative, [], label="Knowledge search")
         else:
-            # Enhanced chat with game knowledge
-            enhanced_message = message
-            
-            # Add game context and knowledge if detected
-            if detected_game:
-                enhanced_message += f"\n\nDETECTED GAME: {detected_game.upper()}"
-                
-                # Search for relevant knowledge
-                try:
-                    knowledge_results = search_knowledge(detected_game, message, limit=3)
-                    
-                    if knowledge_results:
-                        knowledge_context = "\n\nRELEVANT KNOWLEDGE FROM GAME DATABASE:\n"
-                        for i, result in enumerate(knowledge_results, 1):
-                            knowledge_context += f"\n{i}. {result['metadata'].get('title', 'Unknown Title')}\n"
-                            knowledge_context += f"   Source: {result['metadata'].get('content_type', 'unknown').upper()}\n"
-                            knowledge_context += f"   Content: {result['content'][:200]}...\n"
-                            knowledge_context += f"   URL: {result['metadata'].get('url', 'N/A')}\n"
-                        
-                        enhanced_message += knowledge_context
-                except Exception as e:
-                    print(f"Error searching knowledge: {e}")
-            
-            response = model.generate_content(enhanced_message)
-            return {"response": response.text}
+            if speculative:
+                speculative.cancel()
+            knowledge_results = await _await_stage(retrieve(detected_game), [], label="Knowledge search")
+    elif speculative:
+        speculative.cancel()
+
+    query_embedding = None
+    if embedding_task:
+        query_embedding = await _await_stage(embedding_task, label="Query embedding")
+
+    image = None
+    if image_task:
+        image = await _await_stage(image_task, label="Image preparation")
+
+    recent_screenshots = screenshot_stats = None
+    if wants_screenshots:
+        recent_screenshots = await _await_stage(recent_task, label="Screenshot lookup")
+        screenshot_stats = await _await_stage(stats_task, label="Screenshot stats")
+
+    _record_stage(timings, 'total', start, stage='context')
+    return {
+        'detected_game': detected_game,
+        'image': image,
+        'screenshot_id': screenshot_id,
+        'knowledge_results': knowledge_results or [],
+        'recent_screenshots': recent_screenshots,
+        'screenshot_stats': screenshot_stats,
+        'query_embedding': query_embedding or None,
+        'timings': timings
+    }
+
+def _build_contents(message: str, image_bytes: bytes, context: dict):
+    """Build the generate_content payload (prompt text, plus image when provided)."""
+    detected_game = context['detected_game']
+
+    screenshot_id = context.get('screenshot_id')
+
+    # If an image is provided, use vision capabilities
+    if image_bytes or screenshot_id is not None:
+        image = context['image']
+        if image is None:
+            if screenshot_id is not None:
+                raise ValueError(f"Screenshot {screenshot_id} not found")
+            raise ValueError("Could not read the attached image")
+
+        if screenshot_id is not None:
+            source = f"STORED SCREENSHOT PROVIDED: I can see screenshot #{screenshot_id}, which was captured earlier during the user's session."
+        else:
+            source = "LIVE SCREENSHOT PROVIDED: I can see a screenshot that the user just captured."
+
+        # Enhanced message for image analysis
+        enhanced_message = f"""
+        {message}
+
+        {source}
+        Please analyze this image in the context of gaming and provide specific, actionable advice based on what you can see.
+        Focus on game mechanics, strategies, UI elements, or any gaming-related aspects visible in the screenshot.
+        """
+
+        # Add game context if detected
+        if detected_game:
+            enhanced_message += f"\n\nDETECTED GAME: {detected_game.upper()}"
+
+        return [enhanced_message, image]
+
+    # Check if user is asking about screenshots (existing functionality)
+    if _is_screenshot_query(message):
+        recent_screenshots = context['recent_screenshots']
+        screenshot_stats = context['screenshot_stats']
+        if recent_screenshots is None or screenshot_stats is None:
+            return message
+
+        # Prepare screenshot context
+        screenshot_context = f"""
+        SCREENSHOT DATA AVAILABLE:
+        - Total screenshots stored: {screenshot_stats['total_screenshots']}
+        - Recent applications captured: {[app[0] for app in screenshot_stats['applications'][:5]]}
+        - Recent screenshots: {recent_screenshots}
+
+        You can analyze these screenshots to help with gaming-related questions.
+        The screenshots are automatically captured and show what applications the user was using.
+        """
+
+        # Add screenshot context to the message
+        return f"{message}\n\n{screenshot_context}"
+
+    # Enhanced chat with game knowledge
+    enhanced_message = message
+
+    # Add game context and knowledge if detected
+    if detected_game:
+        enhanced_message += f"\n\nDETECTED GAME: {detected_game.upper()}"
+
+        knowledge_results = context['knowledge_results']
+        if knowledge_results:
+            knowledge_context = "\n\nRELEVANT KNOWLEDGE FROM GAME DATABASE:\n"
+            for i, result in enumerate(knowledge_results, 1):
+                knowledge_context += f"\n{i}. {result['metadata'].get('title', 'Unknown Title')}\n"
+                knowledge_context += f"   Source: {result['metadata'].get('content_type', 'unknown').upper()}\n"
+                knowledge_context += f"   Content: {result['content'][:200]}...\n"
+                knowledge_context += f"   URL: {result['metadata'].get('url', 'N/A')}\n"
+
+            enhanced_message += knowledge_context
+
+    return enhanced_message
+
+async def _prepare_contents(message: str, image_data: str = None, timings: dict = None,
+                           image_bytes: bytes = None, screenshot_id: int = None):
+    """Assemble context and build the prompt, copying stage timings into timings if given.
+
+    The image comes base64-encoded in image_data (JSON clients), as raw
+    image_bytes (binary uploads), or by reference as the screenshot_id of a
+    stored capture, which is loaded and decrypted server-side.
+
+    Returns (contents, context).
+    """
+    if image_data and not image_bytes:
+        image_bytes = base64.b64decode(image_data)
+    context = await _assemble_context(message, image_bytes, screenshot_id)
+    start = time.perf_counter()
+    contents = _build_contents(message, image_bytes, context)
+    if timings is not None:
+        timings.update(context['timings'])
+    _record_stage(timings, 'prompt_build', start)
+    return contents, context
+
+def _lookup_cached_answer(context: dict):
+    """Return a cached answer for this question, or None (only text questions are cached)."""
+    if not context['query_embedding']:
+        return None
+    return response_cache.lookup(context['detected_game'], context['query_embedding'][0])
+
+def _remember_answer(message: str, context: dict, answer: str, generation_seconds: float):
+    """Cache an answer to a text question for later similar questions about the same game."""
+    if context['query_embedding']:
+        response_cache.store(context['detected_game'], message, context['query_embedding'][0],
+                             answer, generation_seconds)
+
+async def chat_with_gemini(message: str, image_data: str = None, timings: dict = None,
+                           image_bytes: bytes = None, screenshot_id: int = None):
+    """Answer a chat message; per-stage timings (ms) are recorded into timings if given.
+
+    Pass an image base64-encoded as image_data, as raw image_bytes, or by
+    reference as the screenshot_id of a stored capture.
+    """
+    try:
+        contents, context = await _prepare_contents(message, image_data, timings, image_bytes, screenshot_id)
+        cached = _lookup_cached_answer(context)
+        if cached is not None:
+            return {"response": cached}
+
+        start = time.perf_counter()
+        answer = await _run_stage('llm', get_llm_backend().generate, contents)
+        _record_stage(timings, 'llm', start)
+        _remember_answer(message, context, answer, time.perf_counter() - start)
+        return {"response": answer}
+    except asyncio.TimeoutError:
+        print("LLM request timed out")
+        return {"response": "Error processing request: the model took too long to respond"}
+    except Exception as e:
+        print(e)
+        return {"response": f"Error processing request: {str(e)}"}
+
+def _next_chunk(chunks):
+    """Pull the next chunk from a backend stream, or None when it ends."""
+    return next(chunks, None)
+
+async def stream_chat_with_gemini(message: str, image_data: str = None, timings: dict = None,
+                                  image_bytes: bytes = None, screenshot_id: int = None):
+    """Yield the response text chunk by chunk as the LLM backend generates it.
+
+    Every pull from the backend stream happens on the LLM executor, so waiting
+    for the next token never blocks the event loop.
+    """
+    try:
+        contents, context = await _prepare_contents(message, image_data, timings, image_bytes, screenshot_id)
+        cached = _lookup_cached_answer(context)
+        if cached is not None:
+            yield cached
+            return
+
+        start = time.perf_counter()
+        parts = []
+        chunks = iter(await _run_stage('llm', get_llm_backend().stream, contents))
+        while True:
+            text = await _run_stage('llm', _next_chunk, chunks)
+            if text is None:
+                break
+            parts.append(text)
+            yield text
+        _record_stage(timings, 'llm', start)
+        _remember_answer(message, context, "".join(parts), time.perf_counter() - start)
+    except asyncio.TimeoutError:
+        print("LLM stream timed out")
+        yield "Error processing request: the model took too long to respond"
     except Exception as e:
         print(e)
-        return {"response": f"Error processing request: {str(e)}"}
\ No newline at end of file
+        yield f"Error processing request: {str(e)}"
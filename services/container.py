@@ -0,0 +1,115 @@
+"""Lazily constructed shared services, with optional background warmup and readiness status"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+class ServiceContainer:
+    def __init__(self):
+        """Initialize an empty container. Services register factories at import time."""
+        self._factories = {}
+        self._shutdown_hooks = {}
+        self._warmup_order = []
+        self._instances = {}
+        self._locks = {}
+        self._load_seconds = {}
+        self._errors = {}
+        self._warmup_thread = None
+
+    def register(self, name: str, factory: Callable, shutdown: Callable = None, warmup: bool = True):
+        """
+        Register how to build a service. Nothing is constructed until first use.
+
+        Args:
+            name (str): Service name used with get()
+            factory (Callable): Zero-argument callable that builds the service
+            shutdown (Callable): Optional hook called with the instance on shutdown()
+            warmup (bool): Whether warmup() should build this service
+        """
+        self._factories[name] = factory
+        self._locks.setdefault(name, threading.Lock())
+        if shutdown:
+            self._shutdown_hooks[name] = shutdown
+        if warmup and name not in self._warmup_order:
+            self._warmup_order.append(name)
+
+    def get(self, name: str):
+        """Return the service, building it on first use (thread-safe, built once)."""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                try:
+                    instance = self._factories[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                self._load_seconds[name] = round(time.perf_counter() - start, 3)
+                self._errors.pop(name, None)
+                self._instances[name] = instance
+            return instance
+
+    def set(self, name: str, instance):
+        """Replace a service instance (e.g. after reconfiguration, or with a test double)."""
+        with self._locks.setdefault(name, threading.Lock()):
+            self._instances[name] = instance
+            self._errors.pop(name, None)
+
+    def reset(self, name: str):
+        """Drop a built instance so the next get() rebuilds it."""
+        with self._locks[name]:
+            self._instances.pop(name, None)
+            self._load_seconds.pop(name, None)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def warmup(self, names: Optional[List[str]] = None, background: bool = True):
+        """Build services ahead of first use, in a daemon thread unless background is False."""
+        names = names or list(self._warmup_order)
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Error warming up {name}: {e}")
+
+        if not background:
+            load_all()
+            return None
+        self._warmup_thread = threading.Thread(target=load_all, name="pixly-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def status(self) -> Dict:
+        """Report which services are loaded, how long they took, and any build errors."""
+        components = {}
+        for name in self._factories:
+            components[name] = {
+                'loaded': self.is_loaded(name),
+                'load_seconds': self._load_seconds.get(name),
+                'error': self._errors.get(name)
+            }
+        return {
+            'ready': all(self.is_loaded(name) for name in self._warmup_order),
+            'warming_up': bool(self._warmup_thread and self._warmup_thread.is_alive()),
+            'components': components
+        }
+
+    def shutdown(self):
+        """Run shutdown hooks for every service that was built."""
+        for name, hook in self._shutdown_hooks.items():
+            instance = self._instances.get(name)
+            if instance is None:
+                continue
+            try:
+                hook(instance)
+            except Exception as e:
+                print(f"Error shutting down {name}: {e}")
+
+# Global instance
+container = ServiceContainer()
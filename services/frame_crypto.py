@@ -0,0 +1,224 @@
+"""Versioned, chunked AES-GCM format for stored screenshot payloads, with key IDs for rotation"""
+import io
+import os
+import json
+import struct
+import base64
+import argparse
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+KEYRING_PATH = os.getenv('PIXLY_KEYRING_PATH', '')
+# 'aesgcm' writes the format below; 'fernet' keeps writing the legacy tokens
+SCREENSHOT_CIPHER = os.getenv('PIXLY_SCREENSHOT_CIPHER', 'aesgcm').lower()
+CRYPTO_CHUNK_SIZE = int(os.getenv('PIXLY_CRYPTO_CHUNK_KB', '1024')) * 1024
+
+# Layout: MAGIC, version, key id, chunk size, nonce prefix, then one AES-GCM sealed
+# chunk (ciphertext + 16-byte tag) per chunk_size bytes of plaintext. Fernet tokens are
+# base64 text, so they never start with the NUL of MAGIC.
+MAGIC = b'\x00PX'
+VERSION = 1
+HEADER = struct.Struct('>3sBII8s')
+TAG_SIZE = 16
+
+def default_keyring_path(db_path: str) -> str:
+    """Key ring file for a database: PIXLY_KEYRING_PATH, or screenshot_keyring.json next to it."""
+    if KEYRING_PATH:
+        return KEYRING_PATH
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'screenshot_keyring.json')
+
+class KeyRing:
+    def __init__(self, keys: Dict[int, bytes], active: int, path: str = None):
+        """
+        AES-256 keys by ID; new payloads use the active one, old ones keep naming theirs.
+
+        Args:
+            keys (Dict[int, bytes]): 32-byte keys by key ID
+            active (int): Key ID used for encryption
+            path (str): File the ring is saved to
+        """
+        if active not in keys:
+            raise ValueError(f"Active key {active} is not in the key ring")
+        self.keys = keys
+        self.active = active
+        self.path = path
+
+    @classmethod
+    def load_or_create(cls, path: str) -> 'KeyRing':
+        """Load the key ring file, creating one with a fresh key if it doesn't exist."""
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                stored = json.load(f)
+            keys = {int(key_id): base64.b64decode(key) for key_id, key in stored['keys'].items()}
+            return cls(keys, int(stored['active']), path)
+        ring = cls({1: AESGCM.generate_key(bit_length=256)}, 1, path)
+        ring.save()
+        return ring
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'active': self.active,
+                       'keys': {str(key_id): base64.b64encode(key).decode() for key_id, key in self.keys.items()}},
+                      f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def rotate(self) -> int:
+        """Add a new key and make it active (old keys stay for reading); returns its ID."""
+        key_id = max(self.keys) + 1
+        self.keys[key_id] = AESGCM.generate_key(bit_length=256)
+        self.active = key_id
+        if self.path:
+            self.save()
+        return key_id
+
+class FrameCipher:
+    def __init__(self, keyring: KeyRing, legacy=None, chunk_size: int = CRYPTO_CHUNK_SIZE,
+                 write_format: str = SCREENSHOT_CIPHER):
+        """
+        Encrypt screenshot payloads in the chunked AES-GCM format and read both formats.
+
+        Each chunk is sealed separately with a nonce made of a random per-payload
+        prefix and the chunk index; the header and a last-chunk flag are
+        authenticated with it, so chunks can't be reordered, swapped between
+        payloads or truncated. Unlike Fernet the output is raw bytes (no base64)
+        and a payload can be encrypted or decrypted one chunk at a time.
+
+        Args:
+            keyring (KeyRing): Keys by ID
+            legacy (Fernet): Cipher for payloads written before this format (None if there are none)
+            chunk_size (int): Plaintext bytes per chunk
+            write_format (str): 'aesgcm', or 'fernet' to keep writing legacy tokens
+        """
+        if write_format not in ('aesgcm', 'fernet'):
+            raise ValueError(f"Unknown screenshot cipher: {write_format}")
+        if write_format == 'fernet' and legacy is None:
+            raise ValueError("Writing Fernet tokens needs the legacy key")
+        self.keyring = keyring
+        self.legacy = legacy
+        self.chunk_size = chunk_size
+        self.write_format = write_format
+        self._aead = {}
+
+    @property
+    def write_key_id(self) -> Optional[int]:
+        """Key ID new payloads are written with (None for Fernet)."""
+        return self.keyring.active if self.write_format == 'aesgcm' else None
+
+    def _cipher(self, key_id: int) -> AESGCM:
+        if key_id not in self._aead:
+            if key_id not in self.keyring.keys:
+                raise ValueError(f"Unknown screenshot key ID {key_id}")
+            self._aead[key_id] = AESGCM(self.keyring.keys[key_id])
+        return self._aead[key_id]
+
+    @staticmethod
+    def key_id_of(token: bytes) -> Optional[int]:
+        """Key ID a payload was encrypted with, or None for a Fernet token."""
+        if token[:len(MAGIC)] != MAGIC:
+            return None
+        return HEADER.unpack_from(token)[2]
+
+    @staticmethod
+    def header_prefix(key_id: int) -> bytes:
+        """First bytes of every payload encrypted with key_id (for finding the others in SQL)."""
+        return HEADER.pack(MAGIC, VERSION, key_id, 0, b'\0' * 8)[:8]
+
+    @staticmethod
+    def _aad(header: bytes, index: int, final: bool) -> bytes:
+        return header + struct.pack('>I?', index, final)
+
+    @staticmethod
+    def _nonce(prefix: bytes, index: int) -> bytes:
+        return prefix + struct.pack('>I', index)
+
+    def encrypt_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Encrypt plaintext arriving in pieces of any size; yields the header, then sealed chunks."""
+        if self.write_format == 'fernet':
+            yield self.legacy.encrypt(b''.join(chunks))
+            return
+        key_id = self.keyring.active
+        aead = self._cipher(key_id)
+        prefix = os.urandom(8)
+        header = HEADER.pack(MAGIC, VERSION, key_id, self.chunk_size, prefix)
+        yield header
+
+        pending = b''
+        index = 0
+        for piece in chunks:
+            # Only a leftover shorter than a chunk is ever copied; full chunks are sealed in place
+            data = memoryview(pending + piece if pending else piece)
+            offset = 0
+            # Hold back at least one byte so the last chunk is only sealed once the input ends
+            while len(data) - offset > self.chunk_size:
+                chunk = data[offset:offset + self.chunk_size]
+                yield aead.encrypt(self._nonce(prefix, index), chunk, self._aad(header, index, False))
+                offset += self.chunk_size
+                index += 1
+            pending = bytes(data[offset:])
+        yield aead.encrypt(self._nonce(prefix, index), pending, self._aad(header, index, True))
+
+    def encrypt(self, data: bytes) -> bytes:
+        return b''.join(self.encrypt_stream([data]))
+
+    def decrypt_stream(self, source: BinaryIO, offset: int = 0) -> Iterator[bytes]:
+        """
+        Decrypt a payload read from a file object, yielding plaintext one chunk at a time.
+
+        With an offset, plaintext starts there: the chunks before the one holding it are
+        seeked past without being read or decrypted (a Fernet token is decrypted whole).
+        """
+        start = source.read(HEADER.size)
+        if start[:len(MAGIC)] != MAGIC:
+            if self.legacy is None:
+                raise ValueError("Payload is not in the screenshot format and no legacy key is loaded")
+            yield self.legacy.decrypt(start + source.read())[offset:]
+            return
+        if len(start) < HEADER.size:
+            raise ValueError("Truncated screenshot payload")
+        _, version, key_id, chunk_size, prefix = HEADER.unpack(start)
+        if version != VERSION:
+            raise ValueError(f"Unsupported screenshot payload version {version}")
+        aead = self._cipher(key_id)
+
+        sealed_size = chunk_size + TAG_SIZE
+        index, skip = divmod(offset, chunk_size)
+        if index:
+            source.seek(index * sealed_size, os.SEEK_CUR)
+        sealed = source.read(sealed_size)
+        if not sealed:
+            raise ValueError("Offset is past the end of the screenshot payload")
+        while True:
+            following = source.read(sealed_size)
+            final = not following
+            chunk = aead.decrypt(self._nonce(prefix, index), sealed, self._aad(start, index, final))
+            yield chunk[skip:] if skip else chunk
+            if final:
+                return
+            skip = 0
+            sealed = following
+            index += 1
+
+    def decrypt(self, token: bytes) -> bytes:
+        if token[:len(MAGIC)] != MAGIC:
+            if self.legacy is None:
+                raise ValueError("Payload is not in the screenshot format and no legacy key is loaded")
+            return self.legacy.decrypt(token)
+        return b''.join(self.decrypt_stream(io.BytesIO(token)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the screenshot encryption key ring")
+    parser.add_argument("command", choices=["rotate", "show"])
+    parser.add_argument("--db", default="screenshots.db")
+    parser.add_argument("--keyring", default=None, help="key ring file (default: next to --db)")
+    args = parser.parse_args()
+
+    ring = KeyRing.load_or_create(args.keyring or default_keyring_path(args.db))
+    if args.command == "rotate":
+        key_id = ring.rotate()
+        print(f"Key {key_id} is now active; restart Pixly to re-encrypt stored screenshots with it")
+    else:
+        print(f"Active key: {ring.active}; keys: {sorted(ring.keys)}")
+
+if __name__ == "__main__":
+    main()
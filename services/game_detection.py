@@ -50,6 +50,14 @@ class GameDetection:
             print(f"Error detecting game from process: {e}")
             return None
     
+    def game_for_process(self, process_name: str) -> Optional[str]:
+        """Game a process name belongs to, without scanning running processes."""
+        process_name = (process_name or '').lower()
+        for game_name, game_info in self.game_mappings.items():
+            if process_name in (process.lower() for process in game_info['processes']):
+                return game_name
+        return None
+    
     def detect_game_from_screenshots(self) -> Optional[str]:
         """Detect game from recent screenshots."""
         try:
@@ -140,6 +148,10 @@ class GameDetection:
         """Get list of available games for detection."""
         return list(self.game_mappings.keys())
     
+    def get_cached_game(self) -> Optional[str]:
+        """Return the last detected game without rescanning, even if the cache has expired."""
+        return self._detected_game
+    
     def clear_cache(self):
         """Clear the detection cache."""
         self._detected_game = None
@@ -152,6 +164,14 @@ def detect_current_game(user_message: str = None) -> Optional[str]:
     """Detect the current game being played."""
     return game_detector.detect_current_game(user_message)
 
+def get_cached_game() -> Optional[str]:
+    """Get the last detected game without running detection."""
+    return game_detector.get_cached_game()
+
+def game_for_process(process_name: str) -> Optional[str]:
+    """Get the game a process name belongs to, if any."""
+    return game_detector.game_for_process(process_name)
+
 def add_game_mapping(game_name: str, processes: List[str], 
                     keywords: List[str], window_titles: List[str] = None):
     """Add a new game mapping for detection."""
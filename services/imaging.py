@@ -0,0 +1,149 @@
+"""Image helpers: downscale and re-encode frames before they reach the vision model"""
+import io
+import os
+import time
+from typing import Dict
+from PIL import Image
+
+# A 4K PNG is ~10-20 MB; the model gains little detail above ~1.5k pixels on the long side
+VISION_MAX_DIM = int(os.getenv('PIXLY_VISION_MAX_DIM', '1536'))
+VISION_FORMAT = os.getenv('PIXLY_VISION_FORMAT', 'jpeg').lower()
+VISION_QUALITY = int(os.getenv('PIXLY_VISION_QUALITY', '85'))
+# Gallery thumbnails: a 256px JPEG is ~5-10 KB
+THUMBNAIL_MAX_DIM = int(os.getenv('PIXLY_THUMBNAIL_MAX_DIM', '256'))
+THUMBNAIL_QUALITY = int(os.getenv('PIXLY_THUMBNAIL_QUALITY', '70'))
+
+_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'jpg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+    'png': ('PNG', 'image/png'),
+}
+
+def downscale(image: Image.Image, max_dim: int) -> Image.Image:
+    """Shrink image so its longest side is at most max_dim, keeping the aspect ratio."""
+    if max_dim and max(image.size) > max_dim:
+        # For JPEG sources this lets the decoder skip work by decoding at a reduced scale
+        image.draft('RGB', (max_dim, max_dim))
+        image.thumbnail((max_dim, max_dim))
+    return image
+
+def encode_image(image: Image.Image, fmt: str = 'jpeg', quality: int = 85, compress_level: int = 6) -> bytes:
+    """Encode image as JPEG, WebP or PNG bytes (compress_level applies to PNG only)."""
+    pil_format, _ = _FORMATS[fmt.lower()]
+    if pil_format in ('JPEG', 'WEBP') and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    if pil_format == 'PNG':
+        image.save(buffer, format=pil_format, optimize=False, compress_level=compress_level)
+    else:
+        image.save(buffer, format=pil_format, quality=quality)
+    return buffer.getvalue()
+
+def mime_type_of(data: bytes) -> str:
+    """MIME type of encoded image bytes, from their magic number (PNG if unrecognised)."""
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/png'
+
+def reduce_colors(image: Image.Image, colors: str) -> Image.Image:
+    """Convert image to 'rgb' (24-bit), 'gray' (8-bit luminance) or 'palette' (8-bit, 256 colours)."""
+    if colors == 'gray':
+        return image.convert('L')
+    if colors == 'palette':
+        return image.convert('RGB').quantize(256, method=Image.Quantize.FASTOCTREE)
+    if colors == 'rgb':
+        return image.convert('RGB') if image.mode not in ('RGB', 'L') else image
+    raise ValueError(f"Unsupported color depth: {colors}")
+
+def make_thumbnail(image: Image.Image, max_dim: int = None) -> bytes:
+    """Small JPEG of image for gallery grids (THUMBNAIL_MAX_DIM on the long side by default)."""
+    max_dim = max_dim or THUMBNAIL_MAX_DIM
+    image.draft('RGB', (max_dim, max_dim))
+    scale = max_dim / max(image.size)
+    if scale < 1:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return encode_image(image, 'jpeg', THUMBNAIL_QUALITY)
+
+def encode_frame(image: Image.Image, fmt: str = 'png', quality: int = 85, max_dim: int = 0,
+                 colors: str = 'rgb', compress_level: int = 6, thumbnail_dim: int = 0, phash: bool = True) -> Dict:
+    """
+    Downscale, reduce and encode a captured frame. Runs in a capture worker process.
+
+    Args:
+        image (Image.Image): Raw grabbed frame
+        fmt (str): 'png', 'jpeg' or 'webp'
+        quality (int): JPEG/WebP quality
+        max_dim (int): Longest side in pixels (0 keeps the size)
+        colors (str): 'rgb', 'gray' or 'palette'
+        compress_level (int): PNG zlib level (1 fastest, 9 smallest)
+        thumbnail_dim (int): Also make a gallery thumbnail this size (0 skips it)
+        phash (bool): Also compute the perceptual hash (skip it if the caller already has one)
+
+    Returns:
+        Dict: {'data', 'encode_ms'} plus 'phash' and 'thumbnail' if requested; the hash is
+              taken from the reduced frame
+    """
+    start = time.perf_counter()
+    image = reduce_colors(downscale(image, max_dim), colors)
+    data = encode_image(image, fmt, quality, compress_level)
+    encode_ms = (time.perf_counter() - start) * 1000
+    encoded = {'data': data, 'encode_ms': encode_ms}
+    if phash:
+        encoded['phash'] = dhash(image)
+    if thumbnail_dim:
+        encoded['thumbnail'] = make_thumbnail(image, thumbnail_dim)
+    return encoded
+
+def prepare_vision_image(image_bytes: bytes, max_dim: int = None, fmt: str = None,
+                         quality: int = None) -> Dict:
+    """
+    Decode an uploaded or stored frame, downscale it and re-encode it for the vision model.
+
+    Args:
+        image_bytes (bytes): Encoded image (PNG, JPEG, WebP, ...)
+        max_dim (int): Longest side in pixels (PIXLY_VISION_MAX_DIM by default, 0 keeps the size)
+        fmt (str): 'jpeg', 'webp' or 'png' (PIXLY_VISION_FORMAT by default)
+        quality (int): JPEG/WebP quality (PIXLY_VISION_QUALITY by default)
+
+    Returns:
+        Dict: Inline blob {'mime_type', 'data'} accepted as a generate_content part
+    """
+    fmt = (fmt or VISION_FORMAT).lower()
+    if fmt not in _FORMATS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    image = Image.open(io.BytesIO(image_bytes))
+    image = downscale(image, VISION_MAX_DIM if max_dim is None else max_dim)
+    data = encode_image(image, fmt, VISION_QUALITY if quality is None else quality)
+    return {'mime_type': _FORMATS[fmt][1], 'data': data}
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Difference hash of an image: compares neighbouring pixels of a tiny grayscale copy.
+
+    Frames that look the same (re-encoded, slightly recoloured, a blinking cursor)
+    differ in only a few bits, unlike a hash of the encoded bytes.
+
+    Args:
+        image (Image.Image): Frame to hash
+        hash_size (int): Hash is hash_size * hash_size bits
+
+    Returns:
+        int: The hash as an integer
+    """
+    # Shrink before the grayscale conversion so a 4K frame costs ~15ms, not ~30ms
+    small = image.resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR, reducing_gap=2.0).convert('L')
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count('1')
@@ -0,0 +1,138 @@
+"""Text generation backends for the chatbot: Gemini, plus a deterministic offline fake"""
+import os
+import random
+import time
+import hashlib
+from typing import Iterator, List, Union
+
+DEFAULT_GEMINI_MODEL = "gemini-2.5-flash-lite"
+
+class LLMBackendError(Exception):
+    """Raised when a backend fails to produce a response."""
+
+class LLMBackend:
+    """Interface every chat backend implements.
+
+    `contents` is whatever the chatbot builds for a request: a prompt string,
+    or a [prompt, {'mime_type', 'data'} image blob] list for vision questions.
+    """
+    name = "base"
+
+    def generate(self, contents: Union[str, List]) -> str:
+        """Return the complete response text."""
+        raise NotImplementedError
+
+    def stream(self, contents: Union[str, List]) -> Iterator[str]:
+        """Yield the response text in chunks as it is generated."""
+        raise NotImplementedError
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, api_key: str = None, model_name: str = DEFAULT_GEMINI_MODEL,
+                 system_instruction: str = None):
+        """Configure the Google client and create the generative model."""
+        # Imported here so choosing the fake backend never pays for the Google client import
+        import google.generativeai as genai
+        genai.configure(api_key=api_key or os.getenv('GOOGLE_API_KEY'))
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name=model_name, system_instruction=system_instruction)
+
+    def generate(self, contents):
+        return self.model.generate_content(contents).text
+
+    def stream(self, contents):
+        for chunk in self.model.generate_content(contents, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata only)
+                continue
+            if text:
+                yield text
+
+class FakeBackend(LLMBackend):
+    """Deterministic offline backend for tests, load tests and benchmarks.
+
+    Replies are derived from the prompt, so the same question always gets the
+    same answer. Timing is shaped by a fixed first-token latency plus a token
+    rate, and failures are injected from a seeded random sequence.
+    """
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, tokens_per_second: float = 0.0,
+                 failure_rate: float = 0.0, seed: int = 0, reply_tokens: int = 40):
+        """
+        Args:
+            latency (float): Seconds before the first token
+            tokens_per_second (float): Generation speed after the first token (0 means instant)
+            failure_rate (float): Probability in [0, 1] that a request raises LLMBackendError
+            seed (int): Seed for the failure sequence
+            reply_tokens (int): Number of words in each reply
+        """
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.reply_tokens = reply_tokens
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def _prompt_text(self, contents) -> str:
+        if isinstance(contents, (list, tuple)):
+            return " ".join(part for part in contents if isinstance(part, str))
+        return str(contents)
+
+    def _reply_tokens(self, contents) -> List[str]:
+        """Build a reply of reply_tokens words that depends only on the prompt."""
+        digest = hashlib.sha256(self._prompt_text(contents).encode('utf-8')).hexdigest()
+        tokens = ["Pixly", "offline", "answer", f"{digest[:8]}:"]
+        words = ["check", "the", "map", "upgrade", "your", "gear", "and", "try", "again"]
+        for i in range(max(self.reply_tokens - len(tokens), 0)):
+            tokens.append(words[(int(digest[i % len(digest)], 16) + i) % len(words)])
+        return tokens
+
+    def _start_request(self):
+        self.calls += 1
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise LLMBackendError("Injected fake backend failure")
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _token_delay(self):
+        if self.tokens_per_second:
+            time.sleep(1.0 / self.tokens_per_second)
+
+    def generate(self, contents):
+        self._start_request()
+        tokens = self._reply_tokens(contents)
+        if self.tokens_per_second:
+            time.sleep(len(tokens) / self.tokens_per_second)
+        return " ".join(tokens)
+
+    def stream(self, contents):
+        self._start_request()
+        for i, token in enumerate(self._reply_tokens(contents)):
+            if i:
+                self._token_delay()
+            yield token if i == 0 else f" {token}"
+
+def create_backend(name: str = None, system_instruction: str = None) -> LLMBackend:
+    """Create the backend selected by name or PIXLY_LLM_BACKEND (gemini by default).
+
+    The fake backend reads PIXLY_FAKE_LATENCY, PIXLY_FAKE_TOKENS_PER_SECOND,
+    PIXLY_FAKE_FAILURE_RATE and PIXLY_FAKE_SEED.
+    """
+    name = (name or os.getenv('PIXLY_LLM_BACKEND', 'gemini')).lower()
+    if name == 'fake':
+        return FakeBackend(
+            latency=float(os.getenv('PIXLY_FAKE_LATENCY', '0.2')),
+            tokens_per_second=float(os.getenv('PIXLY_FAKE_TOKENS_PER_SECOND', '50')),
+            failure_rate=float(os.getenv('PIXLY_FAKE_FAILURE_RATE', '0')),
+            seed=int(os.getenv('PIXLY_FAKE_SEED', '0'))
+        )
+    if name == 'gemini':
+        return GeminiBackend(
+            model_name=os.getenv('PIXLY_GEMINI_MODEL', DEFAULT_GEMINI_MODEL),
+            system_instruction=system_instruction
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
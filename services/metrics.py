@@ -0,0 +1,181 @@
+"""In-process latency metrics: Prometheus text exposition plus per-request Server-Timing"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Timings for the request being served, as (name, description, milliseconds) entries
+_request_timings: ContextVar[Optional[List[Tuple[str, str, float]]]] = ContextVar(
+    'pixly_request_timings', default=None)
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        """
+        Initialize a monotonically increasing counter.
+
+        Args:
+            name (str): Metric name (Prometheus convention: ends in _total)
+            help_text (str): One-line description shown in /metrics
+        """
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize a latency histogram with cumulative buckets.
+
+        Args:
+            name (str): Metric name (Prometheus convention: ends in _seconds)
+            help_text (str): One-line description shown in /metrics
+            buckets (tuple): Upper bounds in seconds; +Inf is implicit
+        """
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += seconds
+            series['count'] += 1
+
+    def snapshot(self, **labels) -> Dict:
+        """Return count and sum for one label set (zeros if never observed)."""
+        series = self._series.get(tuple(sorted(labels.items())))
+        if series is None:
+            return {'count': 0, 'sum': 0.0}
+        return {'count': series['count'], 'sum': series['sum']}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        """Initialize an empty registry. Metrics are created once at module import."""
+        self._metrics = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Global instance
+registry = MetricsRegistry()
+
+chat_stage_seconds = registry.histogram(
+    'pixly_chat_stage_seconds', 'Time spent in each stage of a chat request.')
+embedding_seconds = registry.histogram(
+    'pixly_embedding_seconds', 'Time to embed a batch of texts with the sentence transformer.')
+chroma_query_seconds = registry.histogram(
+    'pixly_chroma_query_seconds', 'Time for one Chroma collection query.')
+knowledge_search_seconds = registry.histogram(
+    'pixly_knowledge_search_seconds', 'Time for a knowledge search across all content types.')
+screenshot_stage_seconds = registry.histogram(
+    'pixly_screenshot_stage_seconds', 'Time spent capturing, encoding, encrypting and inserting a screenshot.')
+screenshots_saved_total = registry.counter(
+    'pixly_screenshots_saved_total', 'Screenshots written to the database.')
+screenshot_failures_total = registry.counter(
+    'pixly_screenshot_failures_total', 'Screenshots that failed to capture or save.')
+screenshot_frame_bytes = registry.histogram(
+    'pixly_screenshot_frame_bytes', 'Encoded size of captured frames.',
+    buckets=(65536, 262144, 524288, 1048576, 2097152, 4194304, 8388608, 16777216, 33554432))
+screenshot_reclaimed_bytes_total = registry.counter(
+    'pixly_screenshot_reclaimed_bytes_total', 'Disk bytes reclaimed by screenshot retention (blobs and vacuumed pages).')
+screenshots_deduplicated_total = registry.counter(
+    'pixly_screenshots_deduplicated_total', 'Near-duplicate screenshots stored as references or skipped.')
+screenshot_pipeline_dropped_total = registry.counter(
+    'pixly_screenshot_pipeline_dropped_total', 'Frames dropped because a capture pipeline queue was full.')
+
+def render_metrics() -> str:
+    """Get all metrics in Prometheus text format."""
+    return registry.render()
+
+@contextmanager
+def server_timing():
+    """Collect Server-Timing entries for the current request; yields the entry list."""
+    entries = []
+    token = _request_timings.set(entries)
+    try:
+        yield entries
+    finally:
+        _request_timings.reset(token)
+
+def record_server_timing(name: str, milliseconds: float, description: str = None):
+    """Add an entry to the current request's Server-Timing, if one is being collected."""
+    entries = _request_timings.get()
+    if entries is not None:
+        entries.append((name, description, round(milliseconds, 2)))
+
+def format_server_timing(entries: List[Tuple[str, str, float]]) -> str:
+    """Format collected entries as a Server-Timing header value."""
+    parts = []
+    for name, description, milliseconds in entries:
+        desc = f';desc="{description}"' if description else ""
+        parts.append(f"{name}{desc};dur={milliseconds}")
+    return ", ".join(parts)
+
+@contextmanager
+def timed(histogram: Histogram, timing_name: str = None, timing_description: str = None, **labels):
+    """Observe the block's duration into histogram, and into Server-Timing when timing_name is given."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, **labels)
+        if timing_name:
+            record_server_timing(timing_name, elapsed * 1000, timing_description)
@@ -0,0 +1,159 @@
+"""Background re-encryption of stored screenshots with the active key and format"""
+import os
+from threading import Event, Lock, Thread
+from typing import Dict
+from .frame_crypto import FrameCipher
+from .screenshot_db import after_commit, after_rollback
+
+REENCRYPT_BATCH_SIZE = int(os.getenv('PIXLY_REENCRYPT_BATCH_SIZE', '50'))
+# Seconds between batches, so the job stays in the background of capture and the gallery
+REENCRYPT_PAUSE = float(os.getenv('PIXLY_REENCRYPT_PAUSE', '0.2'))
+
+class ScreenshotReencryption:
+    def __init__(self, capture, batch_size: int = REENCRYPT_BATCH_SIZE, pause: float = REENCRYPT_PAUSE):
+        """
+        Job rewriting payloads that aren't in the capture's write format and key:
+        Fernet tokens from older versions, and payloads under a rotated-out key.
+
+        Blob files are tracked by the key_id column of the blobs table. Inline
+        payloads (thumbnails, and frame data of databases never migrated to the
+        blob store) are found by their header bytes. Each batch decrypts and
+        encrypts off the writer thread, then swaps the result in with one
+        writer transaction. A re-encrypted blob is written to a new file that
+        the transaction points its row at; the old file is removed after the
+        commit.
+
+        Args:
+            capture (ScreenshotCapture): Store to re-encrypt
+            batch_size (int): Blobs or rows per batch
+            pause (float): Seconds between batches
+        """
+        self.capture = capture
+        self.batch_size = batch_size
+        self.pause = pause
+        self.thread = None
+        self._stop = Event()
+        self._run_lock = Lock()
+        self.totals = {'blobs': 0, 'rows': 0, 'errors': 0, 'done': False}
+        self._rewind()
+
+    def start(self):
+        """Make one pass over the store in the background."""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self._rewind()
+        self.thread = Thread(target=self._loop, name="pixly-reencrypt", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self._stop.clear()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_batch():
+                    return
+            except Exception as e:
+                print(f"Error re-encrypting screenshots: {e}")
+                return
+            self._stop.wait(self.pause)
+
+    def _reencrypt(self, encrypted: bytes) -> bytes:
+        return self.capture._encrypt_data(self.capture._decrypt_data(encrypted))
+
+    def _reencrypt_blobs(self, key_id: int) -> int:
+        capture = self.capture
+        blobs = capture.db.read(
+            "SELECT hash, file FROM blobs WHERE hash > ? AND key_id IS NOT ? ORDER BY hash LIMIT ?",
+            (self._blob_cursor, key_id, self.batch_size))
+        for blob_hash, file in blobs:
+            self._blob_cursor = blob_hash
+            encrypted_data = capture.blobs.read(blob_hash, file)
+            try:
+                if encrypted_data is None:
+                    raise FileNotFoundError("blob file is missing")
+                reencrypted = self._reencrypt(encrypted_data)
+                new_file = capture.blobs.stage(blob_hash, reencrypted)
+            except Exception as e:
+                # Skipped for this pass (a file that can't be written too); a later pass tries again
+                print(f"Re-encryption: blob {blob_hash} skipped: {e}")
+                self.totals['errors'] += 1
+                continue
+
+            def swap(conn):
+                # The new file replaces the old one only if the switch commits; a blob
+                # released or rewritten meanwhile keeps what it has
+                switched = conn.execute(
+                    "UPDATE blobs SET file = ?, key_id = ?, size = ? WHERE hash = ? AND file IS ?",
+                    (new_file, key_id, len(reencrypted), blob_hash, file)).rowcount
+                if switched:
+                    after_commit(conn, lambda: capture.blobs.delete(blob_hash, file))
+                    after_rollback(conn, lambda: capture.blobs.delete(blob_hash, new_file))
+                else:
+                    capture.blobs.delete(blob_hash, new_file)
+                return switched
+
+            if capture.db.write(swap):
+                self.totals['blobs'] += 1
+        return len(blobs)
+
+    def _reencrypt_rows(self, key_id: int) -> int:
+        capture = self.capture
+        current = FrameCipher.header_prefix(key_id)
+        rows = capture.db.read('''
+            SELECT id, encrypted_data, encrypted_thumbnail FROM screenshots
+            WHERE id > ?
+              AND ((length(encrypted_data) > 0 AND substr(encrypted_data, 1, 8) != ?)
+                   OR (encrypted_thumbnail IS NOT NULL AND substr(encrypted_thumbnail, 1, 8) != ?))
+            ORDER BY id LIMIT ?
+        ''', (self._row_cursor, current, current, self.batch_size))
+        for screenshot_id, encrypted_data, encrypted_thumbnail in rows:
+            self._row_cursor = screenshot_id
+            try:
+                data = self._reencrypt(encrypted_data) if encrypted_data else b''
+                thumbnail = self._reencrypt(encrypted_thumbnail) if encrypted_thumbnail else None
+            except Exception as e:
+                print(f"Re-encryption: screenshot {screenshot_id} skipped: {e}")
+                self.totals['errors'] += 1
+                continue
+            # The blob backfill may have moved the payload out meanwhile; its blob is handled above.
+            # A thumbnail written since the read (get_thumbnail backfills them) is left alone
+            updated = capture.db.execute_write('''
+                UPDATE screenshots
+                SET encrypted_data = CASE WHEN blob_hash IS NULL THEN ? ELSE encrypted_data END,
+                    encrypted_thumbnail = ?
+                WHERE id = ? AND encrypted_thumbnail IS ?
+            ''', (data, thumbnail, screenshot_id, encrypted_thumbnail))
+            if updated.rowcount:
+                self.totals['rows'] += 1
+        return len(rows)
+
+    def run_batch(self) -> bool:
+        """Re-encrypt the next batch of blobs and rows; returns False when the pass is complete."""
+        key_id = self.capture.crypto.write_key_id
+        if key_id is None:
+            # Writing Fernet (a rollback): leave newer payloads as they are, they stay readable
+            self.totals['done'] = True
+            return False
+        with self._run_lock:
+            done = self._reencrypt_blobs(key_id) + self._reencrypt_rows(key_id) == 0
+            self.totals['done'] = done
+            return not done
+
+    def _rewind(self):
+        self._blob_cursor = ''
+        self._row_cursor = 0
+
+    def run_once(self) -> Dict:
+        """Make one full pass over the store now."""
+        before = dict(self.totals)
+        self._rewind()
+        while not self._stop.is_set() and self.run_batch():
+            pass
+        return {'blobs': self.totals['blobs'] - before['blobs'], 'rows': self.totals['rows'] - before['rows'],
+                'errors': self.totals['errors'] - before['errors']}
@@ -0,0 +1,146 @@
+"""Semantic cache of chat answers, keyed by detected game and query embedding"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+
+class SemanticResponseCache:
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600,
+                 similarity_threshold: float = 0.92):
+        """
+        Initialize the response cache.
+
+        Args:
+            max_entries (int): Maximum number of cached answers across all games (LRU eviction)
+            ttl_seconds (float): How long an answer stays valid after it was stored
+            similarity_threshold (float): Minimum cosine similarity between query embeddings for a hit
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.seconds_saved = 0.0
+
+    def _normalize(self, embedding: List[float]) -> Optional[np.ndarray]:
+        """Return the unit-length vector for an embedding, or None if it is empty."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if vector.size == 0 or norm == 0:
+            return None
+        return vector / norm
+
+    def _expire(self, now: float):
+        """Drop entries older than the TTL. Caller must hold the lock."""
+        expired = [key for key, entry in self._entries.items()
+                   if now - entry['created'] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, game: Optional[str], embedding: List[float]) -> Optional[str]:
+        """Return a cached answer for a similar question about the same game, if any."""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return None
+
+        with self._lock:
+            self._expire(time.time())
+            best_key, best_score = None, -1.0
+            for key, entry in self._entries.items():
+                if entry['game'] != game or entry['vector'].shape != vector.shape:
+                    continue
+                score = float(np.dot(entry['vector'], vector))
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None or best_score < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_key]
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            self.seconds_saved += entry['generation_seconds']
+            return entry['response']
+
+    def store(self, game: Optional[str], query: str, embedding: List[float], response: str,
+              generation_seconds: float = 0.0):
+        """Cache an answer; generation_seconds is credited to seconds_saved on each later hit."""
+        vector = self._normalize(embedding)
+        if vector is None or not response:
+            return
+
+        with self._lock:
+            self._entries[uuid.uuid4().hex] = {
+                'game': game,
+                'query': query,
+                'vector': vector,
+                'response': response,
+                'created': time.time(),
+                'generation_seconds': generation_seconds
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_game(self, game: Optional[str]) -> int:
+        """Drop all cached answers for a game. Returns the number of entries removed."""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry['game'] == game]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        """Drop every cached answer (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters and cache occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            games = {}
+            for entry in self._entries.values():
+                games[entry['game']] = games.get(entry['game'], 0) + 1
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'llm_calls_saved': self.hits,
+                'seconds_saved': round(self.seconds_saved, 3),
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'entries_by_game': games
+            }
+
+# Global instance
+response_cache = SemanticResponseCache(
+    max_entries=int(os.getenv('PIXLY_RESPONSE_CACHE_SIZE', '256')),
+    ttl_seconds=float(os.getenv('PIXLY_RESPONSE_CACHE_TTL', '3600')),
+    similarity_threshold=float(os.getenv('PIXLY_RESPONSE_CACHE_THRESHOLD', '0.92'))
+)
+
+def get_response_cache_stats() -> Dict:
+    """Get response cache counters."""
+    return response_cache.get_stats()
+
+def invalidate_game_responses(game_name: str) -> int:
+    """Drop cached answers for a game, e.g. after its knowledge was reprocessed."""
+    return response_cache.invalidate_game(game_name)
+
+def clear_response_cache():
+    """Drop every cached answer."""
+    response_cache.clear()
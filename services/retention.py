@@ -0,0 +1,187 @@
+"""Retention policy for stored screenshots: prune by size, age, per-application count and downsampling"""
+import os
+from threading import Event, Lock, Thread
+from datetime import datetime, timedelta
+from typing import Dict, List
+from .metrics import screenshot_reclaimed_bytes_total
+from .screenshot_db import epoch_ms
+
+RETENTION_MAX_BYTES = int(os.getenv('PIXLY_RETENTION_MAX_BYTES', str(4 * 1024 ** 3)))
+RETENTION_MAX_AGE_DAYS = float(os.getenv('PIXLY_RETENTION_MAX_AGE_DAYS', '0'))
+RETENTION_MAX_PER_APP = int(os.getenv('PIXLY_RETENTION_MAX_PER_APP', '0'))
+RETENTION_DOWNSAMPLE_AFTER_DAYS = float(os.getenv('PIXLY_RETENTION_DOWNSAMPLE_AFTER_DAYS', '0'))
+RETENTION_KEEP_EVERY = int(os.getenv('PIXLY_RETENTION_KEEP_EVERY', '10'))
+RETENTION_INTERVAL = float(os.getenv('PIXLY_RETENTION_INTERVAL', '600'))
+# Rows deleted and free pages released per writer transaction, so capture never waits long
+RETENTION_BATCH_SIZE = int(os.getenv('PIXLY_RETENTION_BATCH_SIZE', '200'))
+VACUUM_PAGES = int(os.getenv('PIXLY_VACUUM_PAGES', '256'))
+
+class RetentionPolicy:
+    def __init__(self, max_bytes: int = RETENTION_MAX_BYTES, max_age_days: float = RETENTION_MAX_AGE_DAYS,
+                 max_per_app: int = RETENTION_MAX_PER_APP,
+                 downsample_after_days: float = RETENTION_DOWNSAMPLE_AFTER_DAYS,
+                 keep_every: int = RETENTION_KEEP_EVERY):
+        """
+        Limits applied to stored screenshots. A limit of 0 is disabled.
+
+        Args:
+            max_bytes (int): Disk budget for blobs plus the database file; oldest frames go first
+            max_age_days (float): Delete frames older than this
+            max_per_app (int): Keep at most this many frames per application (newest kept)
+            downsample_after_days (float): Frames older than this are thinned out...
+            keep_every (int): ...keeping one in keep_every (by id, so repeated runs keep the same ones)
+        """
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.max_per_app = max_per_app
+        self.downsample_after_days = downsample_after_days
+        self.keep_every = keep_every
+
+class ScreenshotRetention:
+    def __init__(self, capture, policy: RetentionPolicy = None, interval: float = RETENTION_INTERVAL,
+                 batch_size: int = RETENTION_BATCH_SIZE, vacuum_pages: int = VACUUM_PAGES):
+        """
+        Background job enforcing a RetentionPolicy on a ScreenshotCapture.
+
+        Deletes go through the capture in small writer transactions, and free
+        database pages are returned to the filesystem with incremental vacuum,
+        so a run never blocks capture for long.
+
+        Args:
+            capture (ScreenshotCapture): Store to prune
+            policy (RetentionPolicy): Limits (env defaults if None)
+            interval (float): Seconds between runs
+            batch_size (int): Rows per delete transaction
+            vacuum_pages (int): Pages released per incremental vacuum step
+        """
+        self.capture = capture
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.thread = None
+        self._stop = Event()
+        self._run_lock = Lock()
+        self.totals = {'runs': 0, 'deleted': 0, 'reclaimed_bytes': 0, 'last_run': None}
+
+    def start(self):
+        """Start running the policy every interval seconds."""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = Thread(target=self._loop, name="pixly-retention", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background job (a run in progress finishes its current batch first)."""
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        # Manual run_once() calls work again once the job is stopped
+        self._stop.clear()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error applying screenshot retention: {e}")
+
+    def _query_ids(self, sql: str, params=()) -> List[int]:
+        return [row[0] for row in self.capture.db.read(sql, params)]
+
+    def _delete(self, ids: List[int], result: Dict) -> bool:
+        """Delete ids in batches; returns False if the job was stopped part-way."""
+        for start in range(0, len(ids), self.batch_size):
+            if self._stop.is_set():
+                return False
+            outcome = self.capture.delete_screenshots(ids[start:start + self.batch_size])
+            result['deleted'] += outcome['deleted']
+            result['blob_bytes'] += outcome['freed_bytes']
+        return True
+
+    def disk_usage(self) -> int:
+        """Bytes used by blob files and the database's in-use pages.
+
+        Free pages don't count: deleting more frames can't reclaim them, and without
+        incremental auto-vacuum (a database not yet converted) they are never released.
+        """
+        with self.capture.db.reader() as conn:
+            blob_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return blob_bytes + (page_count - free_pages) * page_size
+
+    def _vacuum(self, result: Dict):
+        """Release free pages a few at a time (needs auto_vacuum=INCREMENTAL)."""
+        def step(conn):
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return 0
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})").fetchall()
+            freed = free_before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            return freed * conn.execute("PRAGMA page_size").fetchone()[0]
+
+        while not self._stop.is_set():
+            freed = self.capture.db.write(step)
+            if not freed:
+                break
+            result['vacuumed_bytes'] += freed
+
+    def run_once(self) -> Dict:
+        """
+        Apply the policy now.
+
+        Returns:
+            Dict: Rows deleted, blob bytes freed, database bytes vacuumed and total reclaimed
+        """
+        with self._run_lock:
+            policy = self.policy
+            result = {'deleted': 0, 'blob_bytes': 0, 'vacuumed_bytes': 0}
+            now = datetime.now()
+
+            if policy.max_age_days:
+                cutoff = epoch_ms(now - timedelta(days=policy.max_age_days))
+                self._delete(self._query_ids(
+                    "SELECT id FROM screenshots WHERE ts < ? ORDER BY ts", (cutoff,)), result)
+
+            if policy.downsample_after_days and policy.keep_every > 1:
+                cutoff = epoch_ms(now - timedelta(days=policy.downsample_after_days))
+                self._delete(self._query_ids(
+                    "SELECT id FROM screenshots WHERE ts < ? AND id % ? != 0 ORDER BY ts",
+                    (cutoff, policy.keep_every)), result)
+
+            if policy.max_per_app:
+                for application, count in self.capture.db.read(
+                        "SELECT application, COUNT(*) FROM screenshots GROUP BY application HAVING COUNT(*) > ?",
+                        (policy.max_per_app,)):
+                    self._delete(self._query_ids(
+                        "SELECT id FROM screenshots WHERE application = ? ORDER BY ts LIMIT ?",
+                        (application, count - policy.max_per_app)), result)
+
+            if policy.max_bytes:
+                # Oldest first, one batch at a time, until the budget holds (or deleting stops helping)
+                usage = self.disk_usage()
+                while not self._stop.is_set() and usage > policy.max_bytes:
+                    ids = self._query_ids("SELECT id FROM screenshots ORDER BY ts LIMIT ?", (self.batch_size,))
+                    if not ids:
+                        break
+                    self._delete(ids, result)
+                    self._vacuum(result)
+                    previous, usage = usage, self.disk_usage()
+                    if usage >= previous:
+                        break
+
+            self._vacuum(result)
+            result['reclaimed_bytes'] = result['blob_bytes'] + result['vacuumed_bytes']
+            screenshot_reclaimed_bytes_total.inc(result['reclaimed_bytes'])
+            self.totals['runs'] += 1
+            self.totals['deleted'] += result['deleted']
+            self.totals['reclaimed_bytes'] += result['reclaimed_bytes']
+            self.totals['last_run'] = now.isoformat()
+            if result['deleted']:
+                print(f"Screenshot retention: deleted {result['deleted']} frames, "
+                      f"reclaimed {result['reclaimed_bytes'] / 1e6:.1f} MB")
+            return result
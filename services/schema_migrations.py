@@ -0,0 +1,177 @@
+"""Versioned schema migrations for screenshots.db (PRAGMA user_version) and resumable background backfills"""
+import os
+import sqlite3
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Rows per backfill transaction, and seconds between them so capture and the gallery stay responsive
+BACKFILL_BATCH_SIZE = int(os.getenv('PIXLY_BACKFILL_BATCH_SIZE', '500'))
+BACKFILL_PAUSE = float(os.getenv('PIXLY_BACKFILL_PAUSE', '0.05'))
+
+# (version, description, apply(conn)); versions start at 1 and increase by one
+Migration = Tuple[int, str, Callable[[sqlite3.Connection], None]]
+# backfill(conn, cursor, batch_size) -> (cursor after the batch or None once nothing is left, rows rewritten)
+Backfill = Callable[[sqlite3.Connection, int, int], Tuple[Optional[int], int]]
+
+def schedule_backfill(conn: sqlite3.Connection, name: str, first: bool = False):
+    """Queue a backfill from inside a migration; it starts (or resumes) in the background.
+
+    Backfills run one at a time in the order queued; first=True puts this one ahead of
+    those already waiting (a cheap rewrite that queries depend on), and they resume after it.
+    """
+    if first:
+        conn.execute('''
+            INSERT OR IGNORE INTO schema_backfills (rowid, name, cursor, rows, done)
+            SELECT COALESCE(MIN(rowid), 1) - 1, ?, 0, 0, 0 FROM schema_backfills
+        ''', (name,))
+    else:
+        conn.execute("INSERT OR IGNORE INTO schema_backfills (name, cursor, rows, done) VALUES (?, 0, 0, 0)",
+                     (name,))
+
+def add_columns(conn: sqlite3.Connection, table: str, columns: List[Tuple[str, str]]):
+    """Add the columns a table doesn't have yet (databases from before migrations may have some)."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for column, column_type in columns:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+class MigrationRunner:
+    def __init__(self, db, migrations: List[Migration], backfills: Dict[str, Backfill],
+                 batch_size: int = BACKFILL_BATCH_SIZE, pause: float = BACKFILL_PAUSE):
+        """
+        Bring a database up to the latest schema version, then finish long data
+        rewrites in the background.
+
+        Each migration runs in its own writer transaction together with the
+        PRAGMA user_version bump, so a crash leaves the database at the previous
+        version and the migration is retried on the next start. Databases created
+        before versioning report version 0; their migrations must tolerate
+        tables and columns that already exist.
+
+        Backfills that would hold the write lock for too long (rewriting every
+        row) are queued by their migration in schema_backfills and run in
+        batches: each batch and its cursor commit together, so a backfill
+        stopped at any point resumes where it left off.
+
+        Args:
+            db (ScreenshotDatabase): Database to migrate
+            migrations (List[Migration]): Every migration, in version order
+            backfills (Dict[str, Backfill]): Batch functions by the name migrations queue them under
+            batch_size (int): Rows per backfill batch
+            pause (float): Seconds between backfill batches
+        """
+        versions = [version for version, _, _ in migrations]
+        if versions != list(range(1, len(migrations) + 1)):
+            raise ValueError(f"Migration versions must be 1..{len(migrations)} in order, got {versions}")
+        self.db = db
+        self.migrations = migrations
+        self.backfills = backfills
+        self.batch_size = batch_size
+        self.pause = pause
+        self.thread = None
+        self._stop = Event()
+        self._run_lock = Lock()
+
+    @property
+    def latest_version(self) -> int:
+        return len(self.migrations)
+
+    def version(self) -> int:
+        return self.db.read_one("PRAGMA user_version")[0]
+
+    def migrate(self) -> int:
+        """Apply every pending migration; returns the resulting schema version."""
+        def prepare(conn):
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_backfills (
+                    name TEXT PRIMARY KEY,
+                    cursor INTEGER NOT NULL,
+                    rows INTEGER NOT NULL,
+                    done INTEGER NOT NULL
+                )
+            ''')
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+        current = self.db.write(prepare)
+        if current > self.latest_version:
+            raise RuntimeError(f"screenshots.db has schema version {current}, newer than this version of "
+                               f"Pixly supports ({self.latest_version})")
+        for version, description, apply in self.migrations[current:]:
+            def step(conn, version=version, apply=apply):
+                # DDL doesn't open a transaction implicitly; without this it would autocommit
+                conn.execute("BEGIN IMMEDIATE")
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+
+            self.db.write(step)
+            print(f"Screenshot database migrated to version {version}: {description}")
+        return self.latest_version
+
+    def pending_backfills(self) -> List[str]:
+        return [row[0] for row in self.db.read("SELECT name FROM schema_backfills WHERE done = 0 ORDER BY rowid")]
+
+    def status(self) -> Dict:
+        return {
+            'version': self.version(),
+            'latest_version': self.latest_version,
+            'backfills': {name: {'rows': rows, 'done': bool(done)}
+                          for name, rows, done in self.db.read("SELECT name, rows, done FROM schema_backfills")},
+            'running': bool(self.thread and self.thread.is_alive())
+        }
+
+    def start(self):
+        """Run pending backfills in the background (nothing to do if none are queued)."""
+        if self.thread and self.thread.is_alive():
+            return
+        if not self.pending_backfills():
+            return
+        self._stop.clear()
+        self.thread = Thread(target=self._loop, name="pixly-backfill", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop after the current batch; the rest resumes on the next start."""
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self._stop.clear()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_batch():
+                    return
+            except Exception as e:
+                print(f"Error backfilling screenshots: {e}")
+                return
+            self._stop.wait(self.pause)
+
+    def run_batch(self) -> bool:
+        """Run one batch of the first pending backfill; returns False when none are left."""
+        with self._run_lock:
+            pending = self.pending_backfills()
+            if not pending:
+                return False
+            name = pending[0]
+            backfill = self.backfills.get(name)
+            if backfill is None:
+                raise RuntimeError(f"Unknown backfill: {name}")
+
+            def batch(conn):
+                cursor, rows = conn.execute("SELECT cursor, rows FROM schema_backfills WHERE name = ?",
+                                            (name,)).fetchone()
+                next_cursor, changed = backfill(conn, cursor, self.batch_size)
+                conn.execute("UPDATE schema_backfills SET cursor = ?, rows = ?, done = ? WHERE name = ?",
+                             (cursor if next_cursor is None else next_cursor, rows + changed,
+                              int(next_cursor is None), name))
+                if next_cursor is None:
+                    print(f"Screenshot backfill finished: {name} ({rows + changed} rows)")
+
+            self.db.write(batch)
+            return True
+
+    def run_backfills(self):
+        """Run every pending backfill to completion now."""
+        while not self._stop.is_set() and self.run_batch():
+            pass
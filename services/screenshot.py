@@ -1,35 +1,262 @@
+import io
 import os
-import sqlite3
 import hashlib
 from datetime import datetime
 import threading
 import time
-import psutil
-import win32gui
-import win32process
-from PIL import ImageGrab
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
 from cryptography.fernet import Fernet
+from .container import container
+from .screenshot_db import ScreenshotDatabase, TS_FROM_TIMESTAMP, epoch_ms
+from .blob_store import BlobStore, default_blob_dir
+from . import screenshot_summary
+from .schema_migrations import MigrationRunner, add_columns, schedule_backfill
+from .retention import ScreenshotRetention
+from .capture_scheduler import AdaptiveSchedule
+from .capture_backends import (make_grab_backend, make_window_provider, capture_bbox, CAPTURE_REGION,
+                               CAPTURE_REGIONS, CAPTURE_MONITOR)
+from .capture_pipeline import CapturePipeline
+from .capture_governor import ResourceGovernor, lower_priority
+from .frame_crypto import FrameCipher, KeyRing, default_keyring_path
+from .reencryption import ScreenshotReencryption
+from .imaging import dhash, hamming_distance, encode_frame, make_thumbnail, mime_type_of, THUMBNAIL_MAX_DIM
+from .metrics import (timed, screenshot_stage_seconds, screenshots_saved_total, screenshot_failures_total,
+                      screenshots_deduplicated_total, screenshot_frame_bytes)
+
+FRAME_CACHE_SIZE = int(os.getenv('PIXLY_FRAME_CACHE_SIZE', '8'))
+# Frames whose 64-bit dHash is within DEDUP_THRESHOLD bits of one of the last DEDUP_WINDOW
+# frames are near-duplicates (negative threshold disables). DEDUP_MODE 'reference' stores a
+# row pointing at the earlier frame's data; 'skip' stores nothing.
+DEDUP_THRESHOLD = int(os.getenv('PIXLY_DEDUP_THRESHOLD', '4'))
+DEDUP_WINDOW = int(os.getenv('PIXLY_DEDUP_WINDOW', '8'))
+DEDUP_MODE = os.getenv('PIXLY_DEDUP_MODE', 'reference').lower()
+
+# How captured frames are stored. JPEG at full size encodes a 1440p frame in ~15ms of CPU;
+# PNG (lossless) takes ~60-120ms and WebP several hundred.
+CAPTURE_SETTINGS = {
+    'fmt': os.getenv('PIXLY_CAPTURE_FORMAT', 'jpeg').lower(),
+    'quality': int(os.getenv('PIXLY_CAPTURE_QUALITY', '85')),
+    'max_dim': int(os.getenv('PIXLY_CAPTURE_MAX_DIM', '0')),
+    'colors': os.getenv('PIXLY_CAPTURE_COLORS', 'rgb').lower(),
+    'compress_level': int(os.getenv('PIXLY_CAPTURE_PNG_LEVEL', '1')),
+    'thumbnail_dim': THUMBNAIL_MAX_DIM,
+}
+# Encoder processes (0 encodes on the capture thread)
+CAPTURE_WORKERS = int(os.getenv('PIXLY_CAPTURE_WORKERS', '1'))
+
+def encode_cursor(ts, screenshot_id):
+    """Opaque page cursor for the row (ts, id); the next page starts after it."""
+    return f"{ts}.{screenshot_id}"
+
+def decode_cursor(cursor):
+    """(ts, id) of a page cursor; raises ValueError if it isn't one."""
+    ts, _, screenshot_id = cursor.partition('.')
+    return int(ts), int(screenshot_id)
+
+# Schema history of screenshots.db, applied by MigrationRunner in order. Append new
+# migrations; never change a released one. Databases from before versioning start at
+# version 0 with any prefix of this history already in place, so each step tolerates
+# tables and columns that exist.
+
+def _create_screenshots(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS screenshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            application TEXT NOT NULL,
+            window_title TEXT,
+            encrypted_data BLOB NOT NULL,
+            file_hash TEXT NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON screenshots(timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_application ON screenshots(application)")
+
+def _add_dedup_columns(conn):
+    add_columns(conn, 'screenshots', [('phash', 'TEXT'), ('ref_id', 'INTEGER')])
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ref_id ON screenshots(ref_id)")
+
+def _add_encoding_columns(conn):
+    add_columns(conn, 'screenshots', [('mime_type', 'TEXT'), ('byte_size', 'INTEGER'), ('encode_ms', 'REAL')])
+
+def _add_thumbnails(conn):
+    add_columns(conn, 'screenshots', [('encrypted_thumbnail', 'BLOB')])
+
+def _create_blob_store(conn):
+    BlobStore.create_schema(conn)
+    if conn.execute("SELECT 1 FROM screenshots WHERE blob_hash IS NULL AND length(encrypted_data) > 0 LIMIT 1").fetchone():
+        schedule_backfill(conn, 'inline_payloads')
+
+def _add_integer_timestamps(conn):
+    # ts orders and filters every query; the ISO text stays for display. Rows
+    # written without it (older versions, tools) get it from their timestamp.
+    add_columns(conn, 'screenshots', [('ts', 'INTEGER')])
+    ts_sql = TS_FROM_TIMESTAMP.format('NEW.timestamp')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS screenshot_ts_insert AFTER INSERT ON screenshots WHEN NEW.ts IS NULL
+        BEGIN UPDATE screenshots SET ts = {ts_sql} WHERE id = NEW.id; END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS screenshot_ts_update AFTER UPDATE OF timestamp ON screenshots
+        BEGIN UPDATE screenshots SET ts = {ts_sql} WHERE id = NEW.id; END
+    ''')
+    # Indexes end in the rowid, so (ts) and (application, ts) also order ties by id
+    # for keyset pagination
+    for index, index_columns in [('idx_timestamp', ['ts']), ('idx_application', ['application', 'ts'])]:
+        if [row[2] for row in conn.execute(f"PRAGMA index_info({index})")] != index_columns:
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+            conn.execute(f"CREATE INDEX {index} ON screenshots({', '.join(index_columns)})")
+    # Paging, date filters and retention all go by ts, so fill it in before the slow
+    # payload backfill a first-release database also has queued
+    if conn.execute("SELECT 1 FROM screenshots WHERE ts IS NULL LIMIT 1").fetchone():
+        schedule_backfill(conn, 'screenshot_ts', first=True)
+
+def _add_blob_files(conn):
+    # Blob versions get their own file names, so files follow transaction outcomes
+    add_columns(conn, 'blobs', [('file', 'TEXT')])
+
+def _schedule_auto_vacuum(conn):
+    # Databases created before incremental auto-vacuum never return free pages to the
+    # filesystem; converting them takes one VACUUM, run as a backfill after the others
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        schedule_backfill(conn, 'incremental_vacuum')
+
+def _convert_auto_vacuum(conn, cursor, batch_size):
+    # VACUUM can't run inside a transaction; it is the batch's first write. It rewrites the
+    # whole file while holding the writer, so it waits for the inline payloads to move out
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    return None, 0
+
+def _backfill_ts(conn, cursor, batch_size):
+    last = conn.execute("SELECT MAX(id) FROM (SELECT id FROM screenshots WHERE id > ? ORDER BY id LIMIT ?)",
+                        (cursor, batch_size)).fetchone()[0]
+    if last is None:
+        return None, 0
+    updated = conn.execute(f'''
+        UPDATE screenshots SET ts = {TS_FROM_TIMESTAMP.format('timestamp')}
+        WHERE id > ? AND id <= ? AND ts IS NULL
+    ''', (cursor, last))
+    return last, updated.rowcount
+
+MIGRATIONS = [
+    (1, "screenshots table", _create_screenshots),
+    (2, "perceptual hashes and near-duplicate references", _add_dedup_columns),
+    (3, "per-frame encoding details", _add_encoding_columns),
+    (4, "encrypted thumbnails", _add_thumbnails),
+    (5, "content-addressed blob store with key IDs", _create_blob_store),
+    (6, "integer millisecond timestamps", _add_integer_timestamps),
+    # Per-application, per-format and per-key totals read by get_stats
+    (7, "summary tables for stats", screenshot_summary.create_schema),
+    (8, "per-version blob file names", _add_blob_files),
+    (9, "incremental auto-vacuum", _schedule_auto_vacuum),
+]
 
 class ScreenshotCapture:
-    def __init__(self, db_path="screenshots.db", interval=30):
+    def __init__(self, db_path="screenshots.db", interval=30, frame_cache_size=FRAME_CACHE_SIZE,
+                 dedup_threshold=DEDUP_THRESHOLD, dedup_window=DEDUP_WINDOW, dedup_mode=DEDUP_MODE,
+                 capture_settings=None, capture_workers=CAPTURE_WORKERS, blob_dir=None, schedule=None,
+                 grabber=None, window_provider=None, pipeline_options=None, keyring=None, governor=None,
+                 capture_region=CAPTURE_REGION, capture_monitor=CAPTURE_MONITOR):
         """
         Initialize the screenshot capture system with encrypted SQLite storage.
         
         Args:
             db_path (str): Path to the SQLite database file
             interval (int): Screenshot capture interval in seconds
+            frame_cache_size (int): Recently decrypted frames kept in memory (0 disables)
+            dedup_threshold (int): Max Hamming distance between perceptual hashes of near-duplicates (-1 disables)
+            dedup_window (int): Number of recent frames compared against
+            dedup_mode (str): 'reference' to store near-duplicates as references, 'skip' to drop them
+            capture_settings (dict): Overrides for CAPTURE_SETTINGS (fmt, quality, max_dim, colors,
+                compress_level, thumbnail_dim)
+            capture_workers (int): Encoder processes, started on first capture (0 encodes in-thread)
+            blob_dir (str): Directory for encrypted payload files (default_blob_dir(db_path) if None)
+            schedule (AdaptiveSchedule): Capture rate policy (env defaults around interval if None)
+            grabber: Frame source with grab() (PIXLY_CAPTURE_BACKEND if None)
+            window_provider: Foreground window source with window_info() (PIXLY_WINDOW_PROVIDER if None)
+            pipeline_options (dict): queue_size and drop_policy overrides for the capture pipeline
+            keyring (KeyRing): Payload encryption keys (loaded from or created at default_keyring_path(db_path) if None)
+            governor (ResourceGovernor): CPU budget and in-game deferral for background capture (env defaults if None)
+            capture_region (str): 'desktop', 'window' (the foreground window's bounds) or 'monitor'
+            capture_monitor (int): Monitor for the 'monitor' region, primary first (-1: the foreground window's)
         """
         self.db_path = db_path
         self.interval = interval
         self.running = False
         self.thread = None
         
+        # Captures are paced on the monotonic clock and stop as soon as this is set
+        self.schedule = schedule or AdaptiveSchedule(interval)
+        self._stop_event = threading.Event()
+        
+        # Where frames and window details come from (desktop and win32 unless configured)
+        self.grabber = grabber or make_grab_backend()
+        self.window_provider = window_provider or make_window_provider()
+        # Grabbing only the game window or one monitor shrinks every frame on multi-monitor setups
+        if capture_region not in CAPTURE_REGIONS:
+            raise ValueError(f"Unknown capture region: {capture_region}")
+        self.capture_region = capture_region
+        self.capture_monitor = capture_monitor
+        self.last_frame_size = None
+        
+        # LRU of decrypted frames, so repeated questions about a capture skip the DB read and decrypt
+        self.frame_cache_size = frame_cache_size
+        self._frame_cache = OrderedDict()
+        self._frame_cache_lock = threading.Lock()
+        
+        # (id, perceptual hash) of recently stored frames that own their data
+        if dedup_mode not in ('reference', 'skip'):
+            raise ValueError(f"Unknown dedup mode: {dedup_mode}")
+        self.dedup_threshold = dedup_threshold
+        self.dedup_mode = dedup_mode
+        self._recent_hashes = deque(maxlen=max(dedup_window, 1))
+        self._dedup_lock = threading.Lock()
+        self.frames_seen = 0
+        self.duplicates_skipped = 0
+        
+        # Frames are encoded off the capture thread so encoding doesn't compete with the game
+        self.capture_settings = {**CAPTURE_SETTINGS, **(capture_settings or {})}
+        self.capture_workers = capture_workers
+        self._encoder = None
+        self._encoder_lock = threading.Lock()
+        
         # Generate or load encryption key
         self.key = self._get_or_create_key()
         self.cipher = Fernet(self.key)
+        # Payloads are written in the chunked AES-GCM format; the Fernet key still reads older ones
+        self.keyring = keyring or KeyRing.load_or_create(default_keyring_path(db_path))
+        self.crypto = FrameCipher(self.keyring, legacy=self.cipher)
+        
+        # Payloads live in a content-addressed file store; the table keeps metadata only
+        self.blobs = BlobStore(blob_dir or default_blob_dir(db_path))
         
-        # Initialize database
+        # Initialize database: one writer thread, pooled read-only connections
+        self.db = ScreenshotDatabase(db_path)
         self._init_database()
+        self._load_recent_hashes()
+        
+        # Prunes old frames while capturing, so disk use stays bounded
+        self.retention = ScreenshotRetention(self)
+        # Moves Fernet payloads and those under rotated-out keys to the active key while capturing
+        self.reencryption = ScreenshotReencryption(self)
+        
+        # Background capture runs grab -> dedupe -> encode -> encrypt -> persist as overlapping stages,
+        # holding frames back while a game is in the foreground or the CPU budget is spent
+        self.governor = governor or ResourceGovernor()
+        self.pipeline = CapturePipeline(self, **(pipeline_options or {}))
+        
+        # After a crash, remove blob files of transactions it cut short
+        self._sweep_stop = threading.Event()
+        self._sweeper = None
+        if self.blobs.open_session():
+            self._sweeper = threading.Thread(target=self._sweep_blobs, name="pixly-blob-sweep", daemon=True)
+            self._sweeper.start()
+        
+        # Finish data rewrites left by migrations (also resumes ones interrupted by a restart)
+        self.migrations.start()
     
     def _get_or_create_key(self):
         """Get existing encryption key or create a new one."""
@@ -44,166 +271,436 @@ class ScreenshotCapture:
             return key
     
     def _init_database(self):
-        """Initialize the encrypted SQLite database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create screenshots table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS screenshots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                application TEXT NOT NULL,
-                window_title TEXT,
-                encrypted_data BLOB NOT NULL,
-                file_hash TEXT NOT NULL
-            )
-        ''')
-        
-        # Create index for faster queries
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_timestamp ON screenshots(timestamp)
-        ''')
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_application ON screenshots(application)
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Bring the database to the latest schema; long rewrites are queued as backfills."""
+        self.migrations = MigrationRunner(self.db, MIGRATIONS, {
+            'screenshot_ts': _backfill_ts,
+            'inline_payloads': self._backfill_inline_payloads,
+            'incremental_vacuum': _convert_auto_vacuum,
+        })
+        self.migrations.migrate()
     
-    def _get_active_window_info(self):
-        """Get information about the currently active window."""
+    def _sweep_blobs(self):
+        """Remove blob files a crash left without a row (runs in the background after an unclean exit)."""
         try:
-            # Get the active window
-            hwnd = win32gui.GetForegroundWindow()
-            window_title = win32gui.GetWindowText(hwnd)
-            
-            # Get process information
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            process = psutil.Process(pid)
-            application = process.name()
-            
-            return {
-                'application': application,
-                'window_title': window_title,
-                'pid': pid
-            }
+            removed = self.blobs.sweep(self.db.read, self._sweep_stop)
+            if removed:
+                print(f"Removed {removed} orphaned blob files")
         except Exception as e:
-            print(f"Error getting window info: {e}")
-            return {
-                'application': 'Unknown',
-                'window_title': 'Unknown',
-                'pid': 0
-            }
+            self.blobs.dirty = True
+            print(f"Error sweeping blob files: {e}")
     
-    def _capture_screenshot(self):
-        """Capture a screenshot and return the image data."""
+    def _backfill_inline_payloads(self, conn, cursor, batch_size):
+        """Move payloads stored inside screenshots.db (from before the blob store) into blob files."""
+        # Each row is decrypted and written to disk, so take a fraction of a batch of plain updates
+        rows = conn.execute('''
+            SELECT id, encrypted_data FROM screenshots
+            WHERE id > ? AND blob_hash IS NULL AND length(encrypted_data) > 0
+            ORDER BY id LIMIT ?
+        ''', (cursor, max(1, batch_size // 25))).fetchall()
+        if not rows:
+            # The moved payloads left the database file mostly free pages; compact it (and
+            # switch it to incremental auto-vacuum) now that they are out
+            schedule_backfill(conn, 'incremental_vacuum')
+            return None, 0
+        moved = 0
+        for screenshot_id, encrypted_data in rows:
+            try:
+                # Address by plaintext so identical frames collapse into one blob
+                blob_hash = self.blobs.hash_of(self._decrypt_data(encrypted_data))
+            except Exception as e:
+                print(f"Blob backfill: screenshot {screenshot_id} skipped: {e}")
+                continue
+            self.blobs.add_ref(conn, blob_hash, encrypted_data, FrameCipher.key_id_of(encrypted_data))
+            conn.execute("UPDATE screenshots SET blob_hash = ?, encrypted_data = X'' WHERE id = ?",
+                         (blob_hash, screenshot_id))
+            moved += 1
+        return rows[-1][0], moved
+    
+    def _get_active_window_info(self):
+        """Get information about the currently active window."""
+        return self.window_provider.window_info()
+    
+    def _get_encoder(self):
+        """Start the encoder process pool on first use."""
+        with self._encoder_lock:
+            if self._encoder is None:
+                # Workers run below normal priority, so encoding yields to the game
+                self._encoder = ProcessPoolExecutor(max_workers=self.capture_workers, initializer=lower_priority)
+            return self._encoder
+    
+    def _encode_frame(self, screenshot, phash=True):
+        """Encode a grabbed frame with the capture settings, in a worker process if configured."""
+        if self.capture_workers <= 0:
+            return encode_frame(screenshot, phash=phash, **self.capture_settings)
+        return self._get_encoder().submit(encode_frame, screenshot, phash=phash, **self.capture_settings).result()
+    
+    def _grab(self, window_info):
+        """Grab a frame of the capture region: the desktop, the foreground window or a monitor."""
+        bbox = None
+        if self.capture_region != 'desktop':
+            monitors = self.window_provider.monitors() if hasattr(self.window_provider, 'monitors') else []
+            bbox = capture_bbox(self.capture_region, window_info, monitors, self.capture_monitor)
+        frame = self.grabber.grab() if bbox is None else self.grabber.grab(bbox)
+        self.last_frame_size = frame.size
+        return frame
+    
+    def _capture_screenshot(self, frame_info=None, window_info=None):
+        """Capture a screenshot and return the image data.
+        
+        Args:
+            frame_info (dict): If given, filled with the frame's encode_ms, phash and thumbnail
+            window_info (dict): Foreground window, for the 'window' and 'monitor' regions (looked up if None)
+        """
         try:
+            if window_info is None and self.capture_region != 'desktop':
+                window_info = self._get_active_window_info()
             # Capture screenshot
-            screenshot = ImageGrab.grab()
+            with timed(screenshot_stage_seconds, stage='capture'):
+                screenshot = self._grab(window_info)
             
-            # Convert to bytes
-            import io
-            img_buffer = io.BytesIO()
-            screenshot.save(img_buffer, format='PNG')
-            img_data = img_buffer.getvalue()
+            # Downscale and encode with the capture settings
+            with timed(screenshot_stage_seconds, stage='encode'):
+                encoded = self._encode_frame(screenshot)
+            img_data = encoded.pop('data')
+            screenshot_frame_bytes.observe(len(img_data), format=self.capture_settings['fmt'])
+            if frame_info is not None:
+                frame_info.update(encoded)
             
             return img_data
         except Exception as e:
             print(f"Error capturing screenshot: {e}")
+            screenshot_failures_total.inc()
             return None
     
     def _encrypt_data(self, data):
         """Encrypt the screenshot data."""
-        return self.cipher.encrypt(data)
+        return self.crypto.encrypt(data)
     
     def _decrypt_data(self, encrypted_data):
-        """Decrypt the screenshot data."""
-        return self.cipher.decrypt(encrypted_data)
+        """Decrypt the screenshot data (either storage format)."""
+        return self.crypto.decrypt(encrypted_data)
     
     def _calculate_hash(self, data):
         """Calculate SHA-256 hash of the data."""
         return hashlib.sha256(data).hexdigest()
     
-    def save_screenshot(self, img_data, window_info):
-        """Save screenshot to encrypted database."""
-        if not img_data:
-            return False
-        
+    def _perceptual_hash(self, img_data):
+        """dHash of the encoded frame, or None if it can't be decoded."""
         try:
-            # Encrypt the image data
-            encrypted_data = self._encrypt_data(img_data)
-            
-            # Calculate hash for deduplication
-            file_hash = self._calculate_hash(img_data)
-            
-            # Get current timestamp
-            timestamp = datetime.now().isoformat()
-            
-            # Save to database
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO screenshots (timestamp, application, window_title, encrypted_data, file_hash)
-                VALUES (?, ?, ?, ?, ?)
+            import io
+            with timed(screenshot_stage_seconds, stage='phash'):
+                return dhash(Image.open(io.BytesIO(img_data)))
+        except Exception:
+            return None
+    
+    def _make_thumbnail(self, img_data):
+        """Gallery thumbnail of an encoded frame, or None if it can't be decoded."""
+        try:
+            import io
+            with timed(screenshot_stage_seconds, stage='thumbnail'):
+                return make_thumbnail(Image.open(io.BytesIO(img_data)))
+        except Exception:
+            return None
+    
+    def _load_recent_hashes(self):
+        """Seed the dedup window with the newest stored frames, so a restart doesn't store a duplicate."""
+        rows = self.db.read('''
+            SELECT id, phash FROM screenshots
+            WHERE phash IS NOT NULL AND ref_id IS NULL
+            ORDER BY id DESC LIMIT ?
+        ''', (self._recent_hashes.maxlen,))
+        for screenshot_id, phash in reversed(rows):
+            self._recent_hashes.append((screenshot_id, int(phash, 16)))
+    
+    def _find_duplicate(self, phash):
+        """Return the id of a recent frame within the Hamming threshold of phash, or None."""
+        if phash is None or self.dedup_threshold < 0:
+            return None
+        with self._dedup_lock:
+            for screenshot_id, recent in reversed(self._recent_hashes):
+                if hamming_distance(phash, recent) <= self.dedup_threshold:
+                    return screenshot_id
+        return None
+    
+    def _count_frame(self, duplicate):
+        """Count a frame checked for duplicates (and a skipped one, in skip mode)."""
+        with self._dedup_lock:
+            self.frames_seen += 1
+            if duplicate and self.dedup_mode == 'skip':
+                self.duplicates_skipped += 1
+    
+    def _frame_insert(self, window_info, timestamp, phash, img_data=None, encrypted_data=b'',
+                      encrypted_thumbnail=None, encode_ms=None):
+        """Build insert(conn, duplicate_of), which adds a frame's row and takes a reference to its blob.
+        
+        Args:
+            window_info (dict): Active window details
+            timestamp (str): ISO capture time
+            phash (int): Perceptual hash, or None
+            img_data (bytes): Encoded frame; a reference without it copies the original's hash, type and size
+            encrypted_data (bytes): Encrypted img_data (unused for references)
+            encrypted_thumbnail (bytes): Encrypted gallery thumbnail
+            encode_ms (float): Time spent encoding the frame
+        
+        Returns:
+            callable: Runs on the writer connection; returns the new row's ID, or None if the
+                referenced frame no longer exists (with img_data, the frame is then stored in full)
+        """
+        # Content address of the payload; identical frames share one blob
+        file_hash = None if img_data is None else self._calculate_hash(img_data)
+        phash_hex = None if phash is None else f"{phash:016x}"
+        ts = epoch_ms(timestamp)
+        
+        def insert(conn, duplicate_of):
+            if img_data is None:
+                cursor = conn.execute('''
+                    INSERT INTO screenshots (timestamp, ts, application, window_title, encrypted_data, file_hash,
+                                             phash, ref_id, mime_type, byte_size)
+                    SELECT ?, ?, ?, ?, X'', file_hash, ?, id, mime_type, byte_size FROM screenshots WHERE id = ?
+                ''', (timestamp, ts, window_info['application'], window_info['window_title'], phash_hex,
+                      duplicate_of))
+                return cursor.lastrowid if cursor.rowcount else None
+            payload = encrypted_data
+            if duplicate_of is not None and not conn.execute('SELECT 1 FROM screenshots WHERE id = ?',
+                                                             (duplicate_of,)).fetchone():
+                # The original was deleted since dedupe; store this frame in full instead
+                duplicate_of = None
+                payload = self._encrypt_data(img_data)
+            blob_hash = file_hash if duplicate_of is None else None
+            if blob_hash is not None:
+                self.blobs.add_ref(conn, blob_hash, payload, self.crypto.write_key_id)
+            return conn.execute('''
+                INSERT INTO screenshots (timestamp, ts, application, window_title, encrypted_data, file_hash,
+                                         phash, ref_id, mime_type, byte_size, encode_ms, blob_hash,
+                                         encrypted_thumbnail)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 timestamp,
+                ts,
                 window_info['application'],
                 window_info['window_title'],
-                encrypted_data,
-                file_hash
-            ))
+                b'',
+                file_hash,
+                phash_hex,
+                duplicate_of,
+                mime_type_of(img_data),
+                len(img_data),
+                encode_ms,
+                blob_hash,
+                encrypted_thumbnail
+            )).lastrowid
+        
+        return insert
+    
+    def _frame_stored(self, screenshot_id, window_info, timestamp, phash, duplicate_of):
+        """Count a committed frame and add it to the dedup window; returns screenshot_id."""
+        if screenshot_id is None:
+            print(f"Screenshot dropped: #{duplicate_of} it duplicates was deleted")
+            return None
+        screenshots_saved_total.inc()
+        
+        if duplicate_of is None:
+            if phash is not None:
+                with self._dedup_lock:
+                    self._recent_hashes.append((screenshot_id, phash))
+            print(f"Screenshot saved: {window_info['application']} - {timestamp}")
+        else:
+            screenshots_deduplicated_total.inc(mode='reference')
+            print(f"Screenshot saved as reference to #{duplicate_of}: {window_info['application']} - {timestamp}")
+        return screenshot_id
+    
+    def _store_frame(self, window_info, timestamp, phash, duplicate_of, img_data=None, encrypted_data=b'',
+                     encrypted_thumbnail=None, encode_ms=None):
+        """Insert a frame's row, and take a reference to its blob, in one writer transaction.
+        
+        Args:
+            window_info (dict): Active window details
+            timestamp (str): ISO capture time
+            phash (int): Perceptual hash, or None
+            duplicate_of (int): ID of the stored frame this one references, or None
+            img_data, encrypted_data, encrypted_thumbnail, encode_ms: As for _frame_insert
+        
+        Returns:
+            int: ID of the new row, or None if the referenced frame no longer exists
+        """
+        insert = self._frame_insert(window_info, timestamp, phash, img_data=img_data, encrypted_data=encrypted_data,
+                                    encrypted_thumbnail=encrypted_thumbnail, encode_ms=encode_ms)
+        # Save the blob and its row in one writer transaction
+        def write(conn):
+            screenshot_id = insert(conn, duplicate_of)
+            if screenshot_id is None:
+                return None, duplicate_of
+            # A frame whose original was deleted meanwhile was stored in full
+            return screenshot_id, conn.execute('SELECT ref_id FROM screenshots WHERE id = ?',
+                                               (screenshot_id,)).fetchone()[0]
+        
+        with timed(screenshot_stage_seconds, stage='insert'):
+            screenshot_id, duplicate_of = self.db.write(write)
+        return self._frame_stored(screenshot_id, window_info, timestamp, phash, duplicate_of)
+    
+    def save_screenshot(self, img_data, window_info, frame_info=None):
+        """Save screenshot to encrypted database.
+        
+        Near-duplicates of a recent frame are stored as a reference to it (or skipped,
+        depending on dedup_mode) instead of another copy of the image.
+        
+        Args:
+            img_data (bytes): Encoded frame
+            window_info (dict): Active window details
+            frame_info (dict): encode_ms, phash and thumbnail from _capture_screenshot, if known
+        """
+        if not img_data:
+            return False
+        if frame_info is None:
+            frame_info = {}
+        
+        try:
+            phash = frame_info.get('phash')
+            if phash is None:
+                phash = self._perceptual_hash(img_data)
+            duplicate_of = self._find_duplicate(phash)
+            frame_info['duplicate_of'] = duplicate_of
+            self._count_frame(duplicate_of is not None)
             
-            conn.commit()
-            conn.close()
+            if duplicate_of is not None and self.dedup_mode == 'skip':
+                screenshots_deduplicated_total.inc(mode='skip')
+                print(f"Screenshot skipped: {window_info['application']} matches #{duplicate_of}")
+                return True
             
-            print(f"Screenshot saved: {window_info['application']} - {timestamp}")
+            # Encrypt the image data and thumbnail (a reference row borrows the original's)
+            encrypted_data = b''
+            encrypted_thumbnail = None
+            if duplicate_of is None:
+                thumbnail = frame_info.get('thumbnail') or self._make_thumbnail(img_data)
+                with timed(screenshot_stage_seconds, stage='encrypt'):
+                    encrypted_data = self._encrypt_data(img_data)
+                    if thumbnail:
+                        encrypted_thumbnail = self._encrypt_data(thumbnail)
+            
+            self._store_frame(window_info, datetime.now().isoformat(), phash, duplicate_of, img_data=img_data,
+                              encrypted_data=encrypted_data, encrypted_thumbnail=encrypted_thumbnail,
+                              encode_ms=frame_info.get('encode_ms'))
             return True
             
         except Exception as e:
             print(f"Error saving screenshot: {e}")
+            screenshot_failures_total.inc()
             return False
     
     def capture_and_save(self):
-        """Capture a screenshot and save it to the database."""
+        """Capture a screenshot and save it to the database.
+        
+        While background capture is running the frame goes through the capture
+        pipeline instead, and the result reflects the last frame it deduplicated.
+        
+        Returns:
+            dict: The foreground window and whether the frame was a near-duplicate (for the schedule)
+        """
+        if self.pipeline.running:
+            return self.pipeline.grab()
         window_info = self._get_active_window_info()
-        img_data = self._capture_screenshot()
+        frame_info = {}
+        img_data = self._capture_screenshot(frame_info, window_info)
         
         if img_data:
-            self.save_screenshot(img_data, window_info)
+            self.save_screenshot(img_data, window_info, frame_info)
+        return {'window_info': window_info, 'static': frame_info.get('duplicate_of') is not None}
+    
+    def _game_for(self, application):
+        """Known game an application belongs to, or None."""
+        # Imported here: game detection reads recent screenshots through this module
+        from .game_detection import game_for_process
+        return game_for_process(application)
+    
+    def _next_delay(self, activity):
+        """Ask the schedule how long to wait after a capture."""
+        window_info = activity['window_info']
+        return self.schedule.observe((window_info['application'], window_info.get('pid')),
+                                     self._game_for(window_info['application']), activity['static'])
     
     def _capture_loop(self):
         """Main capture loop that runs in a separate thread."""
-        while self.running:
+        # Each capture is due a delay after the previous one was *due*, not after it finished,
+        # so time spent capturing and saving doesn't stretch the period
+        next_due = time.monotonic()
+        while not self._stop_event.is_set():
             try:
-                self.capture_and_save()
-                time.sleep(self.interval)
+                delay = self._next_delay(self.capture_and_save())
             except Exception as e:
                 print(f"Error in capture loop: {e}")
-                time.sleep(self.interval)
+                delay = self.schedule.interval
+            now = time.monotonic()
+            # After an overrun (e.g. the machine slept) start again from now instead of catching up in a burst
+            next_due = max(next_due + delay, now)
+            if self._stop_event.wait(next_due - now):
+                break
     
     def start_capture(self):
         """Start the automatic screenshot capture."""
         if not self.running:
             self.running = True
+            self.schedule.interval = self.interval
+            self.schedule.reset()
+            self._stop_event.clear()
+            self.pipeline.start()
             self.thread = threading.Thread(target=self._capture_loop, daemon=True)
             self.thread.start()
+            self.retention.start()
+            self.reencryption.start()
             print(f"Screenshot capture started with {self.interval}s interval")
     
     def stop_capture(self):
-        """Stop the automatic screenshot capture."""
+        """Stop the automatic screenshot capture (an in-progress capture finishes, the wait does not)."""
         self.running = False
+        self._stop_event.set()
         if self.thread:
             self.thread.join()
+        # Frames already grabbed are still stored
+        self.pipeline.stop()
+        self.retention.stop()
+        self.reencryption.stop()
         print("Screenshot capture stopped")
     
+    def close(self):
+        """Stop capturing and close the database (pending writes are flushed first)."""
+        if self.running:
+            self.stop_capture()
+        self.migrations.stop()
+        if self._sweeper is not None:
+            self._sweep_stop.set()
+            self._sweeper.join()
+        if self._encoder is not None:
+            self._encoder.shutdown()
+        self.db.close()
+        # Orphaned files are only possible if the process dies before this point
+        self.blobs.close_session()
+    
     def get_screenshots(self, limit=10, application=None, start_date=None, end_date=None):
-        """Retrieve screenshots from the database with optional filters."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Retrieve screenshots from the database with optional filters, newest first."""
+        return self.get_screenshot_page(limit, application, start_date, end_date)['screenshots']
+    
+    def get_screenshot_page(self, limit=10, application=None, start_date=None, end_date=None, cursor=None):
+        """
+        Retrieve one page of screenshots, newest first, with keyset pagination.
+        
+        Each page seeks on the (ts) or (application, ts) index from the previous page's
+        last row, so deep pages cost the same as the first.
+        
+        Args:
+            limit (int): Rows per page
+            application (str): Only this application's frames
+            start_date (str | datetime): Only frames captured at or after this time
+            end_date (str | datetime): Only frames captured at or before this time
+            cursor (str): next_cursor of the previous page (None for the first page)
+        
+        Returns:
+            dict: {'screenshots': rows of (id, timestamp, application, window_title, file_hash),
+                   'next_cursor': cursor of the following page, or None on the last page}
         
-        query = "SELECT id, timestamp, application, window_title, file_hash FROM screenshots WHERE 1=1"
+        Raises:
+            ValueError: If cursor is malformed
+        """
+        query = "SELECT id, timestamp, application, window_title, file_hash, ts FROM screenshots WHERE 1=1"
         params = []
         
         if application:
@@ -211,99 +708,342 @@ class ScreenshotCapture:
             params.append(application)
         
         if start_date:
-            query += " AND timestamp >= ?"
-            params.append(start_date)
+            query += " AND ts >= ?"
+            params.append(epoch_ms(start_date))
         
         if end_date:
-            query += " AND timestamp <= ?"
-            params.append(end_date)
+            query += " AND ts <= ?"
+            params.append(epoch_ms(end_date))
         
-        query += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
+        if cursor:
+            query += " AND (ts, id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
         
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
+        query += " ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit)
         
-        return results
+        rows = self.db.read(query, params)
+        # Rows still waiting for the ts backfill sort last and can't be paged past
+        next_cursor = None
+        if rows and len(rows) == limit and rows[-1][5] is not None:
+            next_cursor = encode_cursor(rows[-1][5], rows[-1][0])
+        return {'screenshots': [row[:5] for row in rows], 'next_cursor': next_cursor}
+    
+    def _open_payload(self, screenshot_id):
+        """Open the encrypted payload a screenshot serves, as a file object; None if there is none."""
+        # Near-duplicate rows read the data of the frame they reference
+        result = self.db.read_one('''
+            SELECT s.encrypted_data, s.blob_hash, original.id, original.encrypted_data, original.blob_hash,
+                   b.file
+            FROM screenshots s LEFT JOIN screenshots original ON original.id = s.ref_id
+            LEFT JOIN blobs b ON b.hash = COALESCE(original.blob_hash, s.blob_hash)
+            WHERE s.id = ?
+        ''', (screenshot_id,))
+        if not result:
+            return None
+        encrypted_data, blob_hash = result[3:5] if result[2] is not None else result[0:2]
+        # Rows written before the blob store keep their payload inline
+        if not blob_hash:
+            return io.BytesIO(encrypted_data)
+        source = self.blobs.open(blob_hash, result[5])
+        if source is None:
+            # Re-encryption may have switched the blob to a new file since the query
+            current = self.db.read_one("SELECT file FROM blobs WHERE hash = ?", (blob_hash,))
+            if current and current[0] != result[5]:
+                source = self.blobs.open(blob_hash, current[0])
+        if source is None:
+            print(f"Screenshot {screenshot_id}: blob {blob_hash} is missing")
+        return source
     
     def get_screenshot_data(self, screenshot_id):
         """Retrieve and decrypt screenshot data by ID."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._frame_cache_lock:
+            if screenshot_id in self._frame_cache:
+                self._frame_cache.move_to_end(screenshot_id)
+                return self._frame_cache[screenshot_id]
         
-        cursor.execute('''
-            SELECT encrypted_data FROM screenshots WHERE id = ?
+        source = self._open_payload(screenshot_id)
+        if source is None:
+            return None
+        with source:
+            data = self._decrypt_data(source.read())
+        self._cache_frame(screenshot_id, data)
+        return data
+    
+    def stream_screenshot_data(self, screenshot_id, offset=0):
+        """
+        Decrypted screenshot bytes from offset on, one chunk at a time; None if the screenshot is missing.
+        
+        Only the chunks from the one holding offset are read and decrypted, so serving
+        a byte range doesn't decrypt (or cache) the whole frame.
+        """
+        with self._frame_cache_lock:
+            cached = self._frame_cache.get(screenshot_id)
+        if cached is not None:
+            return iter([cached[offset:]])
+        source = self._open_payload(screenshot_id)
+        if source is None:
+            return None
+        
+        def chunks():
+            with source:
+                yield from self.crypto.decrypt_stream(source, offset)
+        return chunks()
+    
+    def get_image_info(self, screenshot_id):
+        """Content hash, MIME type and size of the image a screenshot serves, without decrypting it."""
+        result = self.db.read_one('''
+            SELECT COALESCE(original.file_hash, s.file_hash),
+                   COALESCE(original.mime_type, s.mime_type),
+                   COALESCE(original.byte_size, s.byte_size)
+            FROM screenshots s LEFT JOIN screenshots original ON original.id = s.ref_id
+            WHERE s.id = ?
         ''', (screenshot_id,))
+        if not result:
+            return None
+        file_hash, mime_type, byte_size = result
+        return {'file_hash': file_hash, 'mime_type': mime_type, 'byte_size': byte_size}
+    
+    def get_thumbnail(self, screenshot_id):
+        """Decrypted JPEG thumbnail of a screenshot, made (and stored) on first request for older rows."""
+        result = self.db.read_one('''
+            SELECT COALESCE(original.id, s.id), COALESCE(original.encrypted_thumbnail, s.encrypted_thumbnail)
+            FROM screenshots s LEFT JOIN screenshots original ON original.id = s.ref_id
+            WHERE s.id = ?
+        ''', (screenshot_id,))
+        if not result:
+            return None
+        owner_id, encrypted_thumbnail = result
+        if encrypted_thumbnail:
+            return self._decrypt_data(encrypted_thumbnail)
         
-        result = cursor.fetchone()
-        conn.close()
+        data = self.get_screenshot_data(owner_id)
+        thumbnail = self._make_thumbnail(data) if data else None
+        if thumbnail:
+            self.db.execute_write('UPDATE screenshots SET encrypted_thumbnail = ? WHERE id = ?',
+                                  (self._encrypt_data(thumbnail), owner_id))
+        return thumbnail
+    
+    def _cache_frame(self, screenshot_id, data):
+        """Remember a decrypted frame, evicting the least recently used."""
+        if self.frame_cache_size <= 0:
+            return
+        with self._frame_cache_lock:
+            self._frame_cache[screenshot_id] = data
+            self._frame_cache.move_to_end(screenshot_id)
+            while len(self._frame_cache) > self.frame_cache_size:
+                self._frame_cache.popitem(last=False)
+    
+    def _delete_row(self, conn, screenshot_id):
+        """
+        Delete one row inside a write transaction.
         
-        if result:
-            encrypted_data = result[0]
-            return self._decrypt_data(encrypted_data)
-        return None
+        If near-duplicates reference this frame, the oldest of them takes over its data;
+        otherwise its blob reference is released (removing the file if it was the last).
+        
+        Returns:
+            tuple: (rows deleted, heir id or None, blob bytes freed)
+        """
+        heir = conn.execute('SELECT MIN(id) FROM screenshots WHERE ref_id = ?', (screenshot_id,)).fetchone()[0]
+        freed = 0
+        if heir is not None:
+            conn.execute('''
+                UPDATE screenshots
+                SET encrypted_data = (SELECT encrypted_data FROM screenshots WHERE id = ?),
+                    blob_hash = (SELECT blob_hash FROM screenshots WHERE id = ?),
+                    encrypted_thumbnail = (SELECT encrypted_thumbnail FROM screenshots WHERE id = ?),
+                    ref_id = NULL
+                WHERE id = ?
+            ''', (screenshot_id, screenshot_id, screenshot_id, heir))
+            conn.execute('UPDATE screenshots SET ref_id = ? WHERE ref_id = ?', (heir, screenshot_id))
+        else:
+            row = conn.execute('''
+                SELECT s.blob_hash, b.size FROM screenshots s LEFT JOIN blobs b ON b.hash = s.blob_hash
+                WHERE s.id = ?
+            ''', (screenshot_id,)).fetchone()
+            if row and row[0] and self.blobs.release(conn, row[0]):
+                freed = row[1] or 0
+        deleted = conn.execute('DELETE FROM screenshots WHERE id = ?', (screenshot_id,)).rowcount
+        return deleted, heir, freed
     
-    def get_stats(self):
-        """Get statistics about stored screenshots."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def delete_screenshots(self, screenshot_ids):
+        """
+        Delete several rows in one writer transaction.
         
-        # Total count
-        cursor.execute("SELECT COUNT(*) FROM screenshots")
-        total_count = cursor.fetchone()[0]
+        Returns:
+            dict: {'deleted': rows deleted, 'freed_bytes': blob bytes removed from disk}
+        """
+        screenshot_ids = list(screenshot_ids)
+        with self._frame_cache_lock:
+            for screenshot_id in screenshot_ids:
+                self._frame_cache.pop(screenshot_id, None)
         
-        # Count by application
-        cursor.execute('''
-            SELECT application, COUNT(*) as count 
-            FROM screenshots 
-            GROUP BY application 
-            ORDER BY count DESC
-        ''')
-        app_counts = cursor.fetchall()
+        def delete(conn):
+            return [(screenshot_id, *self._delete_row(conn, screenshot_id)) for screenshot_id in screenshot_ids]
+        
+        results = self.db.write(delete)
         
-        # Date range
+        # Keep the dedup window pointing at frames that still own their data
+        heirs = {screenshot_id: heir for screenshot_id, _, heir, _ in results}
+        with self._dedup_lock:
+            recent_hashes = deque(maxlen=self._recent_hashes.maxlen)
+            for recent_id, phash in self._recent_hashes:
+                while recent_id in heirs:
+                    recent_id = heirs[recent_id]
+                if recent_id is not None:
+                    recent_hashes.append((recent_id, phash))
+            self._recent_hashes = recent_hashes
+        return {
+            'deleted': sum(result[1] for result in results),
+            'freed_bytes': sum(result[3] for result in results)
+        }
+    
+    def delete_screenshot(self, screenshot_id):
+        """Delete a screenshot row by ID. Returns True if a row was deleted."""
+        return self.delete_screenshots([screenshot_id])['deleted'] > 0
+    
+    def get_stats(self):
+        """Get statistics about stored screenshots."""
+        with self.db.reader() as conn:
+            return self._read_stats(conn.cursor())
+    
+    def _read_stats(self, cursor):
+        """Compute the stats dict on one read connection (a consistent snapshot)."""
+        # Per-application totals and time bounds, maintained by triggers (see screenshot_summary)
         cursor.execute('''
-            SELECT MIN(timestamp), MAX(timestamp) FROM screenshots
+            SELECT application, frames, referenced, bytes, first_ts, last_ts
+            FROM screenshot_app_stats
+            ORDER BY frames DESC
         ''')
-        date_range = cursor.fetchone()
+        app_rows = cursor.fetchall()
+        app_counts = [(application, frames) for application, frames, *_ in app_rows]
+        total_count = sum(row[1] for row in app_rows)
+        first_timestamps = [row[4] for row in app_rows if row[4] is not None]
+        last_timestamps = [row[5] for row in app_rows if row[5] is not None]
+        date_range = (min(first_timestamps, default=None), max(last_timestamps, default=None))
+        
+        # Near-duplicates stored as references, plus those skipped since startup
+        referenced = sum(row[2] for row in app_rows)
+        with self._dedup_lock:
+            frames_seen, skipped = self.frames_seen, self.duplicates_skipped
+        
+        # Average stored size and encode time per format, to compare capture profiles
+        cursor.execute("SELECT mime_type, frames, bytes, encode_ms, timed_frames FROM screenshot_format_stats")
+        encoding = [
+            {'mime_type': mime_type, 'frames': count, 'avg_bytes': round(total_bytes / count),
+             'avg_encode_ms': round(encode_ms / timed, 2) if timed else None}
+            for mime_type, count, total_bytes, encode_ms, timed in cursor.fetchall()
+        ]
         
-        conn.close()
+        # Payload files on disk, and the keys they're encrypted with (key 0: Fernet)
+        cursor.execute("SELECT key_id, blobs, bytes FROM blob_key_stats")
+        blob_rows = cursor.fetchall()
+        blob_count = sum(row[1] for row in blob_rows)
+        blob_bytes = sum(row[2] for row in blob_rows)
+        blobs_by_key = {('fernet' if key_id == 0 else str(key_id)): count for key_id, count, _ in blob_rows}
         
         return {
             'total_screenshots': total_count,
             'applications': app_counts,
-            'date_range': date_range
+            'date_range': date_range,
+            'by_application': [
+                {'application': application, 'frames': frames, 'referenced': refs, 'bytes': total_bytes,
+                 'first_seen': first_ts, 'last_seen': last_ts}
+                for application, frames, refs, total_bytes, first_ts, last_ts in app_rows
+            ],
+            'deduplication': {
+                'mode': self.dedup_mode,
+                'threshold': self.dedup_threshold,
+                'referenced': referenced,
+                'skipped': skipped,
+                'frames_seen': frames_seen,
+                'skip_rate': round(skipped / frames_seen, 4) if frames_seen else 0.0
+            },
+            'encoding': encoding,
+            'blob_store': {'blobs': blob_count, 'bytes': blob_bytes},
+            'retention': dict(self.retention.totals),
+            'pipeline': self.pipeline.stats(),
+            'governor': self.governor.stats(),
+            'capture': {
+                'region': self.capture_region,
+                'monitor': self.capture_monitor,
+                'last_frame_size': self.last_frame_size
+            },
+            'encryption': {
+                'format': self.crypto.write_format,
+                'active_key_id': self.crypto.write_key_id,
+                'blobs_by_key': blobs_by_key,
+                'reencryption': dict(self.reencryption.totals)
+            },
+            'schema': self.migrations.status(),
+            'database': self.db.stats(),
+            'schedule': {
+                'base_interval': self.schedule.interval,
+                'next_interval': round(self.schedule.last_interval, 3),
+                'reason': self.schedule.last_reason
+            }
         }
 
-# Global instance
-screenshot_capture = ScreenshotCapture()
+def _shutdown_capture(capture):
+    """Stop the capture thread and flush pending writes when the app shuts down."""
+    capture.close()
+
+# Global instance, built on first use (or by the startup warmup)
+container.register('screenshot_capture', ScreenshotCapture, shutdown=_shutdown_capture)
+screenshot_capture = None
+
+def get_screenshot_capture() -> ScreenshotCapture:
+    """Get the shared ScreenshotCapture, creating the database and key file on first use."""
+    global screenshot_capture
+    if screenshot_capture is None:
+        screenshot_capture = container.get('screenshot_capture')
+    return screenshot_capture
 
 def start_screenshot_capture(interval=30):
     """Start the screenshot capture system."""
-    global screenshot_capture
+    screenshot_capture = get_screenshot_capture()
     screenshot_capture.interval = interval
     screenshot_capture.start_capture()
 
 def stop_screenshot_capture():
     """Stop the screenshot capture system."""
-    global screenshot_capture
-    screenshot_capture.stop_capture()
+    get_screenshot_capture().stop_capture()
 
 def get_recent_screenshots(limit=10, application=None):
     """Get recent screenshots."""
-    global screenshot_capture
-    return screenshot_capture.get_screenshots(limit=limit, application=application)
+    return get_screenshot_capture().get_screenshots(limit=limit, application=application)
+
+def get_screenshot_page(limit=10, application=None, cursor=None):
+    """Get one page of recent screenshots and the cursor of the next."""
+    return get_screenshot_capture().get_screenshot_page(limit=limit, application=application, cursor=cursor)
 
 def get_screenshot_by_id(screenshot_id):
     """Get screenshot data by ID."""
-    global screenshot_capture
-    return screenshot_capture.get_screenshot_data(screenshot_id)
+    return get_screenshot_capture().get_screenshot_data(screenshot_id)
+
+def stream_screenshot_by_id(screenshot_id, offset=0):
+    """Get screenshot data by ID from offset on, decrypted a chunk at a time."""
+    return get_screenshot_capture().stream_screenshot_data(screenshot_id, offset)
+
+def get_screenshot_image_info(screenshot_id):
+    """Get a screenshot's content hash, MIME type and size by ID."""
+    return get_screenshot_capture().get_image_info(screenshot_id)
+
+def get_screenshot_thumbnail(screenshot_id):
+    """Get a screenshot's JPEG thumbnail by ID."""
+    return get_screenshot_capture().get_thumbnail(screenshot_id)
+
+def run_screenshot_retention():
+    """Apply the retention policy now."""
+    return get_screenshot_capture().retention.run_once()
+
+def run_screenshot_reencryption():
+    """Re-encrypt stored screenshots with the active key now."""
+    return get_screenshot_capture().reencryption.run_once()
 
 def get_screenshot_stats():
     """Get screenshot statistics."""
-    global screenshot_capture
-    return screenshot_capture.get_stats()
+    return get_screenshot_capture().get_stats()
 
 def delete_screenshot(screenshot_id: int) -> bool:
     """Delete a screenshot row by ID from the database.
@@ -311,12 +1051,7 @@ def delete_screenshot(screenshot_id: int) -> bool:
     Returns True if a row was deleted, False otherwise.
     """
     try:
-        conn = sqlite3.connect('screenshots.db')
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM screenshots WHERE id = ?', (screenshot_id,))
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        deleted = get_screenshot_capture().delete_screenshot(screenshot_id)
         if deleted:
             print(f"Deleted screenshot id={screenshot_id}")
         return deleted
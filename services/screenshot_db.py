@@ -0,0 +1,287 @@
+"""SQLite access for screenshots: one WAL writer thread fed by a queue, plus a pool of read-only connections"""
+import os
+import time
+import queue
+import sqlite3
+from threading import Lock, Thread, current_thread
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable
+
+SQLITE_SYNCHRONOUS = os.getenv('PIXLY_SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+SQLITE_MMAP_SIZE = int(os.getenv('PIXLY_SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_KB = int(os.getenv('PIXLY_SQLITE_CACHE_KB', str(32 * 1024)))
+SQLITE_READERS = int(os.getenv('PIXLY_SQLITE_READERS', '4'))
+# Batched writes (submit(batch=True)) share one transaction and one commit: up to BATCH_SIZE
+# of them, waiting up to BATCH_MS after the first for more (0 takes only those already queued)
+SQLITE_BATCH_SIZE = int(os.getenv('PIXLY_SQLITE_BATCH_SIZE', '32'))
+SQLITE_BATCH_MS = float(os.getenv('PIXLY_SQLITE_BATCH_MS', '0'))
+
+_STOP = object()
+
+# SQL for the screenshots.ts column: epoch milliseconds of a local-time ISO timestamp, as epoch_ms computes it
+TS_FROM_TIMESTAMP = "CAST(ROUND((julianday({0}, 'utc') - 2440587.5) * 86400000) AS INTEGER)"
+
+class WriterConnection(sqlite3.Connection):
+    """The writer's connection; collects callbacks to run when the current transaction ends."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_commit = []
+        self.on_rollback = []
+
+def after_commit(conn: sqlite3.Connection, func: Callable[[], None]):
+    """Run func once the writer transaction in progress commits (dropped if it rolls back).
+
+    Outside the writer (a plain connection) func runs right away.
+    """
+    if isinstance(conn, WriterConnection):
+        conn.on_commit.append(func)
+    else:
+        func()
+
+def after_rollback(conn: sqlite3.Connection, func: Callable[[], None]):
+    """Run func if the writer write in progress is rolled back (a no-op outside the writer)."""
+    if isinstance(conn, WriterConnection):
+        conn.on_rollback.append(func)
+
+def epoch_ms(timestamp) -> int:
+    """Epoch milliseconds of a datetime or ISO timestamp (naive values are local time)."""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return round(timestamp.timestamp() * 1000)
+
+class ScreenshotDatabase:
+    def __init__(self, db_path: str, read_pool_size: int = SQLITE_READERS,
+                 synchronous: str = SQLITE_SYNCHRONOUS, batch_size: int = SQLITE_BATCH_SIZE,
+                 batch_ms: float = SQLITE_BATCH_MS):
+        """
+        Open the writer connection and start the writer thread.
+
+        Every write goes through the single writer connection, so the capture
+        thread and API threads never contend for SQLite's write lock. Reads
+        use separate read-only connections, which WAL mode lets proceed
+        while a write is in progress.
+
+        Write functions can register after_commit/after_rollback callbacks,
+        so side effects outside the database (blob files) follow the
+        transaction's outcome; they run on the writer thread before the
+        write's future resolves.
+
+        Writes submitted with batch=True are group-committed: consecutive ones
+        run in one transaction, each under its own savepoint so a failing write
+        is rolled back alone, and their futures resolve after the shared
+        commit. A result is never reported before it is as durable as
+        synchronous makes it; batching only spreads the commit (and its fsync)
+        over more writes.
+
+        Args:
+            db_path (str): Path to the SQLite database file
+            read_pool_size (int): Maximum number of pooled read-only connections
+            synchronous (str): PRAGMA synchronous for the writer (OFF, NORMAL, FULL)
+            batch_size (int): Most batched writes per transaction (1 commits each one)
+            batch_ms (float): Milliseconds a batch waits for more writes after its first
+        """
+        self.db_path = db_path
+        self.read_pool_size = read_pool_size
+        self.synchronous = synchronous
+        self.batch_size = max(batch_size, 1)
+        self.batch_ms = batch_ms
+        self.commits = 0
+        self.batched_writes = 0
+        self.largest_batch = 0
+        self._writes = queue.Queue()
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = Lock()
+        self._closed = False
+
+        self._writer_conn = self._connect()
+        # Only takes effect on a new database (older ones are converted by a migration); lets
+        # retention return free pages without a full VACUUM
+        self._writer_conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._writer_conn.execute("PRAGMA journal_mode=WAL")
+        self._writer_conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._writer = Thread(target=self._write_loop, name="pixly-sqlite-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """Open a connection with the shared performance pragmas."""
+        if read_only:
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.db_path)}?mode=ro", uri=True,
+                                   check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA query_only=ON")
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30, factory=WriterConnection)
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _write_loop(self):
+        """Run queued write functions in order: each in its own transaction, or batched ones together."""
+        item = None
+        while True:
+            if item is None:
+                item = self._writes.get()
+            if item is _STOP:
+                break
+            func, future, batch = item
+            if batch:
+                # Returns the write that ended the batch, if it was taken from the queue
+                item = self._write_batch(item)
+                continue
+            item = None
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with self._writer_conn:
+                    result = func(self._writer_conn)
+            except BaseException as e:
+                self._end_transaction(committed=False)
+                future.set_exception(e)
+                continue
+            self.commits += 1
+            self._end_transaction(committed=True)
+            future.set_result(result)
+        self._writer_conn.close()
+
+    def _end_transaction(self, committed: bool, mark: tuple = (0, 0)):
+        """Run the commit or rollback callbacks registered since mark, and drop both lists back to it."""
+        conn = self._writer_conn
+        callbacks = conn.on_commit[mark[0]:] if committed else conn.on_rollback[mark[1]:]
+        del conn.on_commit[mark[0]:], conn.on_rollback[mark[1]:]
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in {'commit' if committed else 'rollback'} callback: {e}")
+
+    def _write_batch(self, item):
+        """Run item and the batched writes queued after it in one transaction; returns the next unbatched item."""
+        conn = self._writer_conn
+        deadline = time.monotonic() + self.batch_ms / 1000
+        taken, completed = 0, []
+        future, next_item = item[1], None
+        try:
+            conn.execute("BEGIN")
+            while True:
+                func, future, _ = item
+                taken += 1
+                if future.set_running_or_notify_cancel():
+                    conn.execute("SAVEPOINT batched_write")
+                    mark = (len(conn.on_commit), len(conn.on_rollback))
+                    try:
+                        result = func(conn)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO batched_write")
+                        conn.execute("RELEASE batched_write")
+                        self._end_transaction(committed=False, mark=mark)
+                        future.set_exception(e)
+                    else:
+                        conn.execute("RELEASE batched_write")
+                        completed.append((future, result))
+                if taken >= self.batch_size:
+                    break
+                try:
+                    remaining = deadline - time.monotonic()
+                    item = self._writes.get(timeout=remaining) if remaining > 0 else self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP or not item[2]:
+                    next_item = item
+                    break
+            conn.commit()
+        except BaseException as e:
+            # A write that broke the transaction itself (or the commit) fails the whole batch
+            conn.rollback()
+            self._end_transaction(committed=False)
+            if not future.done():
+                future.set_exception(e)
+            for done, _ in completed:
+                done.set_exception(e)
+            return next_item
+        self.commits += 1
+        self._end_transaction(committed=True)
+        self.batched_writes += taken
+        self.largest_batch = max(self.largest_batch, taken)
+        for done, result in completed:
+            done.set_result(result)
+        return next_item
+
+    def submit(self, func: Callable[[sqlite3.Connection], object], batch: bool = False) -> Future:
+        """Queue func(conn) to run in a transaction on the writer thread; returns a Future of its result.
+
+        With batch=True func may share its transaction with other batched writes, so it must
+        not control the transaction itself (BEGIN, commit, VACUUM).
+        """
+        if self._closed:
+            raise RuntimeError("Screenshot database is closed")
+        future = Future()
+        self._writes.put((func, future, batch))
+        return future
+
+    def write(self, func: Callable[[sqlite3.Connection], object]):
+        """Run func(conn) on the writer thread and wait for its result (re-raising its errors).
+
+        Must not be called from inside another write function.
+        """
+        if current_thread() is self._writer:
+            raise RuntimeError("write() called from the writer thread")
+        return self.submit(func).result()
+
+    def execute_write(self, sql: str, params=()) -> sqlite3.Cursor:
+        """Run a single write statement and return its cursor (for rowcount/lastrowid)."""
+        return self.write(lambda conn: conn.execute(sql, params))
+
+    def stats(self) -> dict:
+        """Writer durability settings and how well batched writes are being grouped."""
+        return {
+            'synchronous': self.synchronous,
+            'batch_size': self.batch_size,
+            'batch_ms': self.batch_ms,
+            'commits': self.commits,
+            'batched_writes': self.batched_writes,
+            'largest_batch': self.largest_batch
+        }
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection from the pool."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._reader_lock:
+                if self._reader_count < self.read_pool_size:
+                    self._reader_count += 1
+                    conn = self._connect(read_only=True)
+            if conn is None:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def read(self, sql: str, params=()) -> list:
+        """Run a query on a pooled read-only connection and return all rows."""
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def read_one(self, sql: str, params=()):
+        """Run a query on a pooled read-only connection and return the first row (or None)."""
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def close(self):
+        """Finish queued writes, then close the writer and every pooled reader."""
+        if self._closed:
+            return
+        self._closed = True
+        self._writes.put(_STOP)
+        self._writer.join()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,157 @@
+"""Summary tables behind the screenshot stats, kept up to date by triggers in screenshots.db"""
+import sqlite3
+
+# Each trigger body is a "remove the old row" and/or "add the new row" fragment, so
+# inserts, deletes and updates (heirs taking over a deleted frame, re-encryption
+# changing a blob's key) all keep the summaries exact in the writing transaction.
+# Time bounds only need a lookup when the removed row held one, and the
+# (application, ts) index makes that a single seek.
+
+_APP_ADD = '''
+    INSERT INTO screenshot_app_stats (application, frames, referenced, bytes, first_ts, last_ts)
+    VALUES (NEW.application, 1, NEW.ref_id IS NOT NULL,
+            CASE WHEN NEW.ref_id IS NULL THEN COALESCE(NEW.byte_size, 0) ELSE 0 END,
+            NEW.timestamp, NEW.timestamp)
+    ON CONFLICT (application) DO UPDATE SET
+        frames = frames + 1,
+        referenced = referenced + excluded.referenced,
+        bytes = bytes + excluded.bytes,
+        first_ts = MIN(first_ts, excluded.first_ts),
+        last_ts = MAX(last_ts, excluded.last_ts);
+'''
+
+_APP_REMOVE = '''
+    UPDATE screenshot_app_stats SET
+        frames = frames - 1,
+        referenced = referenced - (OLD.ref_id IS NOT NULL),
+        bytes = bytes - CASE WHEN OLD.ref_id IS NULL THEN COALESCE(OLD.byte_size, 0) ELSE 0 END
+    WHERE application = OLD.application;
+    DELETE FROM screenshot_app_stats WHERE application = OLD.application AND frames <= 0;
+    UPDATE screenshot_app_stats
+    SET first_ts = (SELECT timestamp FROM screenshots WHERE application = OLD.application ORDER BY ts LIMIT 1)
+    WHERE application = OLD.application AND first_ts = OLD.timestamp;
+    UPDATE screenshot_app_stats
+    SET last_ts = (SELECT timestamp FROM screenshots WHERE application = OLD.application ORDER BY ts DESC LIMIT 1)
+    WHERE application = OLD.application AND last_ts = OLD.timestamp;
+'''
+
+# Stored (non-reference) frames per encoding, for comparing capture profiles
+_FORMAT_ADD = '''
+    INSERT INTO screenshot_format_stats (mime_type, frames, bytes, encode_ms, timed_frames)
+    SELECT NEW.mime_type, 1, COALESCE(NEW.byte_size, 0), COALESCE(NEW.encode_ms, 0), NEW.encode_ms IS NOT NULL
+    WHERE NEW.ref_id IS NULL AND NEW.mime_type IS NOT NULL
+    ON CONFLICT (mime_type) DO UPDATE SET
+        frames = frames + 1,
+        bytes = bytes + excluded.bytes,
+        encode_ms = encode_ms + excluded.encode_ms,
+        timed_frames = timed_frames + excluded.timed_frames;
+'''
+
+_FORMAT_REMOVE = '''
+    UPDATE screenshot_format_stats SET
+        frames = frames - 1,
+        bytes = bytes - COALESCE(OLD.byte_size, 0),
+        encode_ms = encode_ms - COALESCE(OLD.encode_ms, 0),
+        timed_frames = timed_frames - (OLD.encode_ms IS NOT NULL)
+    WHERE OLD.ref_id IS NULL AND mime_type = OLD.mime_type;
+    DELETE FROM screenshot_format_stats WHERE mime_type = OLD.mime_type AND frames <= 0;
+'''
+
+# Blob files per encryption key; key 0 stands for Fernet tokens (key IDs start at 1)
+_BLOB_ADD = '''
+    INSERT INTO blob_key_stats (key_id, blobs, bytes) VALUES (COALESCE(NEW.key_id, 0), 1, NEW.size)
+    ON CONFLICT (key_id) DO UPDATE SET blobs = blobs + 1, bytes = bytes + excluded.bytes;
+'''
+
+_BLOB_REMOVE = '''
+    UPDATE blob_key_stats SET blobs = blobs - 1, bytes = bytes - OLD.size WHERE key_id = COALESCE(OLD.key_id, 0);
+    DELETE FROM blob_key_stats WHERE key_id = COALESCE(OLD.key_id, 0) AND blobs <= 0;
+'''
+
+_SCREENSHOT_CHANGED = '''
+    OLD.application IS NOT NEW.application OR OLD.timestamp IS NOT NEW.timestamp
+    OR (OLD.ref_id IS NULL) != (NEW.ref_id IS NULL) OR OLD.byte_size IS NOT NEW.byte_size
+    OR OLD.mime_type IS NOT NEW.mime_type OR OLD.encode_ms IS NOT NEW.encode_ms
+'''
+
+TRIGGERS = {
+    'screenshot_stats_insert': f"AFTER INSERT ON screenshots BEGIN {_APP_ADD} {_FORMAT_ADD} END",
+    'screenshot_stats_delete': f"AFTER DELETE ON screenshots BEGIN {_APP_REMOVE} {_FORMAT_REMOVE} END",
+    'screenshot_stats_update': (
+        "AFTER UPDATE OF application, timestamp, ref_id, byte_size, mime_type, encode_ms ON screenshots "
+        f"WHEN {_SCREENSHOT_CHANGED} BEGIN {_APP_REMOVE} {_FORMAT_REMOVE} {_APP_ADD} {_FORMAT_ADD} END"
+    ),
+    'blob_stats_insert': f"AFTER INSERT ON blobs BEGIN {_BLOB_ADD} END",
+    'blob_stats_delete': f"AFTER DELETE ON blobs BEGIN {_BLOB_REMOVE} END",
+    'blob_stats_update': (
+        "AFTER UPDATE OF size, key_id ON blobs "
+        f"WHEN OLD.size IS NOT NEW.size OR OLD.key_id IS NOT NEW.key_id BEGIN {_BLOB_REMOVE} {_BLOB_ADD} END"
+    ),
+}
+
+def create_schema(conn: sqlite3.Connection):
+    """
+    Create the summary tables and their triggers, filling them from the existing rows
+    the first time (one full scan, inside the schema transaction). Triggers whose
+    definition changed are replaced.
+
+    Needs the screenshots and blobs tables with all their columns and indexes.
+    """
+    existing = {name: sql for name, sql in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    # Superseded by idx_application on (application, ts)
+    conn.execute("DROP INDEX IF EXISTS idx_app_timestamp")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS screenshot_app_stats (
+            application TEXT PRIMARY KEY,
+            frames INTEGER NOT NULL,
+            referenced INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            first_ts TEXT,
+            last_ts TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS screenshot_format_stats (
+            mime_type TEXT PRIMARY KEY,
+            frames INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            encode_ms REAL NOT NULL,
+            timed_frames INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS blob_key_stats (
+            key_id INTEGER PRIMARY KEY,
+            blobs INTEGER NOT NULL,
+            bytes INTEGER NOT NULL
+        )
+    ''')
+    if not {'screenshot_app_stats', 'screenshot_format_stats', 'blob_key_stats'} <= existing.keys():
+        rebuild(conn)
+    for name, body in TRIGGERS.items():
+        sql = f"CREATE TRIGGER {name} {body}"
+        if existing.get(name) != sql:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(sql)
+
+def rebuild(conn: sqlite3.Connection):
+    """Recompute every summary table from the screenshots and blobs tables."""
+    conn.execute("DELETE FROM screenshot_app_stats")
+    conn.execute('''
+        INSERT INTO screenshot_app_stats (application, frames, referenced, bytes, first_ts, last_ts)
+        SELECT application, COUNT(*), COUNT(ref_id),
+               COALESCE(SUM(CASE WHEN ref_id IS NULL THEN byte_size END), 0), MIN(timestamp), MAX(timestamp)
+        FROM screenshots GROUP BY application
+    ''')
+    conn.execute("DELETE FROM screenshot_format_stats")
+    conn.execute('''
+        INSERT INTO screenshot_format_stats (mime_type, frames, bytes, encode_ms, timed_frames)
+        SELECT mime_type, COUNT(*), COALESCE(SUM(byte_size), 0), COALESCE(SUM(encode_ms), 0), COUNT(encode_ms)
+        FROM screenshots WHERE ref_id IS NULL AND mime_type IS NOT NULL GROUP BY mime_type
+    ''')
+    conn.execute("DELETE FROM blob_key_stats")
+    conn.execute('''
+        INSERT INTO blob_key_stats (key_id, blobs, bytes)
+        SELECT COALESCE(key_id, 0), COUNT(*), SUM(size) FROM blobs GROUP BY COALESCE(key_id, 0)
+    ''')
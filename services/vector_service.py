@@ -1,10 +1,15 @@
 import os
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Optional
+import time
+from typing import TYPE_CHECKING, List, Dict, Optional
 import uuid
 from .knowledge_manager import process_game_knowledge
-from sentence_transformers import SentenceTransformer
+from .response_cache import invalidate_game_responses
+from .container import container
+from .metrics import timed, record_server_timing, embedding_seconds, chroma_query_seconds
+
+if TYPE_CHECKING:
+    import chromadb
+
 class VectorService:
     def __init__(self, vector_db_dir: str = "vector_db"):
         """Initialize vector service with Chroma and SentenceTransformer embeddings."""
@@ -25,6 +30,9 @@ class VectorService:
     def _init_chroma_client(self):
         """Initialize Chroma client."""
         try:
+            # Imported here: chromadb is slow to import and only needed once the service is built
+            import chromadb
+            from chromadb.config import Settings
             self.chroma_client = chromadb.PersistentClient(
                 path=self.vector_db_dir,
                 settings=Settings(
@@ -40,6 +48,8 @@ class VectorService:
     def _init_embedding_model(self):
         """Initialize the sentence transformer embedder"""
         try:
+            # Imported here: sentence_transformers pulls in torch, which dominates cold start
+            from sentence_transformers import SentenceTransformer
             # api_key = os.getenv('MISTRAL_API_KEY')
             self.embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
             print("Embedding model initialized successfully")
@@ -47,7 +57,7 @@ class VectorService:
             print(f"Error initializing embedding model: {e}")
             self.embedding_model = None
     
-    def get_or_create_collection(self, game_name: str, content_type: str) -> Optional[chromadb.Collection]:
+    def get_or_create_collection(self, game_name: str, content_type: str) -> Optional['chromadb.Collection']:
         """Get or create a Chroma collection for a specific game and content type."""
         if not self.chroma_client:
             return None
@@ -78,7 +88,8 @@ class VectorService:
             return []
         
         try:
-            embeddings = self.embedding_model.encode(texts)
+            with timed(embedding_seconds):
+                embeddings = self.embedding_model.encode(texts)
             return embeddings.tolist()
         except Exception as e:
             print(f"Error generating embeddings: {e}")
@@ -179,8 +190,11 @@ class VectorService:
             return False
     
     def search_knowledge(self, game_name: str, query: str, content_types: List[str] = None, 
-                        limit: int = 5) -> List[Dict]:
-        """Search knowledge base for relevant information."""
+                        limit: int = 5, query_embedding: List[List[float]] = None) -> List[Dict]:
+        """Search knowledge base for relevant information.
+        
+        A precomputed query_embedding (as returned by generate_embeddings) skips re-encoding the query.
+        """
         if not self.chroma_client or not self.embedding_model:
             return []
         
@@ -189,7 +203,10 @@ class VectorService:
         
         try:
             # Generate query embedding
-            query_embedding = self.generate_embeddings([query])
+            if not query_embedding:
+                start = time.perf_counter()
+                query_embedding = self.generate_embeddings([query])
+                record_server_timing('embedding', (time.perf_counter() - start) * 1000)
             if not query_embedding:
                 return []
             
@@ -206,11 +223,12 @@ class VectorService:
                     self.collections[collection_name] = collection
                 
                 # Search collection
-                results = collection.query(
-                    query_embeddings=query_embedding,
-                    n_results=limit,
-                    include=['documents', 'metadatas', 'distances']
-                )
+                with timed(chroma_query_seconds, 'chroma', collection_name, collection=collection_name):
+                    results = collection.query(
+                        query_embeddings=query_embedding,
+                        n_results=limit,
+                        include=['documents', 'metadatas', 'distances']
+                    )
                 
                 # Process results
                 if results['documents'] and results['documents'][0]:
@@ -291,23 +309,43 @@ class VectorService:
             print(f"Error listing available games: {e}")
             return []
 
-# Global instance
-vector_service = VectorService()
+# Global instance, built on first use (or by the startup warmup)
+container.register('vector_service', VectorService)
+
+def get_vector_service() -> VectorService:
+    """Get the shared VectorService, loading Chroma and the embedding model on first use."""
+    return container.get('vector_service')
+
+def __getattr__(name):
+    # Keeps `from services.vector_service import vector_service` working without an import-time load
+    if name == 'vector_service':
+        return get_vector_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def add_game_knowledge(game_name: str) -> bool:
     """Add all knowledge for a game to the vector database."""
-    return vector_service.add_game_knowledge(game_name)
+    success = get_vector_service().add_game_knowledge(game_name)
+    if success:
+        # Cached answers were grounded on the old knowledge
+        invalidate_game_responses(game_name)
+    return success
 
 def search_knowledge(game_name: str, query: str, content_types: List[str] = None, 
-                    limit: int = 5) -> List[Dict]:
+                    limit: int = 5, query_embedding: List[List[float]] = None) -> List[Dict]:
     """Search knowledge base for relevant information."""
-    return vector_service.search_knowledge(game_name, query, content_types, limit)
+    if query_embedding is not None:
+        return get_vector_service().search_knowledge(game_name, query, content_types, limit, query_embedding)
+    return get_vector_service().search_knowledge(game_name, query, content_types, limit)
+
+def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """Generate embeddings with the shared sentence transformer model."""
+    return get_vector_service().generate_embeddings(texts)
 
 def get_game_stats(game_name: str) -> Dict[str, int]:
     """Get statistics for a game's knowledge base."""
-    return vector_service.get_game_stats(game_name)
+    return get_vector_service().get_game_stats(game_name)
 
 def list_available_games() -> List[str]:
     """List all games with knowledge in the vector database."""
-    return vector_service.list_available_games()
+    return get_vector_service().list_available_games()
 
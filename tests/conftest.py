@@ -267,7 +267,7 @@ def mock_embedding_model():
 @pytest.fixture(autouse=True)
 def patch_fernet_generate_key():
     """Ensure Fernet.generate_key returns bytes in tests that don't patch it explicitly."""
-    with patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+    with patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
         yield
 
 
@@ -316,10 +316,13 @@ def mock_psutil_processes(mock_process_list):
 @pytest.fixture
 def mock_win32gui():
     """Mock win32gui functions for testing."""
-    with patch('win32gui.GetForegroundWindow', return_value=12345), \
-         patch('win32gui.GetWindowText', return_value='Test Window'), \
-         patch('win32process.GetWindowThreadProcessId', return_value=(123, 12345)):
-        yield
+    with patch('services.capture_backends.win32gui') as win32gui, \
+         patch('services.capture_backends.win32process') as win32process:
+        win32gui.GetForegroundWindow.return_value = 12345
+        win32gui.GetWindowText.return_value = 'Test Window'
+        win32gui.GetWindowRect.return_value = (0, 0, 800, 600)
+        win32process.GetWindowThreadProcessId.return_value = (123, 12345)
+        yield win32gui
 
 
 @pytest.fixture
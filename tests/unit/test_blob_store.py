@@ -0,0 +1,302 @@
+"""
+Test suite for the screenshot blob store.
+
+This module tests content-addressed blob files, refcounting through
+the screenshots database and migration of inline payloads.
+"""
+
+import pytest
+import os
+import sys
+import sqlite3
+from cryptography.fernet import Fernet
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.blob_store import BlobStore, migrate_database, default_blob_dir
+except ImportError as e:
+    pytest.skip(f"Blob store module not available: {e}", allow_module_level=True)
+
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE screenshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        application TEXT NOT NULL,
+        window_title TEXT,
+        encrypted_data BLOB NOT NULL,
+        file_hash TEXT NOT NULL
+    )
+'''
+
+
+@pytest.fixture
+def store_db(temp_dir):
+    """A blob store and a database with its schema."""
+    conn = sqlite3.connect(os.path.join(temp_dir, 'blobs.db'))
+    conn.execute(LEGACY_SCHEMA)
+    BlobStore.create_schema(conn)
+    yield BlobStore(os.path.join(temp_dir, 'blobs')), conn
+    conn.close()
+
+
+def _file(conn, blob_hash):
+    return conn.execute('SELECT file FROM blobs WHERE hash = ?', (blob_hash,)).fetchone()[0]
+
+
+def _age(store, seconds=60):
+    """Date every blob file back, as if written before the sweep started."""
+    past = os.path.getmtime(store.root) - seconds
+    for directory, _, names in os.walk(store.root):
+        for name in names:
+            os.utime(os.path.join(directory, name), (past, past))
+
+
+class TestBlobStore:
+    """Test cases for BlobStore files and refcounts."""
+
+    @pytest.mark.unit
+    def test_blobs_are_sharded_by_hash(self, store_db):
+        """Test the two-level directory layout and round trip."""
+        store, _ = store_db
+        blob_hash = store.hash_of(b'frame')
+        store.write(blob_hash, b'ciphertext')
+
+        assert store.path(blob_hash).endswith(os.path.join(blob_hash[:2], blob_hash[2:4], blob_hash))
+        assert store.read(blob_hash) == b'ciphertext'
+        assert store.read('0' * 64) is None
+
+    @pytest.mark.unit
+    def test_identical_payloads_share_one_blob(self, store_db):
+        """Test that a second reference only bumps the refcount."""
+        store, conn = store_db
+        blob_hash = store.hash_of(b'frame')
+        store.add_ref(conn, blob_hash, b'first')
+        store.add_ref(conn, blob_hash, b'second')
+
+        assert conn.execute('SELECT refcount FROM blobs WHERE hash = ?', (blob_hash,)).fetchone()[0] == 2
+        assert store.read(blob_hash, _file(conn, blob_hash)) == b'first'
+
+    @pytest.mark.unit
+    def test_last_release_removes_file(self, store_db):
+        """Test that the file outlives all but the last reference."""
+        store, conn = store_db
+        blob_hash = store.hash_of(b'frame')
+        store.add_ref(conn, blob_hash, b'ciphertext')
+        store.add_ref(conn, blob_hash, b'ciphertext')
+        file = _file(conn, blob_hash)
+
+        assert store.release(conn, blob_hash) is False
+        assert store.exists(blob_hash, file)
+        assert store.release(conn, blob_hash) is True
+        assert not store.exists(blob_hash, file)
+        assert conn.execute('SELECT COUNT(*) FROM blobs').fetchone()[0] == 0
+
+    @pytest.mark.unit
+    def test_versions_get_their_own_files(self, store_db):
+        """Test that a blob recreated after release gets a new file name."""
+        store, conn = store_db
+        blob_hash = store.hash_of(b'frame')
+        store.add_ref(conn, blob_hash, b'first')
+        first = _file(conn, blob_hash)
+        store.release(conn, blob_hash)
+        store.add_ref(conn, blob_hash, b'second')
+
+        assert first.startswith(blob_hash + '.') and _file(conn, blob_hash) != first
+        assert store.read(blob_hash, _file(conn, blob_hash)) == b'second'
+
+    @pytest.mark.unit
+    def test_sweep_removes_unreferenced_files(self, store_db):
+        """Test that old files without a blob row, and partial writes, are swept; referenced and new ones stay."""
+        store, conn = store_db
+        kept, orphan, fresh = store.hash_of(b'kept'), store.hash_of(b'orphan'), store.hash_of(b'fresh')
+        store.add_ref(conn, kept, b'kept')
+        store.write(kept, b'legacy')
+        orphan_file = store.stage(orphan, b'orphan')
+        partial = os.path.join(os.path.dirname(store.path(kept)), 'tmp1234.tmp')
+        open(partial, 'wb').close()
+        _age(store)
+        fresh_file = store.stage(fresh, b'fresh')
+
+        assert store.sweep(lambda sql, params: conn.execute(sql, params).fetchall()) == 3
+        assert store.read(kept, _file(conn, kept)) == b'kept'
+        assert not store.exists(kept)
+        assert not store.exists(orphan, orphan_file)
+        assert not os.path.exists(partial)
+        assert store.exists(fresh, fresh_file)
+        assert store.dirty is False
+
+    @pytest.mark.unit
+    def test_session_marker(self, temp_dir):
+        """Test that a store not closed cleanly asks for a sweep on the next open."""
+        store = BlobStore(os.path.join(temp_dir, 'blobs'))
+        assert store.open_session() is False
+        store.close_session()
+        assert BlobStore(store.root).open_session() is False
+
+        assert BlobStore(store.root).open_session() is True
+
+    @pytest.mark.unit
+    def test_default_blob_dir_next_to_database(self, temp_dir):
+        """Test the default blob directory."""
+        assert default_blob_dir(os.path.join(temp_dir, 'screenshots.db')) == os.path.join(temp_dir, 'screenshots.blobs')
+
+
+class TestTransactionalFiles:
+    """Test cases for blob files following the outcome of the capture's writer transactions."""
+
+    @pytest.fixture
+    def capture(self, temp_dir, monkeypatch):
+        try:
+            from services.screenshot import ScreenshotCapture
+        except ImportError as e:
+            pytest.skip(f"Screenshot module not available: {e}")
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=os.path.join(temp_dir, 'screenshots.db'), capture_workers=0,
+                                    dedup_threshold=-1)
+        yield capture
+        capture.close()
+
+    @staticmethod
+    def _files(capture):
+        # Blob files live in the shard directories; the root holds only the in-use marker
+        return sorted(name for directory, _, names in os.walk(capture.blobs.root)
+                      if directory != capture.blobs.root for name in names)
+
+    @pytest.mark.unit
+    def test_rolled_back_delete_keeps_the_file(self, capture):
+        """Test that a delete rolled back after releasing the last reference leaves the file in place."""
+        capture.save_screenshot(b'frame-a', {'application': 'game.exe', 'window_title': 'Game'})
+        files = self._files(capture)
+
+        def delete_then_fail(conn):
+            capture._delete_row(conn, 1)
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            capture.db.write(delete_then_fail)
+        assert self._files(capture) == files
+        capture._frame_cache.clear()
+        assert capture.get_screenshot_data(1) == b'frame-a'
+
+        capture.delete_screenshot(1)
+        assert self._files(capture) == []
+
+    @pytest.mark.unit
+    def test_rolled_back_insert_leaves_no_file(self, capture):
+        """Test that a batched insert rolled back to its savepoint removes the file it wrote."""
+        insert = capture._frame_insert({'application': 'game.exe', 'window_title': 'Game'},
+                                       '2024-01-01T10:00:00', None, img_data=b'frame-a',
+                                       encrypted_data=capture._encrypt_data(b'frame-a'))
+
+        def insert_then_fail(conn):
+            insert(conn, None)
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            capture.db.submit(insert_then_fail, batch=True).result(timeout=5)
+        assert self._files(capture) == []
+        assert capture.db.read_one("SELECT COUNT(*) FROM blobs")[0] == 0
+
+    @pytest.mark.unit
+    def test_unclean_exit_is_swept_on_start(self, capture, temp_dir):
+        """Test that files a crash left without a row are removed in the background on the next start."""
+        from services.blob_store import IN_USE_MARKER
+        from services.screenshot import ScreenshotCapture
+        capture.blobs.stage(capture.blobs.hash_of(b'lost'), b'lost')
+        _age(capture.blobs)
+        capture.close()
+        db_path = os.path.join(temp_dir, 'screenshots.db')
+
+        clean = ScreenshotCapture(db_path=db_path, capture_workers=0)
+        assert clean._sweeper is None
+        clean.close()
+        assert len(self._files(capture)) == 1
+
+        # A crash leaves the in-use marker behind
+        open(os.path.join(capture.blobs.root, IN_USE_MARKER), 'a').close()
+        reopened = ScreenshotCapture(db_path=db_path, capture_workers=0)
+        reopened._sweeper.join(5)
+        reopened.close()
+        assert self._files(capture) == []
+        assert not os.path.exists(os.path.join(capture.blobs.root, IN_USE_MARKER))
+
+
+class TestMigration:
+    """Test cases for moving inline payloads into the blob store."""
+
+    @pytest.fixture
+    def legacy_db(self, temp_dir):
+        """A pre-blob-store screenshots.db with three inline frames, two identical."""
+        key = Fernet.generate_key()
+        key_path = os.path.join(temp_dir, 'screenshot_key.key')
+        with open(key_path, 'wb') as f:
+            f.write(key)
+        cipher = Fernet(key)
+        db_path = os.path.join(temp_dir, 'screenshots.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute(LEGACY_SCHEMA)
+        for i, payload in enumerate([b'frame-a', b'frame-a', b'frame-b']):
+            conn.execute('''
+                INSERT INTO screenshots (timestamp, application, window_title, encrypted_data, file_hash)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (f'2024-01-01T10:0{i}:00', 'game.exe', 'Game', cipher.encrypt(payload), 'hash'))
+        conn.commit()
+        conn.close()
+        return db_path, key_path, cipher
+
+    @pytest.mark.unit
+    def test_migrate_moves_payloads(self, legacy_db):
+        """Test that payloads leave the table and identical frames share a blob."""
+        db_path, key_path, cipher = legacy_db
+
+        stats = migrate_database(db_path, key_path, batch_size=2)
+
+        assert stats['rows'] == 3
+        assert stats['blobs'] == 2
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute('SELECT length(encrypted_data), blob_hash FROM screenshots ORDER BY id').fetchall()
+        refcounts = dict(conn.execute('SELECT hash, refcount FROM blobs').fetchall())
+        file = _file(conn, rows[2][1])
+        conn.close()
+        assert [row[0] for row in rows] == [0, 0, 0]
+        assert rows[0][1] == rows[1][1] != rows[2][1]
+        assert refcounts[rows[0][1]] == 2
+        store = BlobStore(default_blob_dir(db_path))
+        assert cipher.decrypt(store.read(rows[2][1], file)) == b'frame-b'
+
+    @pytest.mark.unit
+    def test_migrate_is_rerunnable(self, legacy_db):
+        """Test that a second run finds nothing left to move."""
+        db_path, key_path, _ = legacy_db
+        migrate_database(db_path, key_path, vacuum=False)
+
+        assert migrate_database(db_path, key_path)['rows'] == 0
+
+    @pytest.mark.unit
+    def test_capture_reads_migrated_database(self, legacy_db, monkeypatch):
+        """Test that ScreenshotCapture serves migrated frames and frees blobs on delete."""
+        try:
+            from services.screenshot import ScreenshotCapture
+        except ImportError as e:
+            pytest.skip(f"Screenshot module not available: {e}")
+        db_path, key_path, _ = legacy_db
+        migrate_database(db_path, key_path)
+        monkeypatch.chdir(os.path.dirname(key_path))
+
+        capture = ScreenshotCapture(db_path=db_path, capture_workers=0)
+        try:
+            assert capture.get_screenshot_data(1) == b'frame-a'
+            blob_hash, file = capture.db.read_one(
+                'SELECT s.blob_hash, b.file FROM screenshots s JOIN blobs b ON b.hash = s.blob_hash WHERE s.id = 1')
+            capture.delete_screenshot(1)
+            assert capture.blobs.exists(blob_hash, file)
+            capture.delete_screenshot(2)
+            assert not capture.blobs.exists(blob_hash, file)
+            assert capture.get_stats()['blob_store']['blobs'] == 1
+        finally:
+            capture.close()
@@ -0,0 +1,176 @@
+"""
+Test suite for the background capture resource governor.
+
+This module tests the rolling CPU budget, deferring frames while a game
+is in the foreground, thinning a full backlog, catching up afterwards
+and lowering encoder worker priority.
+"""
+
+import pytest
+import os
+import sys
+import sqlite3
+from unittest.mock import patch
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.capture_governor import ResourceGovernor, lower_priority
+    from services.capture_backends import SyntheticGrabBackend, SyntheticWindowProvider
+    from services.screenshot import ScreenshotCapture
+except ImportError as e:
+    pytest.skip(f"Capture governor module not available: {e}", allow_module_level=True)
+
+GAME = {'application': 'eldenring.exe', 'window_title': 'ELDEN RING', 'pid': 4242}
+DESKTOP = {'application': 'explorer.exe', 'window_title': 'Desktop', 'pid': 100}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def make_capture(temp_dir, temp_db_path, monkeypatch):
+    """Build captures fed by distinct synthetic frames and scripted windows."""
+    monkeypatch.chdir(temp_dir)
+    captures = []
+
+    def make(windows, switch_every, governor):
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, governor=governor,
+                                    grabber=SyntheticGrabBackend((320, 180)),
+                                    window_provider=SyntheticWindowProvider(windows, switch_every=switch_every),
+                                    pipeline_options={'drop_policy': 'block'})
+        captures.append(capture)
+        return capture
+
+    yield make
+    for capture in captures:
+        capture.close()
+
+
+def _stored(temp_db_path):
+    conn = sqlite3.connect(temp_db_path)
+    rows = conn.execute("SELECT application, timestamp FROM screenshots ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+class TestResourceGovernor:
+    """Test cases for the budget and the backlog."""
+
+    @pytest.mark.unit
+    def test_budget_is_a_rolling_window(self):
+        """Test that charges count against the budget until they age out of the window."""
+        clock = FakeClock()
+        governor = ResourceGovernor(cpu_budget=6, defer_in_game=False, clock=clock)
+        governor.charge('encode', 4)
+        clock.now += 30
+        governor.charge('dedupe', 1.5)
+        assert governor.defer_reason(None) is None
+
+        governor.charge('encode', 0.5)
+        assert governor.defer_reason(None) == 'budget'
+
+        clock.now += 31
+        assert governor.cpu_used() == pytest.approx(2.0)
+        assert governor.defer_reason(None) is None
+        assert governor.stats()['cpu_seconds_by_stage'] == {'encode': 4.5, 'dedupe': 1.5}
+
+    @pytest.mark.unit
+    def test_games_defer_only_when_enabled(self):
+        assert ResourceGovernor(cpu_budget=0, defer_in_game=True).defer_reason('elden_ring') == 'game'
+        assert ResourceGovernor(cpu_budget=0, defer_in_game=True).defer_reason(None) is None
+        # Off by default: held frames are raw images, and nothing would be saved in-game
+        assert ResourceGovernor(cpu_budget=0).defer_reason('elden_ring') is None
+
+    @pytest.mark.unit
+    def test_full_backlog_keeps_every_other_frame(self):
+        """Test that thinning keeps frames spread over the whole deferral, oldest first."""
+        governor = ResourceGovernor(backlog_size=4)
+        for n in range(6):
+            governor.defer({'n': n})
+
+        held = []
+        while (frame := governor.next_deferred()) is not None:
+            held.append(frame['n'])
+        assert held == [0, 2, 4, 5]
+        assert governor.stats()['deferred'] == 6
+        assert governor.stats()['dropped'] == 2
+        assert governor.stats()['caught_up'] == 4
+
+    @pytest.mark.unit
+    def test_lower_priority(self):
+        """Test that encoder workers are niced, and that failing to do so isn't fatal."""
+        with patch('services.capture_governor.os.nice') as nice, \
+                patch('services.capture_governor.os.name', 'posix'):
+            lower_priority(10)
+            lower_priority(0)
+        nice.assert_called_once_with(10)
+
+        with patch('services.capture_governor.os.nice', side_effect=PermissionError("nope")), \
+                patch('services.capture_governor.os.name', 'posix'):
+            lower_priority(10)
+
+
+class TestGovernedCapture:
+    """Test cases for the governor gating the capture pipeline."""
+
+    @pytest.mark.unit
+    def test_frames_wait_out_the_game_and_catch_up_in_order(self, make_capture, temp_db_path):
+        """Test that in-game frames are held, then stored with their capture times once the game exits."""
+        capture = make_capture([GAME, DESKTOP], 3, ResourceGovernor(cpu_budget=0, defer_in_game=True))
+        capture.pipeline.start()
+        for _ in range(3):
+            capture.capture_and_save()
+
+        assert _stored(temp_db_path) == []
+        assert capture.get_stats()['governor']['backlog'] == 3
+        assert capture.get_stats()['governor']['deferring'] == 'game'
+
+        capture.capture_and_save()
+        capture.pipeline.stop()
+
+        rows = _stored(temp_db_path)
+        assert [application for application, _ in rows] == ['eldenring.exe'] * 3 + ['explorer.exe']
+        assert [timestamp for _, timestamp in rows] == sorted(timestamp for _, timestamp in rows)
+        stats = capture.get_stats()['governor']
+        assert (stats['deferred'], stats['caught_up'], stats['backlog']) == (3, 3, 0)
+        assert stats['cpu_seconds_by_stage']['grab'] >= 0
+        assert set(capture.get_stats()['pipeline']['stages']['encode']) >= {'busy_seconds', 'cpu_seconds'}
+
+    @pytest.mark.unit
+    def test_spent_budget_defers_until_it_frees_up(self, make_capture, temp_db_path):
+        """Test that frames wait while the budget is spent and go through once charges age out."""
+        clock = FakeClock()
+        capture = make_capture([DESKTOP], 1, ResourceGovernor(cpu_budget=1, defer_in_game=False, clock=clock))
+        capture.pipeline.start()
+        capture.governor.charge('encode', 5)
+        capture.capture_and_save()
+        capture.capture_and_save()
+        assert capture.governor.backlog() == 2
+        assert capture.governor.last_reason == 'budget'
+
+        clock.now += 120
+        capture.capture_and_save()
+        capture.pipeline.stop()
+
+        assert len(_stored(temp_db_path)) == 3
+        assert capture.governor.backlog() == 0
+
+    @pytest.mark.unit
+    def test_stop_stores_held_frames(self, make_capture, temp_db_path):
+        """Test that stopping capture mid-game still stores the frames it held."""
+        capture = make_capture([GAME], 1, ResourceGovernor(cpu_budget=0, defer_in_game=True))
+        capture.pipeline.start()
+        for _ in range(2):
+            capture.capture_and_save()
+        capture.pipeline.stop()
+
+        assert len(_stored(temp_db_path)) == 2
@@ -0,0 +1,310 @@
+"""
+Test suite for the staged capture pipeline and capture backends.
+
+This module tests the synthetic grab and window providers, capture
+regions, queue drop policies, and frames flowing through dedupe, encode,
+encrypt and persist.
+"""
+
+import pytest
+import os
+import sys
+import time
+import sqlite3
+import threading
+from unittest.mock import patch
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.capture_backends import (SyntheticGrabBackend, SyntheticWindowProvider, make_grab_backend,
+                                           make_window_provider, capture_bbox)
+    from services.capture_pipeline import PipelineStage
+    from services.capture_governor import ResourceGovernor
+    from services.imaging import dhash, hamming_distance
+    from services.screenshot import ScreenshotCapture
+except ImportError as e:
+    pytest.skip(f"Capture pipeline module not available: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def make_capture(temp_dir, temp_db_path, monkeypatch):
+    """Build captures fed by synthetic frames, closing them afterwards (the governor never defers)."""
+    monkeypatch.chdir(temp_dir)
+    captures = []
+
+    def make(repeat=1, **kwargs):
+        kwargs.setdefault('governor', ResourceGovernor(cpu_budget=0, defer_in_game=False))
+        kwargs.setdefault('window_provider', SyntheticWindowProvider())
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0,
+                                    grabber=SyntheticGrabBackend((320, 180), repeat=repeat), **kwargs)
+        captures.append(capture)
+        return capture
+
+    yield make
+    for capture in captures:
+        capture.close()
+
+
+def _rows(temp_db_path):
+    conn = sqlite3.connect(temp_db_path)
+    rows = conn.execute("SELECT id, ref_id, blob_hash IS NOT NULL FROM screenshots ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+class TestCaptureBackends:
+    """Test cases for the synthetic providers and backend selection."""
+
+    @pytest.mark.unit
+    def test_synthetic_frames_change_between_scenes(self):
+        """Test that scenes differ perceptually and repeats are identical."""
+        grabber = SyntheticGrabBackend((320, 180), repeat=2)
+        frames = [grabber.grab() for _ in range(4)]
+
+        assert frames[0].size == (320, 180)
+        assert frames[0].tobytes() == frames[1].tobytes()
+        assert hamming_distance(dhash(frames[1]), dhash(frames[2])) > 4
+
+    @pytest.mark.unit
+    def test_synthetic_windows_switch(self):
+        """Test the scripted window sequence."""
+        provider = SyntheticWindowProvider([{'application': 'a.exe', 'window_title': 'A', 'pid': 1},
+                                            {'application': 'b.exe', 'window_title': 'B', 'pid': 2}],
+                                           switch_every=2)
+
+        assert [provider.window_info()['application'] for _ in range(5)] == ['a.exe', 'a.exe', 'b.exe', 'b.exe', 'a.exe']
+
+    @pytest.mark.unit
+    def test_unknown_backend_names(self):
+        """Test that a misconfigured backend fails loudly."""
+        assert isinstance(make_grab_backend('synthetic'), SyntheticGrabBackend)
+        assert isinstance(make_window_provider('synthetic'), SyntheticWindowProvider)
+        with pytest.raises(ValueError):
+            make_grab_backend('dxgi')
+        with pytest.raises(ValueError):
+            make_window_provider('x11')
+
+
+# Two side-by-side 640x360 monitors, and a game window on the right one
+MONITORS = [(0, 0, 640, 360), (640, 0, 1280, 360)]
+GAME_WINDOW = {'application': 'eldenring.exe', 'window_title': 'ELDEN RING', 'pid': 4242, 'bbox': (700, 20, 1000, 300)}
+
+
+class TestCaptureRegions:
+    """Test cases for grabbing the foreground window or one monitor instead of the desktop."""
+
+    @pytest.mark.unit
+    def test_capture_bbox(self):
+        """Test the area each region covers, clipping and fallbacks."""
+        assert capture_bbox('desktop', GAME_WINDOW, MONITORS) is None
+        assert capture_bbox('window', GAME_WINDOW, MONITORS) == (700, 20, 1000, 300)
+        assert capture_bbox('monitor', GAME_WINDOW, MONITORS, 1) == (640, 0, 1280, 360)
+        assert capture_bbox('monitor', GAME_WINDOW, MONITORS, -1) == (640, 0, 1280, 360)
+        # A maximized window's borders hang off its monitor; a window across both covers the visible parts
+        assert capture_bbox('window', {'bbox': (632, -8, 1288, 368)}, MONITORS) == (632, 0, 1280, 360)
+        # Minimized, unknown or missing: the primary monitor
+        assert capture_bbox('window', {'bbox': (-32000, -32000, -31840, -31972)}, MONITORS) == (0, 0, 640, 360)
+        assert capture_bbox('window', {'application': 'Unknown'}, MONITORS) == (0, 0, 640, 360)
+        assert capture_bbox('monitor', GAME_WINDOW, MONITORS, 5) == (0, 0, 640, 360)
+        assert capture_bbox('window', GAME_WINDOW, []) == (700, 20, 1000, 300)
+        with pytest.raises(ValueError):
+            capture_bbox('screen', GAME_WINDOW, MONITORS)
+
+    @pytest.mark.unit
+    def test_window_region_shrinks_stored_frames(self, make_capture, temp_db_path):
+        """Test that grabbing the game window captures, encodes and stores a proportionally smaller frame."""
+        provider = SyntheticWindowProvider([GAME_WINDOW], monitors=MONITORS)
+        sizes = {}
+        for region in ('desktop', 'window', 'monitor'):
+            capture = make_capture(window_provider=provider, capture_region=region, capture_monitor=-1,
+                                   dedup_threshold=-1)
+            capture.grabber = SyntheticGrabBackend((1280, 360))
+            before = capture.get_stats()['blob_store']['bytes']
+            capture.capture_and_save()
+            sizes[region] = (capture.get_stats()['capture']['last_frame_size'],
+                             capture.get_stats()['blob_store']['bytes'] - before)
+            capture.close()
+
+        assert [size for size, _ in sizes.values()] == [(1280, 360), (300, 280), (640, 360)]
+        assert sizes['window'][1] < sizes['monitor'][1] < sizes['desktop'][1]
+
+    @pytest.mark.unit
+    def test_pipeline_grabs_the_region(self, make_capture, temp_db_path):
+        """Test that background capture grabs the same region."""
+        capture = make_capture(window_provider=SyntheticWindowProvider([GAME_WINDOW], monitors=MONITORS),
+                               capture_region='window', pipeline_options={'drop_policy': 'block'})
+        capture.grabber = SyntheticGrabBackend((1280, 360))
+        capture.pipeline.start()
+        capture.capture_and_save()
+        capture.pipeline.stop()
+
+        assert capture.get_stats()['capture']['last_frame_size'] == (300, 280)
+        assert len(_rows(temp_db_path)) == 1
+
+    @pytest.mark.unit
+    def test_unknown_region(self, make_capture):
+        with pytest.raises(ValueError):
+            make_capture(capture_region='screen')
+
+
+class TestPipelineStage:
+    """Test cases for bounded queues and drop policies."""
+
+    @pytest.mark.unit
+    def test_drop_oldest_keeps_freshest_frames(self):
+        """Test that a full queue discards its stalest frame."""
+        dropped = []
+        stage = PipelineStage('test', lambda frame: frame, queue_size=2, drop_policy='drop_oldest',
+                              on_drop=dropped.append)
+        results = [stage.offer({'n': n}) for n in range(4)]
+
+        assert results == [True, True, False, False]
+        assert [frame['n'] for frame in dropped] == [0, 1]
+        assert [stage.inbox.get_nowait()['n'] for _ in range(2)] == [2, 3]
+        assert stage.stats()['dropped'] == 2
+
+    @pytest.mark.unit
+    def test_drop_newest_keeps_queued_frames(self):
+        """Test that a full queue rejects the incoming frame."""
+        stage = PipelineStage('test', lambda frame: frame, queue_size=2, drop_policy='drop_newest')
+        for n in range(4):
+            stage.offer({'n': n})
+
+        assert [stage.inbox.get_nowait()['n'] for _ in range(2)] == [0, 1]
+
+    @pytest.mark.unit
+    def test_stages_process_in_order_and_survive_errors(self):
+        """Test that frames flow through chained stages and a failing frame doesn't stop them."""
+        seen = []
+
+        def check(frame):
+            if frame['n'] == 1:
+                raise ValueError("bad frame")
+            return frame
+
+        first = PipelineStage('first', check, queue_size=1)
+        second = PipelineStage('second', lambda frame: seen.append(frame['n']))
+        first.next_stage = second
+        first.start()
+        second.start()
+        for n in range(4):
+            first.offer({'n': n})
+        first.stop()
+
+        assert seen == [0, 2, 3]
+        assert first.stats()['errors'] == 1
+        assert second.stats()['filtered'] == 3
+
+    @pytest.mark.unit
+    def test_unknown_drop_policy(self):
+        with pytest.raises(ValueError):
+            PipelineStage('test', lambda frame: frame, drop_policy='random')
+
+
+class TestCapturePipeline:
+    """Test cases for frames flowing through ScreenshotCapture's pipeline."""
+
+    @pytest.mark.unit
+    def test_frames_are_stored_in_order(self, make_capture, temp_db_path):
+        """Test that each grabbed frame is persisted, with duplicates referencing in-flight originals."""
+        capture = make_capture(repeat=2, pipeline_options={'drop_policy': 'block'})
+        capture.pipeline.start()
+        for _ in range(6):
+            capture.capture_and_save()
+        capture.pipeline.stop()
+
+        rows = _rows(temp_db_path)
+        assert [ref_id for _, ref_id, _ in rows] == [None, 1, None, 3, None, 5]
+        assert all(has_blob for _, ref_id, has_blob in rows if ref_id is None)
+        assert capture.get_screenshot_data(2) == capture.get_screenshot_data(1)
+
+    @pytest.mark.unit
+    def test_burst_is_group_committed(self, make_capture, temp_db_path):
+        """Test that frames queued behind a busy writer share commits, references to originals included."""
+        capture = make_capture(repeat=2, pipeline_options={'drop_policy': 'block', 'queue_size': 8})
+        release = threading.Event()
+        capture.db.submit(lambda conn: release.wait(5))
+        capture.pipeline.start()
+        for _ in range(6):
+            capture.capture_and_save()
+        deadline = time.monotonic() + 5
+        while capture.get_stats()['pipeline']['stages']['persist']['processed'] < 6 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        capture.pipeline.stop()
+
+        rows = _rows(temp_db_path)
+        assert [ref_id for _, ref_id, _ in rows] == [None, 1, None, 3, None, 5]
+        assert capture.get_stats()['database']['largest_batch'] == 6
+        assert capture.get_stats()['deduplication']['referenced'] == 3
+
+    @pytest.mark.unit
+    def test_skip_mode_stores_unique_frames(self, make_capture, temp_db_path):
+        """Test that skipped duplicates stop at the dedupe stage."""
+        capture = make_capture(repeat=3, dedup_mode='skip', pipeline_options={'drop_policy': 'block'})
+        capture.pipeline.start()
+        for _ in range(6):
+            capture.capture_and_save()
+        capture.pipeline.stop()
+
+        stages = capture.get_stats()['pipeline']['stages']
+        assert len(_rows(temp_db_path)) == 2
+        assert stages['dedupe']['filtered'] == 4
+        assert stages['persist']['processed'] == 2
+        assert capture.duplicates_skipped == 4
+
+    @pytest.mark.unit
+    def test_stats_report_each_stage(self, make_capture):
+        """Test per-stage throughput stats."""
+        capture = make_capture(pipeline_options={'drop_policy': 'block'})
+        capture.pipeline.start()
+        for _ in range(3):
+            capture.capture_and_save()
+        capture.pipeline.stop()
+
+        stats = capture.get_stats()['pipeline']
+        assert list(stats['stages']) == ['grab', 'dedupe', 'encode', 'encrypt', 'persist']
+        for stage in stats['stages'].values():
+            assert stage['processed'] == 3
+            assert stage['frames_per_second'] > 0
+        assert stats['running'] is False
+
+    @pytest.mark.unit
+    def test_slow_persist_drops_oldest_grabs(self, make_capture, temp_db_path):
+        """Test back-pressure: a stalled database fills the queues and the grab queue drops stale frames."""
+        capture = make_capture(pipeline_options={'queue_size': 1})
+        original_submit = capture.db.submit
+
+        def slow_submit(func, batch=False):
+            time.sleep(0.05)
+            return original_submit(func, batch)
+
+        with patch.object(capture.db, 'submit', side_effect=slow_submit):
+            capture.pipeline.start()
+            for _ in range(20):
+                capture.capture_and_save()
+            capture.pipeline.stop()
+
+        stages = capture.get_stats()['pipeline']['stages']
+        assert stages['dedupe']['dropped'] > 0
+        assert stages['persist']['processed'] == len(_rows(temp_db_path)) == 20 - stages['dedupe']['dropped']
+
+    @pytest.mark.unit
+    def test_background_capture_uses_pipeline(self, make_capture, temp_db_path):
+        """Test that start/stop_capture run frames through the pipeline and drain it on stop."""
+        capture = make_capture()
+        capture.interval = 0.02
+        capture.schedule.min_interval = capture.schedule.max_interval = 0.02
+
+        capture.start_capture()
+        time.sleep(0.3)
+        capture.stop_capture()
+
+        stored = len(_rows(temp_db_path))
+        assert stored > 0
+        assert capture.get_stats()['pipeline']['stages']['persist']['processed'] == stored
+        assert capture.pipeline.running is False
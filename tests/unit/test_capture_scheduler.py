@@ -0,0 +1,91 @@
+"""
+Test suite for the adaptive capture schedule.
+
+This module tests how the capture interval reacts to window and game
+switches, static frames and frames outside a game.
+"""
+
+import pytest
+import os
+import sys
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.capture_scheduler import AdaptiveSchedule
+except ImportError as e:
+    pytest.skip(f"Capture scheduler module not available: {e}", allow_module_level=True)
+
+
+GAME = ('eldenring.exe', 10)
+BROWSER = ('chrome.exe', 20)
+
+
+@pytest.fixture
+def schedule():
+    return AdaptiveSchedule(interval=30, min_interval=5, max_interval=120, boost_frames=2,
+                            static_backoff=2, idle_factor=4)
+
+
+class TestAdaptiveSchedule:
+    """Test cases for AdaptiveSchedule."""
+
+    @pytest.mark.unit
+    def test_steady_game_uses_base_interval(self, schedule):
+        """Test that changing frames in the same game keep the configured interval."""
+        assert [schedule.observe(GAME, 'elden_ring', False) for _ in range(3)] == [30, 30, 30]
+        assert schedule.last_reason == 'base'
+
+    @pytest.mark.unit
+    def test_switch_boosts_then_returns(self, schedule):
+        """Test fast captures after a window or game switch."""
+        schedule.observe(GAME, 'elden_ring', False)
+
+        delays = [schedule.observe(('darksouls3.exe', 11), 'dark_souls_3', False) for _ in range(3)]
+
+        assert delays == [5, 5, 30]
+
+    @pytest.mark.unit
+    def test_first_observation_is_not_a_switch(self, schedule):
+        """Test that starting capture doesn't count as a window change."""
+        assert schedule.observe(GAME, 'elden_ring', False) == 30
+
+    @pytest.mark.unit
+    def test_static_frames_back_off_up_to_max(self, schedule):
+        """Test exponential backoff on near-duplicates, reset by a changing frame."""
+        schedule.observe(GAME, 'elden_ring', False)
+
+        delays = [schedule.observe(GAME, 'elden_ring', True) for _ in range(4)]
+
+        assert delays == [60, 120, 120, 120]
+        assert schedule.last_reason == 'static'
+        assert schedule.observe(GAME, 'elden_ring', False) == 30
+
+    @pytest.mark.unit
+    def test_no_game_slows_down(self, schedule):
+        """Test the idle factor outside known games."""
+        schedule.observe(BROWSER, None, False)
+
+        assert schedule.observe(BROWSER, None, False) == 120
+        assert schedule.last_reason == 'idle'
+
+    @pytest.mark.unit
+    def test_long_static_streak_stays_bounded(self, schedule):
+        """Test that a very long streak neither overflows nor exceeds max_interval."""
+        for _ in range(5000):
+            delay = schedule.observe(GAME, 'elden_ring', True)
+
+        assert delay == 120
+
+    @pytest.mark.unit
+    def test_bounds_follow_interval(self):
+        """Test that an interval outside the bounds is still honoured."""
+        schedule = AdaptiveSchedule(interval=1, min_interval=5, max_interval=120, boost_frames=1,
+                                    static_backoff=1, idle_factor=1)
+        schedule.observe(GAME, 'elden_ring', False)
+
+        assert schedule.observe(BROWSER, None, False) == 1
+        assert schedule.observe(BROWSER, None, False) == 1
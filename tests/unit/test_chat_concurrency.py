@@ -0,0 +1,201 @@
+"""
+Load and concurrency tests for the chat service.
+
+These tests check that blocking work in chat_with_gemini runs off the
+event loop, so N concurrent chats finish in roughly the time of one, that
+independent context stages overlap, and that stage timeouts degrade
+gracefully instead of hanging the request.
+"""
+
+import pytest
+import os
+import sys
+import time
+import asyncio
+from unittest.mock import Mock, patch
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.chatbot import chat_with_gemini, _assemble_context, STAGE_TIMEOUTS, LLM_MAX_CONCURRENCY
+except ImportError as e:
+    pytest.skip(f"Chatbot module not available: {e}", allow_module_level=True)
+
+
+@pytest.fixture(autouse=True)
+def no_query_embeddings():
+    """Keep the embedding model and the response cache out of these tests."""
+    with patch('services.chatbot.generate_embeddings', return_value=[]):
+        yield
+
+
+DETECTION_DELAY = 0.1
+LLM_DELAY = 0.3
+
+
+def _slow_detect(message):
+    time.sleep(DETECTION_DELAY)
+    return None
+
+
+def _slow_backend():
+    backend = Mock()
+
+    def generate(contents):
+        time.sleep(LLM_DELAY)
+        return "ok"
+
+    backend.generate.side_effect = generate
+    return backend
+
+
+class TestChatConcurrency:
+    """Load tests for concurrent chat requests."""
+
+    @pytest.mark.unit
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    async def test_concurrent_chats_finish_in_time_of_one(self):
+        """Test that N concurrent chats take about as long as a single chat."""
+        concurrency = LLM_MAX_CONCURRENCY
+
+        with patch('services.chatbot.detect_current_game', side_effect=_slow_detect), \
+             patch('services.chatbot.get_llm_backend', return_value=_slow_backend()):
+            start = time.perf_counter()
+            await chat_with_gemini("Hello")
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*[chat_with_gemini(f"Hello {i}") for i in range(concurrency)])
+            concurrent = time.perf_counter() - start
+
+        assert all(result == {"response": "ok"} for result in results)
+        # Serial execution would take ~concurrency * single
+        assert concurrent < single * 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive(self):
+        """Test that other coroutines keep running while a chat is in flight."""
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        with patch('services.chatbot.detect_current_game', side_effect=_slow_detect), \
+             patch('services.chatbot.get_llm_backend', return_value=_slow_backend()):
+            task = asyncio.create_task(ticker())
+            await chat_with_gemini("Hello")
+            task.cancel()
+
+        # A blocked loop would not tick at all during the ~0.4s chat
+        assert ticks >= 10
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_llm_timeout_returns_error(self):
+        """Test that an LLM call exceeding its stage timeout returns an error response."""
+        with patch('services.chatbot.detect_current_game', return_value=None), \
+             patch('services.chatbot.get_llm_backend', return_value=_slow_backend()), \
+             patch.dict(STAGE_TIMEOUTS, {'llm': 0.05}):
+            result = await chat_with_gemini("Hello")
+
+        assert "took too long" in result["response"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_detection_timeout_falls_back_to_no_game(self):
+        """Test that slow game detection is skipped instead of failing the chat."""
+        mock_backend = Mock()
+        mock_backend.generate.return_value = "ok"
+
+        with patch('services.chatbot.detect_current_game', side_effect=_slow_detect), \
+             patch('services.chatbot.get_llm_backend', return_value=mock_backend), \
+             patch.dict(STAGE_TIMEOUTS, {'detection': 0.01}):
+            result = await chat_with_gemini("Hello")
+
+        assert result == {"response": "ok"}
+        mock_backend.generate.assert_called_once_with("Hello")
+
+
+class TestContextAssembly:
+    """Test cases for the concurrent context-assembly pipeline."""
+
+    STAGE_DELAY = 0.2
+
+    def _slow(self, value):
+        def call(*args, **kwargs):
+            time.sleep(self.STAGE_DELAY)
+            return value
+        return call
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_screenshot_stages_overlap_detection(self):
+        """Test that screenshot lookups run alongside game detection."""
+        stats = {'total_screenshots': 1, 'applications': [('minecraft.exe', 1)]}
+
+        with patch('services.chatbot.detect_current_game', side_effect=self._slow(None)), \
+             patch('services.chatbot.get_recent_screenshots', side_effect=self._slow([])), \
+             patch('services.chatbot.get_screenshot_stats', side_effect=self._slow(stats)):
+            start = time.perf_counter()
+            context = await _assemble_context("show me my screenshots")
+            elapsed = time.perf_counter() - start
+
+        assert context['screenshot_stats'] == stats
+        assert context['recent_screenshots'] == []
+        assert elapsed < self.STAGE_DELAY * 2
+        assert {'detection', 'screenshots', 'screenshot_stats', 'total'} <= set(context['timings'])
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_speculative_retrieval_hit(self, mock_vector_search_results):
+        """Test that retrieval on the cached game overlaps detection when the game is unchanged."""
+        with patch('services.chatbot.get_cached_game', return_value='minecraft'), \
+             patch('services.chatbot.generate_embeddings', return_value=[[0.1, 0.2]]), \
+             patch('services.chatbot.detect_current_game', side_effect=self._slow('minecraft')), \
+             patch('services.chatbot.search_knowledge',
+                   side_effect=self._slow(mock_vector_search_results)) as mock_search:
+            start = time.perf_counter()
+            context = await _assemble_context("how do I craft a sword")
+            elapsed = time.perf_counter() - start
+
+        assert context['detected_game'] == 'minecraft'
+        assert context['knowledge_results'] == mock_vector_search_results
+        assert context['query_embedding'] == [[0.1, 0.2]]
+        mock_search.assert_called_once_with('minecraft', "how do I craft a sword", limit=3,
+                                            query_embedding=[[0.1, 0.2]])
+        assert elapsed < self.STAGE_DELAY * 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_speculative_retrieval_miss(self, mock_vector_search_results):
+        """Test that retrieval reruns for the newly detected game when speculation misses."""
+        with patch('services.chatbot.get_cached_game', return_value='minecraft'), \
+             patch('services.chatbot.detect_current_game', return_value='elden_ring'), \
+             patch('services.chatbot.search_knowledge', return_value=mock_vector_search_results) as mock_search:
+            context = await _assemble_context("how do I beat the tree sentinel")
+
+        assert context['detected_game'] == 'elden_ring'
+        assert mock_search.call_args[0][0] == 'elden_ring'
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_timings_passed_back_to_caller(self):
+        """Test that chat_with_gemini copies stage timings into the caller's dict."""
+        mock_backend = Mock()
+        mock_backend.generate.return_value = "ok"
+        timings = {}
+
+        with patch('services.chatbot.get_cached_game', return_value=None), \
+             patch('services.chatbot.detect_current_game', return_value=None), \
+             patch('services.chatbot.get_llm_backend', return_value=mock_backend):
+            await chat_with_gemini("Hello", timings=timings)
+
+        assert {'detection', 'prompt_build', 'total'} <= set(timings)
@@ -0,0 +1,110 @@
+"""
+Test suite for the streaming chat path.
+
+This module tests the chunked generator in the chatbot service and
+the SSE /chat/stream endpoint.
+"""
+
+import pytest
+import os
+import sys
+import json
+from unittest.mock import Mock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.chatbot import stream_chat_with_gemini
+    from services.llm_backend import FakeBackend
+    from routers import chat as chat_router
+except ImportError as e:
+    pytest.skip(f"Chatbot module not available: {e}", allow_module_level=True)
+
+
+@pytest.fixture(autouse=True)
+def no_query_embeddings():
+    """Keep the embedding model and the response cache out of these tests."""
+    with patch('services.chatbot.generate_embeddings', return_value=[]):
+        yield
+
+
+async def _collect(stream):
+    """Drain an async chunk generator into a list."""
+    return [chunk async for chunk in stream]
+
+
+class TestStreamChatWithGemini:
+    """Test cases for the streaming chat generator."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_yields_backend_chunks(self):
+        """Test that chunks from the backend are yielded in order."""
+        fake = FakeBackend(reply_tokens=8)
+
+        with patch('services.chatbot.detect_current_game', return_value=None), \
+             patch('services.chatbot.get_llm_backend', return_value=fake):
+            chunks = await _collect(stream_chat_with_gemini("Hello there"))
+
+        assert "".join(chunks) == fake.generate("Hello there")
+        assert len(chunks) == 8
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_passes_prompt_to_backend(self):
+        """Test that the built prompt is handed to the backend's stream method."""
+        mock_backend = Mock()
+        mock_backend.stream.return_value = iter(["ok"])
+
+        with patch('services.chatbot.detect_current_game', return_value=None), \
+             patch('services.chatbot.get_llm_backend', return_value=mock_backend):
+            chunks = await _collect(stream_chat_with_gemini("Hello there"))
+
+        assert chunks == ["ok"]
+        mock_backend.stream.assert_called_once_with("Hello there")
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_reports_errors(self):
+        """Test that a failing backend yields an error message instead of raising."""
+        mock_backend = Mock()
+        mock_backend.stream.side_effect = Exception("API Error")
+
+        with patch('services.chatbot.detect_current_game', return_value=None), \
+             patch('services.chatbot.get_llm_backend', return_value=mock_backend):
+            chunks = await _collect(stream_chat_with_gemini("Hello there"))
+
+        assert chunks == ["Error processing request: API Error"]
+
+
+class TestChatStreamEndpoint:
+    """Test cases for the /chat/stream SSE endpoint."""
+
+    @pytest.fixture
+    def client(self):
+        """Create a test client with only the chat router mounted."""
+        app = FastAPI()
+        app.include_router(chat_router.router)
+        return TestClient(app)
+
+    @pytest.mark.unit
+    @pytest.mark.api
+    def test_chat_stream_endpoint_events(self, client, sample_chat_message):
+        """Test that each chunk becomes an SSE data event followed by done."""
+        async def fake_stream(message, image_data, screenshot_id=None):
+            for chunk in ["Hello", " world"]:
+                yield chunk
+
+        with patch('routers.chat.stream_chat_with_gemini', fake_stream):
+            response = client.post("/chat/stream", json=sample_chat_message)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line for line in response.text.split("\n\n") if line]
+        assert [json.loads(e[len("data: "):])["delta"] for e in events[:-1]] == ["Hello", " world"]
+        assert events[-1].startswith("event: done")
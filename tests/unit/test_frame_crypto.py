@@ -0,0 +1,311 @@
+"""
+Test suite for the screenshot payload encryption format.
+
+This module tests the chunked AES-GCM format, key rotation, reading
+Fernet tokens and re-encrypting a store with the active key.
+"""
+
+import pytest
+import io
+import os
+import sys
+import sqlite3
+from unittest.mock import Mock, patch
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.frame_crypto import FrameCipher, KeyRing, HEADER, TAG_SIZE, default_keyring_path
+except ImportError as e:
+    pytest.skip(f"Frame crypto module not available: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def ring(temp_dir):
+    return KeyRing.load_or_create(os.path.join(temp_dir, 'keyring.json'))
+
+
+class TestFrameCipher:
+    """Test cases for the chunked AES-GCM format."""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("size", [0, 1, 64, 65, 200])
+    def test_round_trip_across_chunk_boundaries(self, ring, size):
+        """Test payloads shorter than, equal to and spanning several chunks."""
+        cipher = FrameCipher(ring, chunk_size=64)
+        data = os.urandom(size)
+
+        token = cipher.encrypt(data)
+
+        chunks = max(1, -(-size // 64))
+        assert len(token) == HEADER.size + size + chunks * TAG_SIZE
+        assert cipher.decrypt(token) == data
+
+    @pytest.mark.unit
+    def test_smaller_than_fernet(self, ring):
+        """Test that raw bytes avoid Fernet's base64 growth."""
+        data = os.urandom(100_000)
+
+        assert len(FrameCipher(ring).encrypt(data)) < len(Fernet(Fernet.generate_key()).encrypt(data)) * 0.8
+
+    @pytest.mark.unit
+    def test_streaming(self, ring):
+        """Test encrypting arbitrary pieces and decrypting a file one chunk at a time."""
+        cipher = FrameCipher(ring, chunk_size=1000)
+        pieces = [os.urandom(n) for n in (10, 2500, 1, 700)]
+
+        token = b''.join(cipher.encrypt_stream(iter(pieces)))
+        decrypted = list(cipher.decrypt_stream(io.BytesIO(token)))
+
+        assert b''.join(decrypted) == b''.join(pieces)
+        assert [len(chunk) for chunk in decrypted] == [1000, 1000, 1000, 211]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("offset,decrypted_chunks", [(0, 4), (999, 4), (1000, 3), (2500, 2), (3210, 1)])
+    def test_stream_from_offset(self, ring, offset, decrypted_chunks):
+        """Test that decrypting from an offset skips the chunks before it."""
+        cipher = FrameCipher(ring, chunk_size=1000)
+        data = os.urandom(3211)
+        token = cipher.encrypt(data)
+        aead = cipher._aead[ring.active] = Mock(wraps=cipher._cipher(ring.active))
+
+        assert b''.join(cipher.decrypt_stream(io.BytesIO(token), offset)) == data[offset:]
+        assert aead.decrypt.call_count == decrypted_chunks
+
+        legacy = FrameCipher(ring, legacy=Fernet(Fernet.generate_key()))
+        assert b''.join(legacy.decrypt_stream(io.BytesIO(legacy.legacy.encrypt(data)), offset)) == data[offset:]
+
+    @pytest.mark.unit
+    def test_tampering_is_detected(self, ring):
+        """Test that flipped bytes, dropped chunks and swapped chunks fail to decrypt."""
+        cipher = FrameCipher(ring, chunk_size=16)
+        token = cipher.encrypt(os.urandom(48))
+        sealed = 16 + TAG_SIZE
+        body = token[HEADER.size:]
+        chunks = [body[i:i + sealed] for i in range(0, len(body), sealed)]
+
+        flipped = bytearray(token)
+        flipped[-1] ^= 1
+        truncated = token[:HEADER.size] + b''.join(chunks[:2])
+        swapped = token[:HEADER.size] + chunks[1] + chunks[0] + chunks[2]
+        for bad in (bytes(flipped), truncated, swapped):
+            with pytest.raises(InvalidTag):
+                cipher.decrypt(bad)
+
+    @pytest.mark.unit
+    def test_rotation_keeps_old_payloads_readable(self, ring, temp_dir):
+        """Test key IDs in payloads and a rotated, reloaded key ring."""
+        old = FrameCipher(ring).encrypt(b'before')
+        new_id = ring.rotate()
+        reloaded = KeyRing.load_or_create(ring.path)
+        cipher = FrameCipher(reloaded)
+
+        new = cipher.encrypt(b'after')
+
+        assert reloaded.active == new_id == 2
+        assert FrameCipher.key_id_of(old) == 1
+        assert FrameCipher.key_id_of(new) == 2
+        assert new.startswith(FrameCipher.header_prefix(2))
+        assert cipher.decrypt(old) == b'before'
+
+    @pytest.mark.unit
+    def test_default_keyring_next_to_database(self, temp_dir):
+        """Test that the key ring follows the database unless PIXLY_KEYRING_PATH is set."""
+        db_path = os.path.join(temp_dir, 'data', 'screenshots.db')
+        assert default_keyring_path(db_path) == os.path.join(temp_dir, 'data', 'screenshot_keyring.json')
+        with patch('services.frame_crypto.KEYRING_PATH', '/etc/pixly/keyring.json'):
+            assert default_keyring_path(db_path) == '/etc/pixly/keyring.json'
+
+    @pytest.mark.unit
+    def test_reads_fernet_tokens(self, ring):
+        """Test backward-compatible reads, and Fernet writes as a rollback option."""
+        legacy = Fernet(Fernet.generate_key())
+        token = legacy.encrypt(b'old frame')
+
+        assert FrameCipher.key_id_of(token) is None
+        assert FrameCipher(ring, legacy=legacy).decrypt(token) == b'old frame'
+        assert legacy.decrypt(FrameCipher(ring, legacy=legacy, write_format='fernet').encrypt(b'x')) == b'x'
+        with pytest.raises(ValueError):
+            FrameCipher(ring).decrypt(token)
+
+
+class TestReencryption:
+    """Test cases for moving a store to the active key."""
+
+    @pytest.mark.unit
+    def test_fernet_store_is_reencrypted(self, temp_dir, temp_db_path, monkeypatch):
+        """Test that Fernet blobs and thumbnails are rewritten and still read back."""
+        try:
+            from services.screenshot import ScreenshotCapture
+        except ImportError as e:
+            pytest.skip(f"Screenshot module not available: {e}")
+        monkeypatch.chdir(temp_dir)
+        from PIL import Image
+        frames = []
+        for color in ('red', 'blue'):
+            buffer = io.BytesIO()
+            Image.new('RGB', (64, 48), color).save(buffer, format='PNG')
+            frames.append(buffer.getvalue())
+        window = {'application': 'game.exe', 'window_title': 'Game', 'pid': 1}
+
+        old = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, dedup_threshold=-1)
+        old.crypto.write_format = 'fernet'
+        for frame in frames:
+            old.save_screenshot(frame, window)
+        old.close()
+
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, dedup_threshold=-1)
+        try:
+            assert capture.get_stats()['encryption']['blobs_by_key'] == {'fernet': 2}
+            result = capture.reencryption.run_once()
+
+            assert result == {'blobs': 2, 'rows': 2, 'errors': 0}
+            assert capture.get_stats()['encryption']['blobs_by_key'] == {'1': 2}
+            conn = sqlite3.connect(temp_db_path)
+            blobs = conn.execute("SELECT hash, file FROM blobs").fetchall()
+            thumbnails = [row[0] for row in conn.execute("SELECT encrypted_thumbnail FROM screenshots")]
+            conn.close()
+            assert len(blobs) == 2
+            assert all(FrameCipher.key_id_of(capture.blobs.read(blob_hash, file)) == 1 for blob_hash, file in blobs)
+            assert all(FrameCipher.key_id_of(thumbnail) == 1 for thumbnail in thumbnails)
+            capture._frame_cache.clear()
+            assert [capture.get_screenshot_data(i) for i in (1, 2)] == frames
+            assert capture.get_thumbnail(1)[:2] == b'\xff\xd8'
+            assert capture.reencryption.run_once() == {'blobs': 0, 'rows': 0, 'errors': 0}
+        finally:
+            capture.close()
+
+    @pytest.mark.unit
+    def test_thumbnail_written_meanwhile_is_kept(self, temp_dir, temp_db_path, monkeypatch):
+        """Test that a thumbnail rewritten after the pass read the row isn't overwritten by it."""
+        try:
+            from services.screenshot import ScreenshotCapture
+        except ImportError as e:
+            pytest.skip(f"Screenshot module not available: {e}")
+        monkeypatch.chdir(temp_dir)
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), 'red').save(buffer, format='PNG')
+        window = {'application': 'game.exe', 'window_title': 'Game', 'pid': 1}
+        old = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, dedup_threshold=-1)
+        old.crypto.write_format = 'fernet'
+        old.save_screenshot(buffer.getvalue(), window)
+        old.close()
+
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, dedup_threshold=-1)
+        try:
+            stale = capture.db.read_one("SELECT encrypted_thumbnail FROM screenshots WHERE id = 1")[0]
+            fresh = capture._encrypt_data(b'thumbnail written meanwhile')
+            reencrypt = capture.reencryption._reencrypt
+
+            def racing_reencrypt(payload):
+                if payload == stale:
+                    capture.db.execute_write("UPDATE screenshots SET encrypted_thumbnail = ? WHERE id = 1", (fresh,))
+                return reencrypt(payload)
+
+            with patch.object(capture.reencryption, '_reencrypt', racing_reencrypt):
+                assert capture.reencryption.run_once() == {'blobs': 1, 'rows': 0, 'errors': 0}
+
+            assert capture.db.read_one("SELECT encrypted_thumbnail FROM screenshots WHERE id = 1")[0] == fresh
+            assert capture.reencryption.run_once() == {'blobs': 0, 'rows': 0, 'errors': 0}
+        finally:
+            capture.close()
+
+    @pytest.fixture
+    def fernet_capture(self, temp_dir, temp_db_path, monkeypatch):
+        """A capture over a store whose two frames are Fernet blobs."""
+        try:
+            from services.screenshot import ScreenshotCapture
+        except ImportError as e:
+            pytest.skip(f"Screenshot module not available: {e}")
+        monkeypatch.chdir(temp_dir)
+        window = {'application': 'game.exe', 'window_title': 'Game', 'pid': 1}
+        old = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, dedup_threshold=-1)
+        old.crypto.write_format = 'fernet'
+        for frame in (b'frame-a', b'frame-b'):
+            old.save_screenshot(frame, window)
+        old.close()
+
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, dedup_threshold=-1)
+        yield capture
+        capture.close()
+
+    @staticmethod
+    def _blob_files(capture):
+        referenced = {(blob_hash, file) for blob_hash, file in capture.db.read("SELECT hash, file FROM blobs")}
+        on_disk = {name for directory, _, names in os.walk(capture.blobs.root)
+                   if directory != capture.blobs.root for name in names}
+        return referenced, on_disk
+
+    @pytest.mark.unit
+    def test_swap_replaces_files_after_commit(self, fernet_capture):
+        """Test that re-encrypted blobs get new files and the old ones are gone once committed."""
+        capture = fernet_capture
+        before, _ = self._blob_files(capture)
+        assert capture.reencryption.run_once()['blobs'] == 2
+
+        after, on_disk = self._blob_files(capture)
+        assert {file for _, file in after} == on_disk
+        assert not on_disk & {file for _, file in before}
+
+    @pytest.mark.unit
+    def test_rolled_back_swap_keeps_the_old_file(self, fernet_capture):
+        """Test that a swap whose transaction fails leaves the blob on its old file and key."""
+        capture = fernet_capture
+        before, on_disk = self._blob_files(capture)
+        write = capture.db.write
+
+        def failing_write(func):
+            def fail_after(conn):
+                func(conn)
+                raise sqlite3.OperationalError("disk I/O error")
+            return write(fail_after)
+
+        with patch.object(capture.db, 'write', failing_write), pytest.raises(sqlite3.OperationalError):
+            capture.reencryption.run_once()
+
+        assert self._blob_files(capture) == (before, on_disk)
+        assert capture.get_stats()['encryption']['blobs_by_key'] == {'fernet': 2}
+        assert [capture.get_screenshot_data(i) for i in (1, 2)] == [b'frame-a', b'frame-b']
+
+    @pytest.mark.unit
+    def test_unwritable_blob_is_skipped(self, fernet_capture):
+        """Test that a blob whose new file can't be written is skipped and the pass goes on."""
+        capture = fernet_capture
+        stage = capture.blobs.stage
+        calls = []
+
+        def flaky_stage(blob_hash, data):
+            calls.append(blob_hash)
+            if len(calls) == 1:
+                raise PermissionError("file is in use")
+            return stage(blob_hash, data)
+
+        with patch.object(capture.blobs, 'stage', flaky_stage):
+            assert capture.reencryption.run_once() == {'blobs': 1, 'rows': 0, 'errors': 1}
+        assert capture.reencryption.run_once() == {'blobs': 1, 'rows': 0, 'errors': 0}
+        assert capture.get_stats()['encryption']['blobs_by_key'] == {'1': 2}
+
+    @pytest.mark.unit
+    def test_reencrypt_endpoint(self):
+        """Test that POST /screenshots/encryption/reencrypt runs a pass and returns its counts."""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        try:
+            from routers import screenshot as screenshot_router
+        except ImportError as e:
+            pytest.skip(f"Screenshot router not available: {e}")
+        app = FastAPI()
+        app.include_router(screenshot_router.router, prefix="/screenshots")
+        result = {'blobs': 3, 'rows': 1, 'errors': 0}
+
+        with patch('routers.screenshot.run_screenshot_reencryption', return_value=result):
+            response = TestClient(app).post("/screenshots/encryption/reencrypt")
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok", "result": result}
@@ -55,6 +55,17 @@ class TestGameDetection:
         
         assert result == 'minecraft'
     
+    @pytest.mark.unit
+    def test_game_for_process(self):
+        """Test mapping a single process name to a game without a process scan."""
+        detector = GameDetection()
+        
+        with patch('psutil.process_iter') as mock_iter:
+            assert detector.game_for_process('EldenRing.exe') == 'elden_ring'
+            assert detector.game_for_process('chrome.exe') is None
+            assert detector.game_for_process(None) is None
+            mock_iter.assert_not_called()
+    
     @pytest.mark.unit
     def test_detect_game_from_process_no_match(self):
         """Test game detection when no matching processes are found."""
@@ -76,7 +87,7 @@ class TestGameDetection:
     @pytest.mark.unit
     def test_detect_game_from_screenshots_success(self, mock_screenshot_records):
         """Test successful game detection from screenshots."""
-        with patch('backend.game_detection.get_recent_screenshots', return_value=mock_screenshot_records):
+        with patch('services.game_detection.get_recent_screenshots', return_value=mock_screenshot_records):
             detector = GameDetection()
             result = detector.detect_game_from_screenshots()
             
@@ -89,7 +100,7 @@ class TestGameDetection:
             (1, '2024-01-01T10:00:00', 'unknown.exe', 'Minecraft Launcher', 'hash1'),
         ]
         
-        with patch('backend.game_detection.get_recent_screenshots', return_value=mock_screenshots):
+        with patch('services.game_detection.get_recent_screenshots', return_value=mock_screenshots):
             detector = GameDetection()
             result = detector.detect_game_from_screenshots()
             
@@ -102,7 +113,7 @@ class TestGameDetection:
             (1, '2024-01-01T10:00:00', 'notepad.exe', 'Notepad', 'hash1'),
         ]
         
-        with patch('backend.game_detection.get_recent_screenshots', return_value=mock_screenshots):
+        with patch('services.game_detection.get_recent_screenshots', return_value=mock_screenshots):
             detector = GameDetection()
             result = detector.detect_game_from_screenshots()
             
@@ -111,7 +122,7 @@ class TestGameDetection:
     @pytest.mark.unit
     def test_detect_game_from_screenshots_exception(self):
         """Test game detection from screenshots with exception."""
-        with patch('backend.game_detection.get_recent_screenshots', side_effect=Exception("Screenshot error")):
+        with patch('services.game_detection.get_recent_screenshots', side_effect=Exception("Screenshot error")):
             detector = GameDetection()
             result = detector.detect_game_from_screenshots()
             
@@ -303,6 +314,17 @@ class TestGameDetection:
         
         assert detector._detected_game is None
         assert detector._last_detection_time == 0
+    
+    @pytest.mark.unit
+    def test_get_cached_game_ignores_expiry(self):
+        """Test that the cached game is returned even after the cache window has passed."""
+        detector = GameDetection()
+        detector._detected_game = 'minecraft'
+        detector._last_detection_time = time.time() - 3600
+        
+        with patch.object(detector, 'detect_game_from_process') as mock_process:
+            assert detector.get_cached_game() == 'minecraft'
+            mock_process.assert_not_called()
 
 
 class TestGameDetectionModuleFunctions:
@@ -358,7 +380,7 @@ class TestGameDetectionIntegration:
         # Test with screenshot detection (both message and process fail)
         with patch.object(detector, 'detect_game_from_message', return_value=None), \
              patch('psutil.process_iter', return_value=[]), \
-             patch('backend.game_detection.get_recent_screenshots', return_value=mock_screenshot_records):
+             patch('services.game_detection.get_recent_screenshots', return_value=mock_screenshot_records):
             result = detector.detect_current_game("random question")
             assert result == 'minecraft'
     
@@ -393,7 +415,7 @@ class TestGameDetectionIntegration:
         mock_screenshots = [
             (1, '2024-01-01T10:00:00', 'unknown.exe', 'Test Game Window', 'hash1'),
         ]
-        with patch('backend.game_detection.get_recent_screenshots', return_value=mock_screenshots):
+        with patch('services.game_detection.get_recent_screenshots', return_value=mock_screenshots):
             result = detector.detect_game_from_screenshots()
             assert result == 'test_integration_game'
 
@@ -406,7 +428,8 @@ class TestGameDetectionEdgeCases:
         """Test game detection with empty message."""
         detector = GameDetection()
         
-        result = detector.detect_current_game("")
+        with patch('services.game_detection.get_recent_screenshots', return_value=[]):
+            result = detector.detect_current_game("")
         assert result is None
     
     @pytest.mark.unit
@@ -414,7 +437,8 @@ class TestGameDetectionEdgeCases:
         """Test game detection with None message."""
         detector = GameDetection()
         
-        result = detector.detect_current_game(None)
+        with patch('services.game_detection.get_recent_screenshots', return_value=[]):
+            result = detector.detect_current_game(None)
         assert result is None
     
     @pytest.mark.unit
@@ -0,0 +1,229 @@
+"""
+Test suite for image preparation and binary image chat.
+
+This module tests downscaling and re-encoding of frames before the
+vision model call, perceptual hashing, the raw-bytes /chat/image endpoints and chatting
+about a stored screenshot by reference.
+"""
+
+import pytest
+import os
+import sys
+import io
+from unittest.mock import Mock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from PIL import Image
+    from services.imaging import (prepare_vision_image, downscale, encode_image, encode_frame, mime_type_of,
+                                  dhash, hamming_distance)
+except ImportError as e:
+    pytest.skip(f"Imaging module not available: {e}", allow_module_level=True)
+
+
+def _gradient(size=(640, 360), reverse=False):
+    """Horizontal gradient, dark to light (or light to dark when reversed)."""
+    image = Image.linear_gradient('L').transpose(Image.Transpose.ROTATE_90)
+    if not reverse:
+        image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    return image.resize(size).convert('RGB')
+
+
+def _png_bytes(size=(3840, 2160), mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, color='red' if mode == 'RGB' else None).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class TestPrepareVisionImage:
+    """Test cases for prepare_vision_image and its helpers."""
+
+    @pytest.mark.unit
+    def test_4k_frame_is_downscaled_to_jpeg(self):
+        """Test that a 4K PNG becomes a JPEG no larger than max_dim."""
+        blob = prepare_vision_image(_png_bytes(), max_dim=1536, fmt='jpeg', quality=80)
+
+        assert blob['mime_type'] == 'image/jpeg'
+        image = Image.open(io.BytesIO(blob['data']))
+        assert image.format == 'JPEG'
+        assert image.size == (1536, 864)
+
+    @pytest.mark.unit
+    def test_small_image_keeps_size(self):
+        """Test that images under max_dim are not upscaled."""
+        blob = prepare_vision_image(_png_bytes((640, 480)), max_dim=1536, fmt='webp')
+
+        assert blob['mime_type'] == 'image/webp'
+        assert Image.open(io.BytesIO(blob['data'])).size == (640, 480)
+
+    @pytest.mark.unit
+    def test_alpha_is_dropped_for_jpeg(self):
+        """Test that RGBA frames are converted before JPEG encoding."""
+        image = Image.new('RGBA', (100, 100))
+
+        data = encode_image(downscale(image, 50), 'jpeg', 85)
+
+        assert Image.open(io.BytesIO(data)).mode == 'RGB'
+
+    @pytest.mark.unit
+    def test_unknown_format_rejected(self):
+        """Test that unsupported output formats raise ValueError."""
+        with pytest.raises(ValueError):
+            prepare_vision_image(_png_bytes((10, 10)), fmt='bmp')
+
+
+class TestEncodeFrame:
+    """Test cases for encoding captured frames."""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('fmt,mime_type', [('png', 'image/png'), ('jpeg', 'image/jpeg'), ('webp', 'image/webp')])
+    def test_mime_type_sniffed(self, fmt, mime_type):
+        """Test that the stored format is recognised from the encoded bytes."""
+        assert mime_type_of(encode_frame(_gradient(), fmt=fmt)['data']) == mime_type
+
+    @pytest.mark.unit
+    def test_palette_png_is_8_bit(self):
+        """Test the palette color depth."""
+        frame = encode_frame(_gradient(), fmt='png', colors='palette')
+
+        assert Image.open(io.BytesIO(frame['data'])).mode == 'P'
+        assert frame['phash'] == dhash(_gradient())
+
+    @pytest.mark.unit
+    def test_unknown_color_depth_rejected(self):
+        """Test that unsupported color depths raise ValueError."""
+        with pytest.raises(ValueError):
+            encode_frame(_gradient(), colors='cmyk')
+
+
+class TestPerceptualHash:
+    """Test cases for dhash and hamming_distance."""
+
+    @pytest.mark.unit
+    def test_reencoded_frame_hashes_the_same(self):
+        """Test that a JPEG copy of a frame is a near-duplicate of it."""
+        frame = _gradient()
+        copy = Image.open(io.BytesIO(encode_image(frame, 'jpeg', 60)))
+
+        assert hamming_distance(dhash(frame), dhash(copy)) <= 4
+
+    @pytest.mark.unit
+    def test_different_frames_hash_apart(self):
+        """Test that visibly different frames are far apart."""
+        assert hamming_distance(dhash(_gradient()), dhash(_gradient(reverse=True))) > 16
+
+    @pytest.mark.unit
+    def test_hash_is_64_bits(self):
+        """Test the default hash size."""
+        assert dhash(_gradient(reverse=True)).bit_length() <= 64
+        assert hamming_distance(0, 0b1011) == 3
+
+
+class TestChatImageEndpoint:
+    """Test cases for the raw-bytes /chat/image endpoints."""
+
+    @pytest.fixture
+    def client(self):
+        """Create a test client with only the chat router mounted."""
+        try:
+            from routers import chat as chat_router
+        except ImportError as e:
+            pytest.skip(f"Chat router not available: {e}")
+        app = FastAPI()
+        app.include_router(chat_router.router)
+        return TestClient(app)
+
+    @pytest.mark.unit
+    @pytest.mark.api
+    def test_image_reaches_model_downscaled(self, client):
+        """Test that raw PNG bytes are downscaled and sent to the model as an inline blob."""
+        backend = Mock()
+        backend.generate.return_value = "A red screen."
+
+        with patch('services.chatbot.detect_current_game', return_value='minecraft'), \
+             patch('services.chatbot.get_llm_backend', return_value=backend):
+            response = client.post("/chat/image", params={"message": "What is this?"},
+                                   content=_png_bytes(), headers={"Content-Type": "image/png"})
+
+        assert response.status_code == 200
+        assert response.json() == {"response": "A red screen."}
+        assert "image;dur=" in response.headers["server-timing"]
+        prompt, blob = backend.generate.call_args[0][0]
+        assert "What is this?" in prompt
+        assert "DETECTED GAME: MINECRAFT" in prompt
+        assert max(Image.open(io.BytesIO(blob['data'])).size) <= 1536
+
+    @pytest.mark.unit
+    @pytest.mark.api
+    def test_stream_variant_uses_image_bytes(self, client):
+        """Test that /chat/image/stream passes the raw bytes through to the stream."""
+        captured = {}
+
+        async def fake_stream(message, image_data=None, timings=None, image_bytes=None):
+            captured['image_bytes'] = image_bytes
+            yield "ok"
+
+        with patch('routers.chat.stream_chat_with_gemini', fake_stream):
+            response = client.post("/chat/image/stream", content=b"\x89PNG-bytes")
+
+        assert response.status_code == 200
+        assert captured['image_bytes'] == b"\x89PNG-bytes"
+
+    @pytest.mark.unit
+    @pytest.mark.api
+    def test_chat_by_screenshot_reference(self, client):
+        """Test that a screenshot_id is loaded server-side instead of uploaded."""
+        backend = Mock()
+        backend.generate.return_value = "Nice base."
+
+        with patch('services.chatbot.detect_current_game', return_value=None), \
+             patch('services.chatbot.get_screenshot_by_id', return_value=_png_bytes()) as mock_load, \
+             patch('services.chatbot.get_llm_backend', return_value=backend):
+            response = client.post("/chat", json={"message": "Rate my base", "screenshot_id": 42})
+
+        assert response.json() == {"response": "Nice base."}
+        mock_load.assert_called_once_with(42)
+        prompt, blob = backend.generate.call_args[0][0]
+        assert "screenshot #42" in prompt
+        assert blob['mime_type'] == 'image/jpeg'
+
+    @pytest.mark.unit
+    @pytest.mark.api
+    def test_unknown_screenshot_reference(self, client):
+        """Test that a missing screenshot_id is reported without a model call."""
+        backend = Mock()
+
+        with patch('services.chatbot.detect_current_game', return_value=None), \
+             patch('services.chatbot.get_screenshot_by_id', return_value=None), \
+             patch('services.chatbot.get_llm_backend', return_value=backend):
+            response = client.post("/chat", json={"message": "Rate my base", "screenshot_id": 7})
+
+        assert "Screenshot 7 not found" in response.json()["response"]
+        backend.generate.assert_not_called()
+
+    @pytest.mark.unit
+    @pytest.mark.api
+    def test_empty_body_rejected(self, client):
+        """Test that an upload without image bytes is a 400."""
+        response = client.post("/chat/image", content=b"")
+
+        assert response.status_code == 400
+
+    @pytest.mark.unit
+    @pytest.mark.api
+    def test_undecodable_image_reports_error(self, client):
+        """Test that garbage bytes produce an error reply instead of a model call."""
+        backend = Mock()
+
+        with patch('services.chatbot.detect_current_game', return_value=None), \
+             patch('services.chatbot.get_llm_backend', return_value=backend):
+            response = client.post("/chat/image", content=b"not an image")
+
+        assert "Could not read the attached image" in response.json()["response"]
+        backend.generate.assert_not_called()
@@ -0,0 +1,128 @@
+"""
+Test suite for latency metrics.
+
+This module tests histogram and counter exposition, Server-Timing
+collection, and the stage instrumentation in the chat path.
+"""
+
+import pytest
+import os
+import sys
+from unittest.mock import Mock, patch
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.metrics import (
+        Counter,
+        Histogram,
+        MetricsRegistry,
+        server_timing,
+        record_server_timing,
+        format_server_timing,
+        timed,
+        chat_stage_seconds
+    )
+except ImportError as e:
+    pytest.skip(f"Metrics module not available: {e}", allow_module_level=True)
+
+
+class TestMetricTypes:
+    """Test cases for Histogram, Counter and the registry."""
+
+    @pytest.mark.unit
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that an observation counts in every bucket at or above it."""
+        histogram = Histogram('test_seconds', 'Test.', buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage='a')
+        histogram.observe(0.5, stage='a')
+        histogram.observe(5.0, stage='a')
+
+        lines = histogram.render()
+
+        assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{stage="a",le="1"} 2' in lines
+        assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+        assert 'test_seconds_count{stage="a"} 3' in lines
+        assert histogram.snapshot(stage='a')['sum'] == pytest.approx(5.55)
+
+    @pytest.mark.unit
+    def test_counter_render(self):
+        """Test counter exposition with and without labels."""
+        counter = Counter('test_total', 'Test.')
+        counter.inc()
+        counter.inc(2, kind='x')
+
+        lines = counter.render()
+
+        assert '# TYPE test_total counter' in lines
+        assert 'test_total 1' in lines
+        assert 'test_total{kind="x"} 2' in lines
+
+    @pytest.mark.unit
+    def test_registry_returns_existing_metric(self):
+        """Test that registering the same name twice returns one metric."""
+        registry = MetricsRegistry()
+        first = registry.histogram('test_seconds', 'Test.')
+
+        assert registry.histogram('test_seconds', 'Test.') is first
+        assert registry.render().startswith('# HELP test_seconds Test.')
+
+
+class TestServerTiming:
+    """Test cases for per-request Server-Timing collection."""
+
+    @pytest.mark.unit
+    def test_entries_only_recorded_inside_request(self):
+        """Test that timings outside server_timing() are dropped."""
+        record_server_timing('outside', 1.0)
+        with server_timing() as entries:
+            record_server_timing('llm', 12.345)
+            record_server_timing('chroma', 3.0, 'minecraft_wiki')
+
+        assert entries == [('llm', None, 12.35), ('chroma', 'minecraft_wiki', 3.0)]
+        assert format_server_timing(entries) == 'llm;dur=12.35, chroma;desc="minecraft_wiki";dur=3.0'
+
+    @pytest.mark.unit
+    def test_timed_records_histogram_and_server_timing(self):
+        """Test that timed() observes the histogram and the request timing."""
+        histogram = Histogram('test_seconds', 'Test.')
+        with server_timing() as entries:
+            with timed(histogram, 'work', stage='work'):
+                pass
+
+        assert histogram.snapshot(stage='work')['count'] == 1
+        assert [entry[0] for entry in entries] == ['work']
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_chat_stages_reach_server_timing(self):
+        """Test that chat stages, including work on executor threads, are collected."""
+        try:
+            from services.chatbot import chat_with_gemini
+        except ImportError as e:
+            pytest.skip(f"Chatbot module not available: {e}")
+
+        def search(*args, **kwargs):
+            # Runs on the context executor
+            record_server_timing('chroma', 1.0, 'minecraft_wiki')
+            return []
+
+        backend = Mock()
+        backend.generate.return_value = "ok"
+        llm_before = chat_stage_seconds.snapshot(stage='llm')['count']
+
+        with patch('services.chatbot.get_cached_game', return_value=None), \
+             patch('services.chatbot.detect_current_game', return_value='minecraft'), \
+             patch('services.chatbot.generate_embeddings', return_value=[]), \
+             patch('services.chatbot.search_knowledge', side_effect=search), \
+             patch('services.chatbot.get_llm_backend', return_value=backend):
+            with server_timing() as entries:
+                await chat_with_gemini("best enchantments for a sword")
+
+        names = [entry[0] for entry in entries]
+        assert {'detection', 'chroma', 'retrieval', 'context', 'prompt_build', 'llm'} <= set(names)
+        assert chat_stage_seconds.snapshot(stage='llm')['count'] == llm_before + 1
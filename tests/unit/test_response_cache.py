@@ -0,0 +1,149 @@
+"""
+Test suite for the semantic response cache.
+
+This module tests similarity matching, TTL expiry, LRU eviction,
+per-game invalidation and the cache integration in the chatbot.
+"""
+
+import pytest
+import os
+import sys
+import time
+from unittest.mock import Mock, patch
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.response_cache import SemanticResponseCache, response_cache
+except ImportError as e:
+    pytest.skip(f"Response cache module not available: {e}", allow_module_level=True)
+
+
+class TestSemanticResponseCache:
+    """Test cases for the SemanticResponseCache class."""
+
+    @pytest.mark.unit
+    def test_lookup_similar_query_hits(self):
+        """Test that a near-identical embedding for the same game is a hit."""
+        cache = SemanticResponseCache(similarity_threshold=0.9)
+        cache.store('elden_ring', 'how do I beat margit', [1.0, 0.0, 0.1], 'Use spirit ashes.', 2.0)
+
+        assert cache.lookup('elden_ring', [1.0, 0.02, 0.1]) == 'Use spirit ashes.'
+        stats = cache.get_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 0
+        assert stats['seconds_saved'] == 2.0
+
+    @pytest.mark.unit
+    def test_lookup_dissimilar_query_misses(self):
+        """Test that an embedding below the threshold is a miss."""
+        cache = SemanticResponseCache(similarity_threshold=0.9)
+        cache.store('elden_ring', 'how do I beat margit', [1.0, 0.0, 0.0], 'Use spirit ashes.')
+
+        assert cache.lookup('elden_ring', [0.0, 1.0, 0.0]) is None
+        assert cache.get_stats()['misses'] == 1
+
+    @pytest.mark.unit
+    def test_lookup_is_scoped_to_game(self):
+        """Test that answers are not shared between games."""
+        cache = SemanticResponseCache()
+        cache.store('minecraft', 'best enchantments', [1.0, 0.0], 'Mending.')
+
+        assert cache.lookup('elden_ring', [1.0, 0.0]) is None
+        assert cache.lookup('minecraft', [1.0, 0.0]) == 'Mending.'
+
+    @pytest.mark.unit
+    def test_entries_expire_after_ttl(self):
+        """Test that entries older than the TTL are not returned."""
+        cache = SemanticResponseCache(ttl_seconds=10)
+        cache.store('minecraft', 'best enchantments', [1.0, 0.0], 'Mending.')
+
+        with patch('services.response_cache.time.time', return_value=time.time() + 11):
+            assert cache.lookup('minecraft', [1.0, 0.0]) is None
+        assert cache.get_stats()['entries'] == 0
+
+    @pytest.mark.unit
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted at the size bound."""
+        cache = SemanticResponseCache(max_entries=2)
+        cache.store('minecraft', 'a', [1.0, 0.0, 0.0], 'A')
+        cache.store('minecraft', 'b', [0.0, 1.0, 0.0], 'B')
+        # Touch A so B becomes least recently used
+        assert cache.lookup('minecraft', [1.0, 0.0, 0.0]) == 'A'
+        cache.store('minecraft', 'c', [0.0, 0.0, 1.0], 'C')
+
+        assert cache.lookup('minecraft', [0.0, 1.0, 0.0]) is None
+        assert cache.lookup('minecraft', [1.0, 0.0, 0.0]) == 'A'
+        assert cache.get_stats()['evictions'] == 1
+
+    @pytest.mark.unit
+    def test_invalidate_game(self):
+        """Test that invalidation only drops the given game's answers."""
+        cache = SemanticResponseCache()
+        cache.store('minecraft', 'a', [1.0, 0.0], 'A')
+        cache.store('elden_ring', 'b', [1.0, 0.0], 'B')
+
+        assert cache.invalidate_game('minecraft') == 1
+        assert cache.lookup('minecraft', [1.0, 0.0]) is None
+        assert cache.lookup('elden_ring', [1.0, 0.0]) == 'B'
+
+    @pytest.mark.unit
+    def test_empty_embedding_is_ignored(self):
+        """Test that an empty embedding neither stores nor counts as a lookup."""
+        cache = SemanticResponseCache()
+        cache.store('minecraft', 'a', [], 'A')
+
+        assert cache.lookup('minecraft', []) is None
+        assert cache.get_stats()['entries'] == 0
+        assert cache.get_stats()['misses'] == 0
+
+
+class TestResponseCacheIntegration:
+    """Test cases for the response cache in the chat path."""
+
+    @pytest.fixture(autouse=True)
+    def clean_cache(self):
+        response_cache.clear()
+        yield
+        response_cache.clear()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_repeated_question_skips_model(self):
+        """Test that a repeated question is answered from the cache."""
+        try:
+            from services.chatbot import chat_with_gemini
+        except ImportError as e:
+            pytest.skip(f"Chatbot module not available: {e}")
+
+        mock_backend = Mock()
+        mock_backend.generate.return_value = "Use spirit ashes."
+
+        with patch('services.chatbot.get_cached_game', return_value=None), \
+             patch('services.chatbot.detect_current_game', return_value='elden_ring'), \
+             patch('services.chatbot.generate_embeddings', return_value=[[0.3, 0.4, 0.5]]), \
+             patch('services.chatbot.search_knowledge', return_value=[]), \
+             patch('services.chatbot.get_llm_backend', return_value=mock_backend):
+            first = await chat_with_gemini("how do I beat the tree sentinel")
+            second = await chat_with_gemini("how do I beat the tree sentinel?")
+
+        assert first == second == {"response": "Use spirit ashes."}
+        mock_backend.generate.assert_called_once()
+
+    @pytest.mark.unit
+    def test_reprocessing_knowledge_invalidates_game(self):
+        """Test that add_game_knowledge drops cached answers for that game."""
+        try:
+            import services.vector_service as vector_module
+        except ImportError as e:
+            pytest.skip(f"Vector service module not available: {e}")
+
+        response_cache.store('minecraft', 'a', [1.0, 0.0], 'A')
+        with patch.object(vector_module, 'get_vector_service') as get_service:
+            get_service.return_value.add_game_knowledge.return_value = True
+            assert vector_module.add_game_knowledge('minecraft') is True
+
+        assert response_cache.lookup('minecraft', [1.0, 0.0]) is None
@@ -0,0 +1,246 @@
+"""
+Test suite for screenshot retention.
+
+This module tests the size, age, per-application and downsampling
+limits, incremental vacuum and the background job.
+"""
+
+import pytest
+import os
+import sys
+import time
+import sqlite3
+from unittest.mock import patch
+from datetime import datetime, timedelta
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.retention import RetentionPolicy, ScreenshotRetention
+    from services.screenshot import ScreenshotCapture
+    from services.schema_migrations import MigrationRunner
+except ImportError as e:
+    pytest.skip(f"Retention module not available: {e}", allow_module_level=True)
+
+
+def _policy(**limits):
+    """A policy with every limit disabled except those given."""
+    return RetentionPolicy(**{'max_bytes': 0, 'max_age_days': 0, 'max_per_app': 0,
+                              'downsample_after_days': 0, 'keep_every': 1, **limits})
+
+
+@pytest.fixture
+def capture(temp_dir, temp_db_path, monkeypatch):
+    """A real capture without deduplication, closed afterwards."""
+    monkeypatch.chdir(temp_dir)
+    capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, dedup_threshold=-1)
+    yield capture
+    capture.close()
+
+
+def _store(capture, count, application='game.exe', days_ago=0, size=16):
+    """Store count distinct frames dated days_ago, one minute apart; returns their ids."""
+    ids = []
+    for i in range(count):
+        payload = f"{application}-{days_ago}-{i}-".encode() + os.urandom(size)
+        capture.save_screenshot(payload, {'application': application, 'window_title': 'Game', 'pid': 1})
+        screenshot_id = capture.db.read_one('SELECT MAX(id) FROM screenshots')[0]
+        timestamp = (datetime.now() - timedelta(days=days_ago, minutes=count - i)).isoformat()
+        capture.db.execute_write('UPDATE screenshots SET timestamp = ? WHERE id = ?', (timestamp, screenshot_id))
+        ids.append(screenshot_id)
+    return ids
+
+
+def _ids(capture):
+    return [row[0] for row in capture.db.read('SELECT id FROM screenshots ORDER BY id')]
+
+
+class TestRetentionPolicy:
+    """Test cases for each retention limit."""
+
+    @pytest.mark.unit
+    def test_max_age(self, capture):
+        """Test that frames older than max_age_days are deleted."""
+        _store(capture, 3, days_ago=10)
+        recent = _store(capture, 2)
+
+        result = ScreenshotRetention(capture, _policy(max_age_days=7)).run_once()
+
+        assert result['deleted'] == 3
+        assert _ids(capture) == recent
+
+    @pytest.mark.unit
+    def test_max_per_app_keeps_newest(self, capture):
+        """Test the per-application cap."""
+        game = _store(capture, 5, 'game.exe')
+        browser = _store(capture, 2, 'chrome.exe')
+
+        ScreenshotRetention(capture, _policy(max_per_app=3)).run_once()
+
+        assert _ids(capture) == game[2:] + browser
+
+    @pytest.mark.unit
+    def test_downsampling_is_stable(self, capture):
+        """Test that old frames are thinned to one in N and a second run keeps them."""
+        old = _store(capture, 12, days_ago=30)
+        recent = _store(capture, 3)
+        retention = ScreenshotRetention(capture, _policy(downsample_after_days=7, keep_every=4))
+
+        retention.run_once()
+        kept = _ids(capture)
+        second = retention.run_once()
+
+        assert kept == [i for i in old if i % 4 == 0] + recent
+        assert second['deleted'] == 0
+        assert _ids(capture) == kept
+
+    @pytest.mark.unit
+    def test_max_bytes_deletes_oldest_first(self, capture):
+        """Test that the disk budget is met by removing the oldest frames."""
+        ids = _store(capture, 20, size=64 * 1024)
+        retention = capture.retention
+        retention.policy, retention.batch_size = _policy(), 5
+        retention.policy.max_bytes = retention.disk_usage() - 6 * 64 * 1024
+
+        result = retention.run_once()
+
+        remaining = _ids(capture)
+        assert retention.disk_usage() <= retention.policy.max_bytes
+        assert remaining == ids[-len(remaining):]
+        assert result['blob_bytes'] > 6 * 64 * 1024
+        stats = capture.get_stats()['retention']
+        assert stats['runs'] == 1
+        assert stats['reclaimed_bytes'] == result['reclaimed_bytes']
+
+    @pytest.mark.unit
+    def test_incremental_vacuum_shrinks_database(self, capture):
+        """Test that free pages from deleted inline rows go back to the filesystem."""
+        for i in range(20):
+            capture.db.execute_write('''
+                INSERT INTO screenshots (timestamp, application, window_title, encrypted_data, file_hash)
+                VALUES (?, 'legacy.exe', 'Old', ?, 'hash')
+            ''', ((datetime.now() - timedelta(days=60)).isoformat(), os.urandom(32 * 1024)))
+        pages_before = capture.db.read_one('PRAGMA page_count')[0]
+
+        result = ScreenshotRetention(capture, _policy(max_age_days=30)).run_once()
+
+        assert capture.db.read_one('PRAGMA auto_vacuum')[0] == 2
+        assert result['vacuumed_bytes'] > 20 * 32 * 1024 * 0.9
+        assert capture.db.read_one('PRAGMA page_count')[0] < pages_before
+
+
+class TestLegacyDatabase:
+    """Test cases for databases created before incremental auto-vacuum."""
+
+    @pytest.fixture
+    def legacy_capture(self, temp_dir, temp_db_path, monkeypatch):
+        """A capture over a database without auto-vacuum, before its conversion has run."""
+        monkeypatch.chdir(temp_dir)
+        conn = sqlite3.connect(temp_db_path)
+        conn.execute('''
+            CREATE TABLE screenshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                application TEXT NOT NULL,
+                window_title TEXT,
+                encrypted_data BLOB NOT NULL,
+                file_hash TEXT NOT NULL
+            )
+        ''')
+        conn.close()
+        with patch.object(MigrationRunner, 'start'):
+            capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, dedup_threshold=-1)
+        yield capture
+        capture.close()
+
+    @pytest.mark.unit
+    def test_free_pages_do_not_count_against_the_budget(self, legacy_capture):
+        """Test that pages freed but never released don't make max_bytes delete every frame."""
+        capture = legacy_capture
+        assert capture.db.read_one('PRAGMA auto_vacuum')[0] == 0
+        assert capture.migrations.pending_backfills() == ['incremental_vacuum']
+        for i in range(40):
+            capture.db.execute_write('''
+                INSERT INTO screenshots (timestamp, application, window_title, encrypted_data, file_hash)
+                VALUES (?, 'legacy.exe', 'Old', ?, 'hash')
+            ''', ((datetime.now() - timedelta(days=60)).isoformat(), os.urandom(32 * 1024)))
+        ScreenshotRetention(capture, _policy(max_age_days=30)).run_once()
+        ids = _store(capture, 10, size=64 * 1024)
+
+        page_size, page_count, free_pages = (capture.db.read_one(f'PRAGMA {pragma}')[0]
+                                             for pragma in ('page_size', 'page_count', 'freelist_count'))
+        blob_bytes = capture.get_stats()['blob_store']['bytes']
+        retention = capture.retention
+        retention.policy, retention.batch_size = _policy(), 2
+        retention.policy.max_bytes = blob_bytes + (page_count - free_pages) * page_size - 3 * 64 * 1024
+        # The unreleased free pages alone are more than the whole budget
+        assert free_pages * page_size > retention.policy.max_bytes
+        retention.run_once()
+
+        assert _ids(capture) == ids[4:]
+        assert retention.disk_usage() <= retention.policy.max_bytes
+
+    @pytest.mark.unit
+    def test_conversion_lets_vacuum_release_pages(self, legacy_capture):
+        """Test that the queued conversion switches to incremental auto-vacuum and shrinks the file."""
+        capture = legacy_capture
+        for i in range(20):
+            capture.db.execute_write('''
+                INSERT INTO screenshots (timestamp, application, window_title, encrypted_data, file_hash)
+                VALUES (?, 'legacy.exe', 'Old', ?, 'hash')
+            ''', ((datetime.now() - timedelta(days=60)).isoformat(), os.urandom(32 * 1024)))
+        pages_before = capture.db.read_one('PRAGMA page_count')[0]
+
+        capture.migrations.run_backfills()
+        ScreenshotRetention(capture, _policy(max_age_days=30)).run_once()
+
+        assert capture.db.read_one('PRAGMA auto_vacuum')[0] == 2
+        assert capture.migrations.status()['backfills']['incremental_vacuum']['done']
+        assert capture.db.read_one('PRAGMA page_count')[0] < pages_before / 2
+
+
+class TestRetentionJob:
+    """Test cases for the background job."""
+
+    @pytest.mark.unit
+    def test_runs_in_background_until_stopped(self, capture):
+        """Test that the job applies the policy on its interval and stops promptly."""
+        _store(capture, 2, days_ago=10)
+        retention = ScreenshotRetention(capture, _policy(max_age_days=1), interval=0.01)
+
+        retention.start()
+        deadline = time.time() + 5
+        while retention.totals['runs'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        retention.stop()
+
+        assert retention.totals['deleted'] == 2
+        assert retention.thread is None
+        assert retention.run_once()['deleted'] == 0
+
+
+class TestRetentionEndpoint:
+    """Test cases for POST /screenshots/retention/run."""
+
+    @pytest.mark.unit
+    def test_run_now(self):
+        """Test that the endpoint runs the policy and returns its result."""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        try:
+            from routers import screenshot as screenshot_router
+        except ImportError as e:
+            pytest.skip(f"Screenshot router not available: {e}")
+        app = FastAPI()
+        app.include_router(screenshot_router.router, prefix="/screenshots")
+        result = {'deleted': 3, 'blob_bytes': 300, 'vacuumed_bytes': 4096, 'reclaimed_bytes': 4396}
+
+        with patch('routers.screenshot.run_screenshot_retention', return_value=result) as mock_run:
+            response = TestClient(app).post("/screenshots/retention/run")
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok", "result": result}
+        mock_run.assert_called_once()
@@ -0,0 +1,236 @@
+"""
+Test suite for screenshots.db schema migrations.
+
+This module tests versioning with PRAGMA user_version, transactional
+migrations, resumable background backfills and upgrading a database
+written before migrations existed.
+"""
+
+import pytest
+import os
+import sys
+import sqlite3
+from unittest.mock import patch
+from cryptography.fernet import Fernet
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.schema_migrations import MigrationRunner, add_columns, schedule_backfill
+    from services.screenshot_db import ScreenshotDatabase
+    from services.screenshot import ScreenshotCapture, MIGRATIONS, decode_cursor
+except ImportError as e:
+    pytest.skip(f"Schema migrations module not available: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def db(temp_db_path):
+    db = ScreenshotDatabase(temp_db_path)
+    yield db
+    db.close()
+
+
+def _create_items(conn):
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER)")
+    conn.executemany("INSERT INTO items (value) VALUES (?)", [(n,) for n in range(10)])
+
+def _add_doubled(conn):
+    add_columns(conn, 'items', [('doubled', 'INTEGER')])
+    schedule_backfill(conn, 'doubled')
+
+def _backfill_doubled(conn, cursor, batch_size):
+    ids = [row[0] for row in conn.execute("SELECT id FROM items WHERE id > ? ORDER BY id LIMIT ?",
+                                          (cursor, batch_size))]
+    if not ids:
+        return None, 0
+    conn.execute("UPDATE items SET doubled = value * 2 WHERE id > ? AND id <= ?", (cursor, ids[-1]))
+    return ids[-1], len(ids)
+
+ITEM_MIGRATIONS = [(1, "items", _create_items), (2, "doubled values", _add_doubled)]
+
+
+class TestMigrationRunner:
+    """Test cases for applying migrations and running backfills."""
+
+    @pytest.mark.unit
+    def test_applies_pending_migrations_once(self, db):
+        """Test that migrations run in order, bump user_version and are skipped when applied."""
+        runner = MigrationRunner(db, ITEM_MIGRATIONS[:1], {})
+        assert runner.migrate() == 1
+
+        runner = MigrationRunner(db, ITEM_MIGRATIONS, {'doubled': _backfill_doubled})
+        assert runner.migrate() == 2
+        assert runner.migrate() == 2
+
+        assert runner.version() == 2
+        assert db.read_one("SELECT COUNT(*) FROM items")[0] == 10
+        assert runner.pending_backfills() == ['doubled']
+
+    @pytest.mark.unit
+    def test_failed_migration_rolls_back(self, db):
+        """Test that a failing migration leaves neither its DDL nor a version bump behind."""
+        def broken(conn):
+            add_columns(conn, 'items', [('extra', 'TEXT')])
+            raise sqlite3.OperationalError("disk on fire")
+
+        runner = MigrationRunner(db, ITEM_MIGRATIONS[:1] + [(2, "broken", broken)], {})
+        with pytest.raises(sqlite3.OperationalError):
+            runner.migrate()
+
+        assert runner.version() == 1
+        assert 'extra' not in {row[1] for row in db.read("PRAGMA table_info(items)")}
+
+    @pytest.mark.unit
+    def test_newer_database_is_refused(self, db):
+        MigrationRunner(db, ITEM_MIGRATIONS, {'doubled': _backfill_doubled}).migrate()
+        with pytest.raises(RuntimeError):
+            MigrationRunner(db, ITEM_MIGRATIONS[:1], {}).migrate()
+
+    @pytest.mark.unit
+    def test_misnumbered_migrations(self, db):
+        with pytest.raises(ValueError):
+            MigrationRunner(db, [(2, "items", _create_items)], {})
+
+    @pytest.mark.unit
+    def test_backfill_resumes_after_restart(self, db, temp_db_path):
+        """Test that a stopped backfill continues from its committed cursor."""
+        runner = MigrationRunner(db, ITEM_MIGRATIONS, {'doubled': _backfill_doubled}, batch_size=4)
+        runner.migrate()
+        assert runner.run_batch()
+        db.close()
+
+        reopened = ScreenshotDatabase(temp_db_path)
+        try:
+            runner = MigrationRunner(reopened, ITEM_MIGRATIONS, {'doubled': _backfill_doubled}, batch_size=4)
+            runner.migrate()
+            runner.run_backfills()
+
+            assert reopened.read("SELECT COUNT(*) FROM items WHERE doubled = value * 2") == [(10,)]
+            assert runner.status()['backfills'] == {'doubled': {'rows': 10, 'done': True}}
+            assert runner.pending_backfills() == []
+            assert runner.run_batch() is False
+        finally:
+            reopened.close()
+
+    @pytest.mark.unit
+    def test_background_backfill(self, db):
+        """Test that start() finishes queued backfills on a background thread."""
+        runner = MigrationRunner(db, ITEM_MIGRATIONS, {'doubled': _backfill_doubled}, batch_size=3, pause=0)
+        runner.migrate()
+
+        runner.start()
+        runner.thread.join(timeout=5)
+
+        assert runner.pending_backfills() == []
+        assert db.read_one("SELECT COUNT(*) FROM items WHERE doubled IS NULL")[0] == 0
+
+
+class TestScreenshotMigrations:
+    """Test cases for the screenshots.db schema history."""
+
+    @pytest.mark.unit
+    def test_new_database_is_at_latest_version(self, temp_dir, temp_db_path, monkeypatch):
+        """Test that a new database gets every migration and queues no backfills."""
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0)
+        try:
+            status = capture.get_stats()['schema']
+            assert status['version'] == status['latest_version'] == len(MIGRATIONS)
+            assert status['backfills'] == {}
+            assert capture.migrations.thread is None
+        finally:
+            capture.close()
+
+    FRAMES = [b'frame-one', b'frame-two', b'frame-one']
+
+    @pytest.fixture
+    def first_release_db(self, temp_dir, temp_db_path, monkeypatch):
+        """A database as the first release wrote it: no version, payloads inline."""
+        monkeypatch.chdir(temp_dir)
+        key = Fernet.generate_key()
+        with open("screenshot_key.key", "wb") as f:
+            f.write(key)
+        conn = sqlite3.connect(temp_db_path)
+        conn.execute('''
+            CREATE TABLE screenshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, application TEXT NOT NULL,
+                window_title TEXT, encrypted_data BLOB NOT NULL, file_hash TEXT NOT NULL
+            )
+        ''')
+        conn.executemany('''
+            INSERT INTO screenshots (timestamp, application, window_title, encrypted_data, file_hash)
+            VALUES (?, 'game.exe', 'Game', ?, 'hash')
+        ''', [(f'2024-01-01T10:0{i}:00', Fernet(key).encrypt(frame)) for i, frame in enumerate(self.FRAMES)])
+        conn.commit()
+        conn.close()
+        return temp_db_path
+
+    @pytest.mark.unit
+    def test_unversioned_database_is_upgraded(self, first_release_db):
+        """Test that a first-release database gets new columns and its payloads moved in the background."""
+        capture = ScreenshotCapture(db_path=first_release_db, capture_workers=0)
+        try:
+            capture.migrations.stop()
+            capture.migrations.run_backfills()
+
+            status = capture.get_stats()['schema']
+            assert status['version'] == len(MIGRATIONS)
+            assert status['backfills'] == {'inline_payloads': {'rows': 3, 'done': True},
+                                           'screenshot_ts': {'rows': 3, 'done': True},
+                                           'incremental_vacuum': {'rows': 0, 'done': True}}
+            assert capture.db.read_one("PRAGMA auto_vacuum")[0] == 2
+            assert capture.db.read("SELECT COUNT(*) FROM screenshots WHERE ts IS NULL OR blob_hash IS NULL") == [(0,)]
+            assert capture.get_stats()['blob_store']['blobs'] == 2
+            assert [capture.get_screenshot_data(i) for i in (1, 2, 3)] == self.FRAMES
+            assert [row[0] for row in capture.get_screenshots(limit=10)] == [3, 2, 1]
+        finally:
+            capture.close()
+
+    @pytest.mark.unit
+    def test_timestamps_are_filled_before_payloads_move(self, first_release_db):
+        """Test that ts is backfilled first, and pages never hand out a cursor for a row without one."""
+        with patch.object(MigrationRunner, 'start'):
+            capture = ScreenshotCapture(db_path=first_release_db, capture_workers=0)
+        try:
+            assert capture.migrations.pending_backfills() == ['screenshot_ts', 'inline_payloads',
+                                                              'incremental_vacuum']
+            assert capture.get_screenshot_page(limit=2)['next_cursor'] is None
+
+            while capture.migrations.pending_backfills()[0] == 'screenshot_ts':
+                capture.migrations.run_batch()
+            assert capture.migrations.pending_backfills() == ['inline_payloads', 'incremental_vacuum']
+            page = capture.get_screenshot_page(limit=2, start_date='2024-01-01T10:00:00')
+            assert [row[0] for row in page['screenshots']] == [3, 2]
+            decode_cursor(page['next_cursor'])
+        finally:
+            capture.close()
+
+    @pytest.mark.unit
+    def test_failed_payload_batch_leaves_no_files(self, first_release_db):
+        """Test that blob files written by a rolled-back backfill batch are removed again."""
+        with patch.object(MigrationRunner, 'start'):
+            capture = ScreenshotCapture(db_path=first_release_db, capture_workers=0)
+        try:
+            while capture.migrations.pending_backfills()[0] == 'screenshot_ts':
+                capture.migrations.run_batch()
+            write = capture.db.write
+
+            def failing_write(func):
+                def fail_after(conn):
+                    func(conn)
+                    raise sqlite3.OperationalError("disk I/O error")
+                return write(fail_after)
+
+            with patch.object(capture.db, 'write', failing_write), pytest.raises(sqlite3.OperationalError):
+                capture.migrations.run_batch()
+
+            assert [name for directory, _, names in os.walk(capture.blobs.root)
+                    if directory != capture.blobs.root for name in names] == []
+            assert capture.db.read("SELECT COUNT(*) FROM screenshots WHERE blob_hash IS NULL") == [(3,)]
+            capture.migrations.run_backfills()
+            assert [capture.get_screenshot_data(i) for i in (1, 2, 3)] == self.FRAMES
+        finally:
+            capture.close()
@@ -10,6 +10,7 @@ import os
 import sys
 import sqlite3
 import tempfile
+import time
 import shutil
 from unittest.mock import Mock, patch, MagicMock
 from cryptography.fernet import Fernet as RealFernet
@@ -34,14 +35,26 @@ except ImportError as e:
     pytest.skip(f"Screenshot module not available: {e}", allow_module_level=True)
 
 
+def _gradient_png(reverse=False):
+    """PNG of a horizontal gradient; reversing it makes a visibly different frame."""
+    import io
+    from PIL import Image
+    image = Image.linear_gradient('L').transpose(Image.Transpose.ROTATE_90)
+    if reverse:
+        image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    buffer = io.BytesIO()
+    image.resize((320, 180)).convert('RGB').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
 class TestScreenshotCapture:
     """Test cases for the ScreenshotCapture class."""
     
     @pytest.mark.unit
     def test_screenshot_capture_init(self, temp_dir, temp_db_path):
         """Test ScreenshotCapture initialization."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=b'test_key'):
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=b'test_key'):
             
             capture = ScreenshotCapture(db_path=temp_db_path, interval=60)
             
@@ -60,7 +73,7 @@ class TestScreenshotCapture:
         with open(key_file, "wb") as f:
             f.write(test_key)
         
-        with patch('backend.screenshot.Fernet') as mock_fernet:
+        with patch('services.screenshot.Fernet') as mock_fernet:
             # Change working directory so production code finds the key
             cwd = os.getcwd()
             try:
@@ -73,8 +86,8 @@ class TestScreenshotCapture:
     @pytest.mark.unit
     def test_get_or_create_key_new(self, temp_dir):
         """Test creating new encryption key."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=b'new_key'):
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=b'new_key'):
             
             # Change working directory so production code writes key into temp_dir
             cwd = os.getcwd()
@@ -92,8 +105,8 @@ class TestScreenshotCapture:
     @pytest.mark.unit
     def test_init_database(self, temp_dir, temp_db_path):
         """Test database initialization."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             capture = ScreenshotCapture(db_path=temp_db_path)
             
             # Verify database was created
@@ -114,52 +127,61 @@ class TestScreenshotCapture:
             conn.close()
     
     @pytest.mark.unit
-    def test_get_active_window_info_success(self, mock_win32gui):
+    def test_get_active_window_info_success(self, temp_db_path, mock_win32gui):
         """Test getting active window information successfully."""
         with patch('psutil.Process') as mock_process:
             mock_process.return_value.name.return_value = 'test_app.exe'
             
-            capture = ScreenshotCapture()
+            capture = ScreenshotCapture(db_path=temp_db_path)
             window_info = capture._get_active_window_info()
+            capture.close()
             
             assert window_info['application'] == 'test_app.exe'
             assert window_info['window_title'] == 'Test Window'
             assert window_info['pid'] == 12345
     
     @pytest.mark.unit
-    def test_get_active_window_info_error(self):
+    def test_get_active_window_info_error(self, temp_db_path, mock_win32gui):
         """Test getting active window information with error."""
-        with patch('win32gui.GetForegroundWindow', side_effect=Exception("Window error")):
-            capture = ScreenshotCapture()
-            window_info = capture._get_active_window_info()
-            
-            assert window_info['application'] == 'Unknown'
-            assert window_info['window_title'] == 'Unknown'
-            assert window_info['pid'] == 0
+        mock_win32gui.GetForegroundWindow.side_effect = Exception("Window error")
+        capture = ScreenshotCapture(db_path=temp_db_path)
+        window_info = capture._get_active_window_info()
+        capture.close()
+        
+        assert window_info['application'] == 'Unknown'
+        assert window_info['window_title'] == 'Unknown'
+        assert window_info['pid'] == 0
     
     @pytest.mark.unit
-    def test_capture_screenshot_success(self, mock_pil_imagegrab):
-        """Test successful screenshot capture."""
-        capture = ScreenshotCapture()
-        img_data = capture._capture_screenshot()
+    def test_capture_screenshot_success(self, temp_dir, temp_db_path):
+        """Test successful screenshot capture (encoded in a worker process)."""
+        from PIL import Image
+        with patch('PIL.ImageGrab.grab', return_value=Image.new('RGB', (64, 48), color='red')):
+            capture = ScreenshotCapture(db_path=temp_db_path)
+            frame_info = {}
+            img_data = capture._capture_screenshot(frame_info)
+            capture.close()
         
         assert img_data is not None
         assert isinstance(img_data, bytes)
+        assert frame_info['encode_ms'] >= 0
+        assert 'phash' in frame_info
     
     @pytest.mark.unit
-    def test_capture_screenshot_error(self):
+    def test_capture_screenshot_error(self, temp_db_path):
         """Test screenshot capture with error."""
         with patch('PIL.ImageGrab.grab', side_effect=Exception("Capture error")):
-            capture = ScreenshotCapture()
+            capture = ScreenshotCapture(db_path=temp_db_path)
             img_data = capture._capture_screenshot()
+            capture.close()
             
             assert img_data is None
     
     @pytest.mark.unit
     def test_encrypt_decrypt_data(self, temp_dir, temp_db_path):
         """Test data encryption and decryption."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             mock_cipher = Mock()
             mock_cipher.encrypt.return_value = b'encrypted_data'
             mock_cipher.decrypt.return_value = b'original_data'
@@ -168,19 +190,22 @@ class TestScreenshotCapture:
             capture = ScreenshotCapture(db_path=temp_db_path)
             test_data = b'test_data'
             
+            # New payloads use the AES-GCM format; Fernet tokens from older versions still decrypt
             encrypted = capture._encrypt_data(test_data)
             decrypted = capture._decrypt_data(encrypted)
+            legacy = capture._decrypt_data(b'gAAAAABlegacy-token')
             
-            assert encrypted == b'encrypted_data'
-            assert decrypted == b'original_data'
-            mock_cipher.encrypt.assert_called_once_with(test_data)
-            mock_cipher.decrypt.assert_called_once_with(b'encrypted_data')
+            assert encrypted != test_data
+            assert decrypted == test_data
+            assert legacy == b'original_data'
+            mock_cipher.encrypt.assert_not_called()
+            mock_cipher.decrypt.assert_called_once_with(b'gAAAAABlegacy-token')
     
     @pytest.mark.unit
     def test_calculate_hash(self, temp_dir, temp_db_path):
         """Test hash calculation."""
-        with patch('backend.screenshot.Fernet'), \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet'), \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             capture = ScreenshotCapture(db_path=temp_db_path)
             test_data = b'test_data'
             
@@ -194,8 +219,8 @@ class TestScreenshotCapture:
     @pytest.mark.unit
     def test_save_screenshot_success(self, temp_dir, temp_db_path, mock_screenshot_data):
         """Test successful screenshot saving."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             mock_cipher = Mock()
             mock_cipher.encrypt.return_value = b'encrypted_data'
             mock_fernet.return_value = mock_cipher
@@ -214,21 +239,24 @@ class TestScreenshotCapture:
             count = cursor.fetchone()[0]
             assert count == 1
             
-            # Verify saved data
-            cursor.execute("SELECT application, window_title, encrypted_data, file_hash FROM screenshots")
+            # Verify saved data (the encrypted payload goes to the blob store)
+            cursor.execute("SELECT application, window_title, blob_hash, file_hash FROM screenshots")
             row = cursor.fetchone()
             assert row[0] == 'test_app.exe'
             assert row[1] == 'Test Application'
-            assert row[2] == b'encrypted_data'
-            assert row[3] is not None
+            assert row[2] == row[3]
+            cursor.execute("SELECT key_id, file FROM blobs")
+            key_id, file = cursor.fetchone()
+            assert capture._decrypt_data(capture.blobs.read(row[2], file)) == mock_screenshot_data['image_data']
+            assert key_id == capture.keyring.active
             
             conn.close()
     
     @pytest.mark.unit
     def test_save_screenshot_no_data(self, temp_dir, temp_db_path):
         """Test saving screenshot with no image data."""
-        with patch('backend.screenshot.Fernet'), \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet'), \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             capture = ScreenshotCapture(db_path=temp_db_path)
             window_info = {'application': 'test.exe', 'window_title': 'Test'}
             
@@ -239,8 +267,8 @@ class TestScreenshotCapture:
     @pytest.mark.unit
     def test_save_screenshot_error(self, temp_dir, temp_db_path, mock_screenshot_data):
         """Test saving screenshot with database error."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             
             mock_cipher = Mock()
             mock_cipher.encrypt.return_value = b'encrypted_data'
@@ -250,7 +278,7 @@ class TestScreenshotCapture:
             window_info = mock_screenshot_data['window_info']
             
             # Trigger DB error when saving
-            with patch('sqlite3.connect', side_effect=Exception("DB Error")):
+            with patch.object(capture.db, 'write', side_effect=Exception("DB Error")):
                 result = capture.save_screenshot(mock_screenshot_data['image_data'], window_info)
             
             assert result is False
@@ -258,8 +286,8 @@ class TestScreenshotCapture:
     @pytest.mark.unit
     def test_capture_and_save(self, temp_dir, temp_db_path, mock_screenshot_data):
         """Test capture and save functionality."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()), \
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()), \
              patch.object(ScreenshotCapture, '_get_active_window_info', 
                          return_value=mock_screenshot_data['window_info']), \
              patch.object(ScreenshotCapture, '_capture_screenshot', 
@@ -283,8 +311,8 @@ class TestScreenshotCapture:
     @pytest.mark.unit
     def test_start_capture(self, temp_dir, temp_db_path):
         """Test starting screenshot capture."""
-        with patch('backend.screenshot.Fernet'), \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()), \
+        with patch('services.screenshot.Fernet'), \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()), \
              patch('threading.Thread') as mock_thread:
             
             capture = ScreenshotCapture(db_path=temp_db_path)
@@ -296,8 +324,8 @@ class TestScreenshotCapture:
     @pytest.mark.unit
     def test_stop_capture(self, temp_dir, temp_db_path):
         """Test stopping screenshot capture."""
-        with patch('backend.screenshot.Fernet'), \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet'), \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             capture = ScreenshotCapture(db_path=temp_db_path)
             capture.running = True
             capture.thread = Mock()
@@ -311,8 +339,8 @@ class TestScreenshotCapture:
     @pytest.mark.unit
     def test_get_screenshots_with_filters(self, temp_dir, temp_db_path, mock_screenshot_records):
         """Test getting screenshots with various filters."""
-        with patch('backend.screenshot.Fernet'), \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet'), \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             capture = ScreenshotCapture(db_path=temp_db_path)
             
             # Insert test data
@@ -346,8 +374,8 @@ class TestScreenshotCapture:
     @pytest.mark.unit
     def test_get_screenshot_data(self, temp_dir, temp_db_path):
         """Test getting screenshot data by ID."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             mock_cipher = Mock()
             mock_cipher.decrypt.return_value = b'decrypted_image_data'
             mock_fernet.return_value = mock_cipher
@@ -376,8 +404,8 @@ class TestScreenshotCapture:
     @pytest.mark.unit
     def test_get_stats(self, temp_dir, temp_db_path, mock_screenshot_records):
         """Test getting screenshot statistics."""
-        with patch('backend.screenshot.Fernet'), \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet'), \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             capture = ScreenshotCapture(db_path=temp_db_path)
             
             # Insert test data
@@ -409,14 +437,639 @@ class TestScreenshotCapture:
             _c.close()
 
 
+class TestFrameCache:
+    """Test cases for the decrypted frame LRU."""
+
+    @pytest.fixture
+    def capture(self, temp_dir, temp_db_path, monkeypatch, mock_screenshot_data):
+        """Create a capture with three stored frames and a two-frame cache."""
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=temp_db_path, frame_cache_size=2)
+        for _ in range(3):
+            capture.save_screenshot(mock_screenshot_data['image_data'], mock_screenshot_data['window_info'])
+        return capture
+
+    @pytest.mark.unit
+    def test_repeated_reads_skip_decrypt(self, capture, mock_screenshot_data):
+        """Test that a cached frame is returned without decrypting again."""
+        with patch.object(capture, '_decrypt_data', wraps=capture._decrypt_data) as mock_decrypt:
+            first = capture.get_screenshot_data(1)
+            second = capture.get_screenshot_data(1)
+
+        assert first == second == mock_screenshot_data['image_data']
+        assert mock_decrypt.call_count == 1
+
+    @pytest.mark.unit
+    def test_least_recently_used_frame_evicted(self, capture):
+        """Test that the cache keeps only the most recently used frames."""
+        capture.get_screenshot_data(1)
+        capture.get_screenshot_data(2)
+        capture.get_screenshot_data(1)
+        capture.get_screenshot_data(3)
+
+        assert list(capture._frame_cache) == [1, 3]
+
+    @pytest.mark.unit
+    def test_delete_invalidates_cached_frame(self, capture):
+        """Test that a deleted screenshot is no longer served from the cache."""
+        assert capture.get_screenshot_data(1) is not None
+
+        assert capture.delete_screenshot(1) is True
+
+        assert capture.get_screenshot_data(1) is None
+
+
+class TestCaptureSettings:
+    """Test cases for the capture codec, downscaling and color depth settings."""
+
+    @pytest.fixture
+    def frame(self):
+        """A 4K grabbed frame."""
+        from PIL import Image
+        frame = Image.linear_gradient('L').resize((3840, 2160)).convert('RGB')
+        with patch('PIL.ImageGrab.grab', return_value=frame):
+            yield frame
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('fmt,pil_format', [('png', 'PNG'), ('jpeg', 'JPEG'), ('webp', 'WEBP')])
+    def test_codec_setting(self, frame, temp_dir, temp_db_path, fmt, pil_format):
+        """Test that frames are stored in the configured format."""
+        import io
+        from PIL import Image
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0,
+                                    capture_settings={'fmt': fmt, 'max_dim': 320})
+        img_data = capture._capture_screenshot()
+        capture.close()
+
+        assert Image.open(io.BytesIO(img_data)).format == pil_format
+
+    @pytest.mark.unit
+    def test_downscale_and_grayscale(self, frame, temp_dir, temp_db_path):
+        """Test the max dimension and color depth settings."""
+        import io
+        from PIL import Image
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0,
+                                    capture_settings={'fmt': 'png', 'max_dim': 1280, 'colors': 'gray'})
+        image = Image.open(io.BytesIO(capture._capture_screenshot()))
+        capture.close()
+
+        assert image.size == (1280, 720)
+        assert image.mode == 'L'
+
+    @pytest.mark.unit
+    def test_encode_time_and_size_recorded(self, frame, temp_dir, temp_db_path, monkeypatch):
+        """Test that each stored frame records its format, size and encode time."""
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0,
+                                    capture_settings={'fmt': 'jpeg', 'max_dim': 640})
+        with patch.object(capture, '_get_active_window_info',
+                          return_value={'application': 'game.exe', 'window_title': 'Game', 'pid': 1}):
+            capture.capture_and_save()
+
+        encoding = capture.get_stats()['encoding']
+        capture.close()
+
+        assert len(encoding) == 1
+        assert encoding[0]['mime_type'] == 'image/jpeg'
+        assert encoding[0]['frames'] == 1
+        assert encoding[0]['avg_bytes'] > 0
+        assert encoding[0]['avg_encode_ms'] is not None
+
+
+class TestThumbnails:
+    """Test cases for gallery thumbnails."""
+
+    WINDOW = {'application': 'game.exe', 'window_title': 'Game', 'pid': 1}
+
+    @pytest.fixture
+    def capture(self, temp_dir, temp_db_path, monkeypatch):
+        """A real capture in a temporary directory."""
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0)
+        yield capture
+        capture.close()
+
+    def _size(self, jpeg):
+        import io
+        from PIL import Image
+        return Image.open(io.BytesIO(jpeg)).size
+
+    @pytest.mark.unit
+    def test_thumbnail_made_at_capture(self, capture):
+        """Test that a captured frame stores a small encrypted thumbnail."""
+        from PIL import Image
+        frame = Image.linear_gradient('L').resize((3840, 2160)).convert('RGB')
+        with patch('PIL.ImageGrab.grab', return_value=frame), \
+             patch.object(capture, '_get_active_window_info', return_value=self.WINDOW):
+            capture.capture_and_save()
+
+        stored = capture.db.read_one('SELECT encrypted_thumbnail FROM screenshots WHERE id = 1')[0]
+        thumbnail = capture.get_thumbnail(1)
+        assert stored and stored != thumbnail
+        assert self._size(thumbnail) == (256, 144)
+        assert len(thumbnail) < 20 * 1024
+
+    @pytest.mark.unit
+    def test_reference_uses_original_thumbnail(self, capture):
+        """Test that near-duplicates serve the thumbnail of the frame they reference."""
+        frame = _gradient_png()
+        capture.save_screenshot(frame, self.WINDOW)
+        capture.save_screenshot(frame, self.WINDOW)
+
+        assert capture.get_thumbnail(2) == capture.get_thumbnail(1)
+
+    @pytest.mark.unit
+    def test_missing_thumbnail_backfilled(self, capture):
+        """Test that rows stored without a thumbnail get one on first request."""
+        capture.save_screenshot(_gradient_png(), self.WINDOW)
+        capture.db.execute_write('UPDATE screenshots SET encrypted_thumbnail = NULL')
+
+        assert self._size(capture.get_thumbnail(1)) == (256, 144)
+        assert capture.db.read_one('SELECT encrypted_thumbnail FROM screenshots WHERE id = 1')[0]
+        assert capture.get_thumbnail(999) is None
+
+    @pytest.mark.unit
+    def test_thumbnail_endpoint(self):
+        """Test the thumbnail route's content type, caching and 404."""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        try:
+            from routers import screenshot as screenshot_router
+        except ImportError as e:
+            pytest.skip(f"Screenshot router not available: {e}")
+        app = FastAPI()
+        app.include_router(screenshot_router.router, prefix="/screenshots")
+        client = TestClient(app)
+
+        with patch('routers.screenshot.get_screenshot_thumbnail', side_effect=[b'jpeg', None]):
+            found = client.get("/screenshots/7/thumbnail")
+            missing = client.get("/screenshots/8/thumbnail")
+
+        assert found.status_code == 200
+        assert found.content == b'jpeg'
+        assert found.headers['content-type'] == 'image/jpeg'
+        assert 'max-age' in found.headers['cache-control']
+        assert missing.status_code == 404
+
+
+class TestImageEndpoint:
+    """Test cases for GET /screenshots/{id}/image."""
+
+    DATA = bytes(range(256)) * 4
+    INFO = {'file_hash': 'abc123', 'mime_type': 'image/jpeg', 'byte_size': 1024}
+
+    @pytest.fixture
+    def client(self):
+        """Create a test client with only the screenshot router mounted."""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        try:
+            from routers import screenshot as screenshot_router
+        except ImportError as e:
+            pytest.skip(f"Screenshot router not available: {e}")
+        app = FastAPI()
+        app.include_router(screenshot_router.router, prefix="/screenshots")
+        # Ranges are streamed from their offset, in pieces that don't line up with them
+        stream = lambda screenshot_id, offset=0: iter([self.DATA[offset:offset + 100], self.DATA[offset + 100:]])
+        with patch('routers.screenshot.get_screenshot_image_info', return_value=self.INFO), \
+             patch('routers.screenshot.get_screenshot_by_id', return_value=self.DATA) as mock_get, \
+             patch('routers.screenshot.stream_screenshot_by_id', side_effect=stream) as mock_stream:
+            yield TestClient(app), mock_get, mock_stream
+
+    @pytest.mark.unit
+    def test_raw_bytes_with_validators(self, client):
+        """Test that the image is returned as bytes with its type, ETag and caching headers."""
+        client, _, _ = client
+        response = client.get("/screenshots/1/image")
+
+        assert response.status_code == 200
+        assert response.content == self.DATA
+        assert response.headers['content-type'] == 'image/jpeg'
+        assert response.headers['etag'] == '"abc123"'
+        assert 'immutable' in response.headers['cache-control']
+        assert response.headers['accept-ranges'] == 'bytes'
+
+    @pytest.mark.unit
+    def test_matching_etag_is_not_modified(self, client):
+        """Test that a revalidation gets a 304 without decrypting the frame."""
+        client, mock_get, _ = client
+        response = client.get("/screenshots/1/image", headers={"If-None-Match": 'W/"other", "abc123"'})
+
+        assert response.status_code == 304
+        assert response.content == b''
+        mock_get.assert_not_called()
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('range_header,start,end', [
+        ('bytes=0-99', 0, 99),
+        ('bytes=1000-', 1000, 1023),
+        ('bytes=-24', 1000, 1023),
+        ('bytes=1000-5000', 1000, 1023),
+    ])
+    def test_range_is_partial_content(self, client, range_header, start, end):
+        """Test single byte ranges, decrypted from their start instead of as the whole frame."""
+        client, mock_get, mock_stream = client
+        response = client.get("/screenshots/1/image", headers={"Range": range_header})
+
+        assert response.status_code == 206
+        assert response.content == self.DATA[start:end + 1]
+        assert response.headers['content-range'] == f'bytes {start}-{end}/1024'
+        assert response.headers['content-length'] == str(end + 1 - start)
+        mock_stream.assert_called_once_with(1, start)
+        mock_get.assert_not_called()
+
+    @pytest.mark.unit
+    def test_range_of_row_without_size(self, client):
+        """Test that rows stored before sizes were recorded are decrypted whole to serve a range."""
+        client, mock_get, mock_stream = client
+        info = {'file_hash': 'abc123', 'mime_type': None, 'byte_size': None}
+        with patch('routers.screenshot.get_screenshot_image_info', return_value=info):
+            response = client.get("/screenshots/1/image", headers={"Range": "bytes=0-9"})
+
+        assert response.status_code == 206
+        assert response.content == self.DATA[:10]
+        assert response.headers['content-range'] == 'bytes 0-9/1024'
+        mock_get.assert_called_once_with(1)
+        mock_stream.assert_not_called()
+
+    @pytest.mark.unit
+    def test_unsatisfiable_range(self, client):
+        """Test that a range past the end is rejected with 416."""
+        client, _, _ = client
+        response = client.get("/screenshots/1/image", headers={"Range": "bytes=2048-"})
+
+        assert response.status_code == 416
+        assert response.headers['content-range'] == 'bytes */1024'
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('headers', [
+        {"Range": "bytes=0-9", "If-Range": '"stale"'},
+        {"Range": "bytes=0-9,20-29"},
+        {"Range": "items=0-9"},
+    ])
+    def test_ignored_range_serves_full_image(self, client, headers):
+        """Test that stale If-Range, multiple ranges and other units get the whole image."""
+        client, _, _ = client
+        response = client.get("/screenshots/1/image", headers=headers)
+
+        assert response.status_code == 200
+        assert response.content == self.DATA
+
+    @pytest.mark.unit
+    def test_unknown_screenshot(self, client):
+        """Test 404 for a missing screenshot."""
+        client, _, _ = client
+        with patch('routers.screenshot.get_screenshot_image_info', return_value=None):
+            assert client.get("/screenshots/9/image").status_code == 404
+
+    @pytest.mark.unit
+    def test_reference_serves_original_hash(self, temp_dir, temp_db_path, monkeypatch):
+        """Test that a near-duplicate's validators describe the image it actually serves."""
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0)
+        window = {'application': 'game.exe', 'window_title': 'Game', 'pid': 1}
+        frame = _gradient_png()
+        capture.save_screenshot(frame, window)
+        capture.save_screenshot(frame, window)
+        capture.db.execute_write("UPDATE screenshots SET file_hash = 'own' WHERE id = 2")
+
+        info = capture.get_image_info(2)
+        capture.close()
+
+        assert info['file_hash'] == capture._calculate_hash(frame)
+        assert info['mime_type'] == 'image/png'
+        assert info['byte_size'] == len(frame)
+
+    @pytest.mark.unit
+    def test_stream_stored_frame_from_offset(self, temp_dir, temp_db_path, monkeypatch):
+        """Test that a stored frame decrypts from an offset, from its blob and from the frame cache."""
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0)
+        capture.crypto.chunk_size = 256
+        window = {'application': 'game.exe', 'window_title': 'Game', 'pid': 1}
+        frame = _gradient_png()
+        capture.save_screenshot(frame, window)
+        offset = len(frame) // 2
+        try:
+            streamed = b''.join(capture.stream_screenshot_data(1, offset))
+            capture.get_screenshot_data(1)
+            cached = b''.join(capture.stream_screenshot_data(1, offset))
+            missing = capture.stream_screenshot_data(9)
+        finally:
+            capture.close()
+
+        assert len(frame) > 2 * 256
+        assert streamed == cached == frame[offset:]
+        assert missing is None
+
+
+class TestDeduplication:
+    """Test cases for perceptual-hash deduplication of near-identical frames."""
+
+    WINDOW = {'application': 'game.exe', 'window_title': 'Paused', 'pid': 1}
+
+    @pytest.fixture
+    def make_capture(self, temp_dir, temp_db_path, monkeypatch):
+        """Build captures on a shared database, closing them afterwards."""
+        monkeypatch.chdir(temp_dir)
+        captures = []
+
+        def make(**kwargs):
+            capture = ScreenshotCapture(db_path=temp_db_path, **kwargs)
+            captures.append(capture)
+            return capture
+
+        yield make
+        for capture in captures:
+            capture.close()
+
+    def _rows(self, temp_db_path):
+        conn = sqlite3.connect(temp_db_path)
+        rows = conn.execute("SELECT id, length(encrypted_data), ref_id FROM screenshots ORDER BY id").fetchall()
+        conn.close()
+        return rows
+
+    @pytest.mark.unit
+    def test_near_duplicate_stored_as_reference(self, make_capture, temp_db_path):
+        """Test that a repeated frame borrows the earlier frame's data."""
+        capture = make_capture(dedup_mode='reference')
+        frame = _gradient_png()
+
+        assert capture.save_screenshot(frame, self.WINDOW) is True
+        assert capture.save_screenshot(frame, self.WINDOW) is True
+
+        rows = self._rows(temp_db_path)
+        assert rows[1][1:] == (0, 1)
+        assert capture.get_screenshot_data(2) == frame
+        assert capture.get_stats()['deduplication']['referenced'] == 1
+
+    @pytest.mark.unit
+    def test_near_duplicate_skipped(self, make_capture, temp_db_path):
+        """Test that skip mode stores nothing for a repeated frame and reports the skip rate."""
+        capture = make_capture(dedup_mode='skip')
+        frame = _gradient_png()
+
+        capture.save_screenshot(frame, self.WINDOW)
+        capture.save_screenshot(frame, self.WINDOW)
+
+        assert len(self._rows(temp_db_path)) == 1
+        dedup = capture.get_stats()['deduplication']
+        assert dedup['skipped'] == 1
+        assert dedup['skip_rate'] == 0.5
+
+    @pytest.mark.unit
+    def test_different_frame_stored_in_full(self, make_capture, temp_db_path):
+        """Test that frames outside the Hamming threshold are not deduplicated."""
+        capture = make_capture()
+
+        capture.save_screenshot(_gradient_png(), self.WINDOW)
+        capture.save_screenshot(_gradient_png(reverse=True), self.WINDOW)
+
+        assert [row[2] for row in self._rows(temp_db_path)] == [None, None]
+
+    @pytest.mark.unit
+    def test_negative_threshold_disables(self, make_capture, temp_db_path):
+        """Test that dedup_threshold=-1 stores every frame."""
+        capture = make_capture(dedup_threshold=-1)
+        frame = _gradient_png()
+
+        capture.save_screenshot(frame, self.WINDOW)
+        capture.save_screenshot(frame, self.WINDOW)
+
+        assert [row[2] for row in self._rows(temp_db_path)] == [None, None]
+
+    @pytest.mark.unit
+    def test_deleting_original_promotes_reference(self, make_capture, temp_db_path):
+        """Test that references survive deletion of the frame they point at."""
+        capture = make_capture()
+        frame = _gradient_png()
+        for _ in range(3):
+            capture.save_screenshot(frame, self.WINDOW)
+
+        assert capture.delete_screenshot(1) is True
+
+        assert [row[2] for row in self._rows(temp_db_path)] == [None, 2]
+        assert capture.get_screenshot_data(3) == frame
+        capture.save_screenshot(frame, self.WINDOW)
+        assert self._rows(temp_db_path)[-1][2] == 2
+
+    @pytest.mark.unit
+    def test_original_deleted_before_write_stores_in_full(self, make_capture, temp_db_path):
+        """Test that a duplicate whose original is deleted before its write is stored as a normal frame."""
+        capture = make_capture()
+        frame = _gradient_png()
+        capture.save_screenshot(frame, self.WINDOW)
+        find_duplicate = capture._find_duplicate
+
+        def find_then_delete(phash):
+            duplicate_of = find_duplicate(phash)
+            capture.delete_screenshot(duplicate_of)
+            return duplicate_of
+
+        with patch.object(capture, '_find_duplicate', find_then_delete):
+            assert capture.save_screenshot(frame, self.WINDOW) is True
+
+        rows = self._rows(temp_db_path)
+        assert [(row[0], row[2]) for row in rows] == [(2, None)]
+        assert capture.get_screenshot_data(2) == frame
+        assert capture.get_stats()['blob_store']['blobs'] == 1
+
+    @pytest.mark.unit
+    def test_window_survives_restart(self, make_capture, temp_db_path):
+        """Test that recent hashes are reloaded from the database."""
+        frame = _gradient_png()
+        first = make_capture()
+        first.save_screenshot(frame, self.WINDOW)
+        first.close()
+
+        make_capture().save_screenshot(frame, self.WINDOW)
+
+        assert self._rows(temp_db_path)[-1][2] == 1
+
+
+class TestCaptureLoop:
+    """Test cases for the monotonic, event-driven capture loop."""
+
+    WINDOW = {'application': 'eldenring.exe', 'window_title': 'ELDEN RING', 'pid': 7}
+
+    @pytest.fixture
+    def capture(self, temp_dir, temp_db_path, monkeypatch):
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0)
+        yield capture
+        capture.close()
+
+    def _run(self, capture, seconds):
+        capture.start_capture()
+        time.sleep(seconds)
+        capture.stop_capture()
+
+    @pytest.mark.unit
+    def test_stop_does_not_wait_for_interval(self, capture):
+        """Test that stopping interrupts the wait between captures."""
+        capture.interval = 60
+        with patch.object(ScreenshotCapture, 'capture_and_save',
+                          return_value={'window_info': self.WINDOW, 'static': False}) as mock_capture:
+            capture.start_capture()
+            time.sleep(0.05)
+            started = time.monotonic()
+            capture.stop_capture()
+
+        assert time.monotonic() - started < 1
+        assert mock_capture.call_count == 1
+
+    @pytest.mark.unit
+    def test_period_does_not_drift_with_capture_cost(self, capture):
+        """Test that slow captures don't stretch the period."""
+        capture.interval = 0.1
+        capture.schedule.min_interval = capture.schedule.max_interval = 0.1
+        started = []
+
+        def slow_capture():
+            started.append(time.monotonic())
+            time.sleep(0.06)
+            return {'window_info': self.WINDOW, 'static': False}
+
+        with patch.object(ScreenshotCapture, 'capture_and_save', side_effect=slow_capture):
+            self._run(capture, 1.0)
+
+        periods = [b - a for a, b in zip(started, started[1:])]
+        assert len(started) >= 8
+        assert sum(periods) / len(periods) == pytest.approx(0.1, abs=0.02)
+
+    @pytest.mark.unit
+    def test_window_switch_and_static_frames_change_rate(self, capture):
+        """Test that the loop feeds window, game and duplicate information to the schedule."""
+        capture.schedule.interval = 30
+        game = capture.capture_and_save
+        with patch.object(ScreenshotCapture, '_get_active_window_info', return_value=self.WINDOW), \
+             patch.object(ScreenshotCapture, '_capture_screenshot', return_value=_gradient_png()):
+            assert capture._next_delay(game()) == 30
+            assert capture._next_delay(game()) > 30
+            assert capture.get_stats()['schedule']['reason'] == 'static'
+
+        browser = {'application': 'chrome.exe', 'window_title': 'Guide', 'pid': 8}
+        assert capture._next_delay({'window_info': browser, 'static': False}) == capture.schedule.min_interval
+        assert capture.get_stats()['schedule']['reason'] == 'switch'
+
+
+class TestPagination:
+    """Test cases for integer timestamps and keyset pagination."""
+
+    @pytest.fixture
+    def capture(self, temp_dir, temp_db_path, monkeypatch):
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0)
+        yield capture
+        capture.close()
+
+    def _insert(self, temp_db_path, rows):
+        """Insert (timestamp, application) rows the way older versions did, without ts."""
+        conn = sqlite3.connect(temp_db_path)
+        conn.executemany('''
+            INSERT INTO screenshots (timestamp, application, window_title, encrypted_data, file_hash)
+            VALUES (?, ?, 'Window', X'', 'hash')
+        ''', rows)
+        conn.commit()
+        conn.close()
+
+    @pytest.mark.unit
+    def test_pages_cover_every_row_once(self, capture, temp_db_path):
+        """Test that following next_cursor visits every row newest first, including timestamp ties."""
+        self._insert(temp_db_path, [(f'2024-01-01T10:{i // 3:02d}:00', 'game.exe' if i % 2 else 'chrome.exe')
+                                    for i in range(25)])
+        seen, cursor = [], None
+        while True:
+            page = capture.get_screenshot_page(limit=10, cursor=cursor)
+            seen.extend(row[0] for row in page['screenshots'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        assert seen == sorted(seen, key=lambda i: ((i - 1) // 3, i), reverse=True)
+        assert len(seen) == len(set(seen)) == 25
+
+        first = capture.get_screenshot_page(limit=5, application='game.exe')
+        second = capture.get_screenshot_page(limit=5, application='game.exe', cursor=first['next_cursor'])
+        rows = first['screenshots'] + second['screenshots']
+        assert [row[0] for row in rows] == [24, 22, 20, 18, 16, 14, 12, 10, 8, 6]
+        assert all(row[2] == 'game.exe' for row in rows)
+        with pytest.raises(ValueError):
+            capture.get_screenshot_page(cursor='not-a-cursor')
+
+    @pytest.mark.unit
+    def test_ts_follows_timestamp(self, capture, temp_db_path):
+        """Test that saved frames, rows written without ts and edited timestamps all get epoch milliseconds."""
+        capture.save_screenshot(_gradient_png(), {'application': 'game.exe', 'window_title': 'Game', 'pid': 1})
+        self._insert(temp_db_path, [('2024-01-01T10:00:00.250000', 'chrome.exe')])
+        capture.db.execute_write("UPDATE screenshots SET timestamp = '2024-01-02T10:00:00' WHERE id = 1")
+
+        rows = capture.db.read("SELECT timestamp, ts FROM screenshots ORDER BY id")
+        assert [ts for _, ts in rows] == [round(datetime.fromisoformat(timestamp).timestamp() * 1000)
+                                          for timestamp, _ in rows]
+
+    @pytest.mark.unit
+    def test_existing_database_is_migrated(self, temp_dir, temp_db_path, monkeypatch):
+        """Test that text-timestamp rows are backfilled and the indexes move to ts."""
+        monkeypatch.chdir(temp_dir)
+        conn = sqlite3.connect(temp_db_path)
+        conn.execute('''
+            CREATE TABLE screenshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, application TEXT NOT NULL,
+                window_title TEXT, encrypted_data BLOB NOT NULL, file_hash TEXT NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX idx_timestamp ON screenshots(timestamp)")
+        conn.execute("CREATE INDEX idx_application ON screenshots(application)")
+        conn.commit()
+        conn.close()
+        self._insert(temp_db_path, [('2024-01-01T10:00:00', 'game.exe'), ('2024-01-01T11:00:00', 'game.exe')])
+
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0)
+        try:
+            capture.migrations.run_backfills()
+            assert capture.db.read("SELECT COUNT(*) FROM screenshots WHERE ts IS NULL") == [(0,)]
+            assert [row[0] for row in capture.get_screenshots(limit=10)] == [2, 1]
+            conn = sqlite3.connect(temp_db_path)
+            assert [row[2] for row in conn.execute("PRAGMA index_info(idx_timestamp)")] == ['ts']
+            assert [row[2] for row in conn.execute("PRAGMA index_info(idx_application)")] == ['application', 'ts']
+            conn.close()
+        finally:
+            capture.close()
+
+    @pytest.mark.unit
+    def test_recent_endpoint_pages(self):
+        """Test that GET /screenshots/recent passes the cursor through and rejects malformed ones."""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        try:
+            from routers import screenshot as screenshot_router
+        except ImportError as e:
+            pytest.skip(f"Screenshot router not available: {e}")
+        app = FastAPI()
+        app.include_router(screenshot_router.router, prefix="/screenshots")
+        client = TestClient(app)
+        page = {'screenshots': [(7, '2024-01-01T10:00:00', 'game.exe', 'Game', 'hash')], 'next_cursor': '1704103200000.7'}
+
+        with patch('routers.screenshot.get_screenshot_page', return_value=page) as mock_page:
+            response = client.get("/screenshots/recent?limit=1&cursor=1704103300000.9")
+        with patch('routers.screenshot.get_screenshot_page', side_effect=ValueError("bad cursor")):
+            invalid = client.get("/screenshots/recent?cursor=x")
+
+        assert response.status_code == 200
+        assert response.json()['next_cursor'] == '1704103200000.7'
+        mock_page.assert_called_once_with(limit=1, application=None, cursor='1704103300000.9')
+        assert invalid.status_code == 400
+
+
 class TestScreenshotModuleFunctions:
     """Test cases for module-level functions."""
     
     @pytest.mark.unit
     def test_start_screenshot_capture(self, temp_dir, temp_db_path):
         """Test starting screenshot capture via module function."""
-        with patch('backend.screenshot.Fernet'), \
-             patch('backend.screenshot.screenshot_capture') as mock_capture:
+        with patch('services.screenshot.Fernet'), \
+             patch('services.screenshot.screenshot_capture') as mock_capture:
             
             start_screenshot_capture(interval=45)
             
@@ -426,14 +1079,14 @@ class TestScreenshotModuleFunctions:
     @pytest.mark.unit
     def test_stop_screenshot_capture(self, temp_dir, temp_db_path):
         """Test stopping screenshot capture via module function."""
-        with patch('backend.screenshot.screenshot_capture') as mock_capture:
+        with patch('services.screenshot.screenshot_capture') as mock_capture:
             stop_screenshot_capture()
             mock_capture.stop_capture.assert_called_once()
     
     @pytest.mark.unit
     def test_get_recent_screenshots(self, temp_dir, temp_db_path):
         """Test getting recent screenshots via module function."""
-        with patch('backend.screenshot.screenshot_capture') as mock_capture:
+        with patch('services.screenshot.screenshot_capture') as mock_capture:
             mock_capture.get_screenshots.return_value = [('test', 'data')]
             
             result = get_recent_screenshots(limit=5, application='test.exe')
@@ -444,7 +1097,7 @@ class TestScreenshotModuleFunctions:
     @pytest.mark.unit
     def test_get_screenshot_by_id(self, temp_dir, temp_db_path):
         """Test getting screenshot by ID via module function."""
-        with patch('backend.screenshot.screenshot_capture') as mock_capture:
+        with patch('services.screenshot.screenshot_capture') as mock_capture:
             mock_capture.get_screenshot_data.return_value = b'image_data'
             
             result = get_screenshot_by_id(123)
@@ -455,7 +1108,7 @@ class TestScreenshotModuleFunctions:
     @pytest.mark.unit
     def test_get_screenshot_stats(self, temp_dir, temp_db_path):
         """Test getting screenshot stats via module function."""
-        with patch('backend.screenshot.screenshot_capture') as mock_capture:
+        with patch('services.screenshot.screenshot_capture') as mock_capture:
             mock_stats = {'total_screenshots': 10, 'applications': []}
             mock_capture.get_stats.return_value = mock_stats
             
@@ -464,46 +1117,38 @@ class TestScreenshotModuleFunctions:
             mock_capture.get_stats.assert_called_once()
             assert result == mock_stats
     
+    @pytest.fixture
+    def stored_capture(self, temp_dir, temp_db_path, monkeypatch, mock_screenshot_data):
+        """Install a real capture with one stored frame as the module-level instance."""
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=temp_db_path)
+        capture.save_screenshot(mock_screenshot_data['image_data'], mock_screenshot_data['window_info'])
+        with patch('services.screenshot.screenshot_capture', capture):
+            yield capture
+        capture.close()
+    
     @pytest.mark.unit
-    def test_delete_screenshot_success(self):
+    def test_delete_screenshot_success(self, stored_capture):
         """Test successful screenshot deletion."""
-        with patch('sqlite3.connect') as mock_connect:
-            mock_cursor = Mock()
-            mock_cursor.rowcount = 1
-            mock_cursor.execute = Mock()
-            mock_conn = Mock()
-            mock_conn.cursor.return_value = mock_cursor
-            mock_connect.return_value = mock_conn
-            
-            result = delete_screenshot(123)
-            
-            assert result is True
-            mock_cursor.execute.assert_called_once_with('DELETE FROM screenshots WHERE id = ?', (123,))
-            mock_conn.commit.assert_called_once()
-            mock_conn.close.assert_called_once()
+        result = delete_screenshot(1)
+        
+        assert result is True
+        assert stored_capture.get_screenshot_data(1) is None
+        assert stored_capture.get_stats()['total_screenshots'] == 0
     
     @pytest.mark.unit
-    def test_delete_screenshot_not_found(self):
+    def test_delete_screenshot_not_found(self, stored_capture):
         """Test deleting non-existent screenshot."""
-        with patch('sqlite3.connect') as mock_connect:
-            mock_cursor = Mock()
-            mock_cursor.rowcount = 0
-            mock_cursor.execute = Mock()
-            mock_conn = Mock()
-            mock_conn.cursor.return_value = mock_cursor
-            mock_connect.return_value = mock_conn
-            
-            result = delete_screenshot(999)
-            
-            assert result is False
-            mock_conn.commit.assert_called_once()
-            mock_conn.close.assert_called_once()
+        result = delete_screenshot(999)
+        
+        assert result is False
+        assert stored_capture.get_stats()['total_screenshots'] == 1
     
     @pytest.mark.unit
-    def test_delete_screenshot_error(self):
+    def test_delete_screenshot_error(self, stored_capture):
         """Test screenshot deletion with database error."""
-        with patch('sqlite3.connect', side_effect=Exception("DB Error")):
-            result = delete_screenshot(123)
+        with patch.object(stored_capture.db, 'write', side_effect=Exception("DB Error")):
+            result = delete_screenshot(1)
             
             assert result is False
 
@@ -514,8 +1159,8 @@ class TestScreenshotIntegration:
     @pytest.mark.integration
     def test_full_screenshot_workflow(self, temp_dir, temp_db_path, mock_screenshot_data):
         """Test complete screenshot capture and retrieval workflow."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()), \
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()), \
              patch.object(ScreenshotCapture, '_get_active_window_info', 
                          return_value=mock_screenshot_data['window_info']), \
              patch.object(ScreenshotCapture, '_capture_screenshot', 
@@ -556,8 +1201,8 @@ class TestScreenshotIntegration:
     @pytest.mark.integration
     def test_screenshot_capture_threading(self, temp_dir, temp_db_path):
         """Test screenshot capture in threading environment."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()), \
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()), \
              patch.object(ScreenshotCapture, '_get_active_window_info', 
                          return_value={'application': 'test.exe', 'window_title': 'Test', 'pid': 123}), \
              patch.object(ScreenshotCapture, '_capture_screenshot', 
@@ -585,8 +1230,8 @@ class TestScreenshotEdgeCases:
     @pytest.mark.unit
     def test_screenshot_capture_with_invalid_image_data(self, temp_dir, temp_db_path):
         """Test screenshot capture with invalid image data."""
-        with patch('backend.screenshot.Fernet'), \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet'), \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             capture = ScreenshotCapture(db_path=temp_db_path)
             window_info = {'application': 'test.exe', 'window_title': 'Test', 'pid': 123}
             
@@ -602,8 +1247,8 @@ class TestScreenshotEdgeCases:
     @pytest.mark.unit
     def test_concurrent_database_access(self, temp_dir, temp_db_path, mock_screenshot_data):
         """Test concurrent database access scenarios."""
-        with patch('backend.screenshot.Fernet') as mock_fernet, \
-             patch('backend.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
+        with patch('services.screenshot.Fernet') as mock_fernet, \
+             patch('services.screenshot.Fernet.generate_key', return_value=RealFernet.generate_key()):
             mock_cipher = Mock()
             mock_cipher.encrypt.return_value = b'encrypted_data'
             mock_fernet.return_value = mock_cipher
@@ -612,17 +1257,13 @@ class TestScreenshotEdgeCases:
             window_info = mock_screenshot_data['window_info']
             
             # Simulate concurrent saves
-            with patch('sqlite3.connect') as mock_connect:
-                mock_conn = Mock()
-                mock_cursor = Mock()
-                mock_conn.cursor.return_value = mock_cursor
-                mock_connect.return_value = mock_conn
-                
+            original_write = capture.db.write
+            with patch.object(capture.db, 'write', side_effect=original_write) as mock_write:
                 # First save should succeed
                 result1 = capture.save_screenshot(mock_screenshot_data['image_data'], window_info)
                 assert result1 is True
                 
                 # Second save with database lock should handle gracefully
-                mock_cursor.execute.side_effect = sqlite3.OperationalError("database is locked")
+                mock_write.side_effect = sqlite3.OperationalError("database is locked")
                 result2 = capture.save_screenshot(mock_screenshot_data['image_data'], window_info)
                 assert result2 is False
@@ -0,0 +1,248 @@
+"""
+Test suite for the screenshot database layer.
+
+This module tests the single-writer queue, group-committed batched
+writes, commit and rollback callbacks, the read-only connection pool,
+WAL/pragma setup and shutdown behaviour.
+"""
+
+import pytest
+import os
+import sys
+import time
+import sqlite3
+import threading
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from services.screenshot_db import ScreenshotDatabase, after_commit, after_rollback
+except ImportError as e:
+    pytest.skip(f"Screenshot database module not available: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def db(temp_db_path):
+    """Create a database with a simple table."""
+    database = ScreenshotDatabase(temp_db_path, read_pool_size=2)
+    database.execute_write("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)")
+    yield database
+    database.close()
+
+
+class TestScreenshotDatabase:
+    """Test cases for the ScreenshotDatabase class."""
+
+    @pytest.mark.unit
+    def test_wal_and_pragmas(self, db):
+        """Test that the database runs in WAL mode with the tuned pragmas."""
+        assert db.read_one("PRAGMA journal_mode")[0] == 'wal'
+        with db.reader() as conn:
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] < 0
+
+    @pytest.mark.unit
+    def test_concurrent_writes_are_serialized(self, db):
+        """Test that writes from many threads all land, without 'database is locked'."""
+        def insert_many(worker):
+            for i in range(25):
+                db.execute_write("INSERT INTO items (value) VALUES (?)", (f"{worker}-{i}",))
+
+        threads = [threading.Thread(target=insert_many, args=(w,)) for w in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert db.read_one("SELECT COUNT(*) FROM items")[0] == 200
+
+    @pytest.mark.unit
+    def test_write_function_is_one_transaction(self, db):
+        """Test that a failing write function rolls back all of its statements."""
+        def insert_then_fail(conn):
+            conn.execute("INSERT INTO items (value) VALUES ('partial')")
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            db.write(insert_then_fail)
+
+        assert db.read_one("SELECT COUNT(*) FROM items")[0] == 0
+
+    @pytest.mark.unit
+    def test_readers_are_read_only(self, db):
+        """Test that pooled reader connections reject writes."""
+        with pytest.raises(sqlite3.OperationalError):
+            with db.reader() as conn:
+                conn.execute("INSERT INTO items (value) VALUES ('x')")
+
+    @pytest.mark.unit
+    def test_reader_pool_is_bounded(self, db):
+        """Test that readers are reused instead of opened per query."""
+        for _ in range(10):
+            db.read("SELECT * FROM items")
+
+        assert db._reader_count == 1
+
+    @pytest.mark.unit
+    def test_close_flushes_queued_writes(self, temp_db_path):
+        """Test that close() waits for queued writes before closing."""
+        database = ScreenshotDatabase(temp_db_path)
+        database.execute_write("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)")
+        futures = [database.submit(lambda conn: conn.execute("INSERT INTO items (value) VALUES ('x')"))
+                   for _ in range(50)]
+
+        database.close()
+
+        assert all(future.done() for future in futures)
+        conn = sqlite3.connect(temp_db_path)
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 50
+        conn.close()
+        with pytest.raises(RuntimeError):
+            database.submit(lambda conn: None)
+
+
+def _hold_writer(db):
+    """Block the writer thread until the returned event is set, so later writes queue up."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def wait(conn):
+        started.set()
+        release.wait(5)
+
+    db.submit(wait)
+    started.wait(5)
+    return release
+
+
+def _insert(value):
+    return lambda conn: conn.execute("INSERT INTO items (value) VALUES (?)", (value,)).lastrowid
+
+
+class TestBatchedWrites:
+    """Test cases for group-committing batched writes."""
+
+    @pytest.mark.unit
+    def test_queued_writes_share_one_commit(self, db):
+        """Test that batched writes waiting on the writer are committed together, in order."""
+        release = _hold_writer(db)
+        futures = [db.submit(_insert(str(n)), batch=True) for n in range(10)]
+        commits = db.commits
+        release.set()
+
+        assert [future.result(timeout=5) for future in futures] == list(range(1, 11))
+        assert db.commits == commits + 2
+        assert db.stats()['largest_batch'] == 10
+        assert db.read("SELECT value FROM items ORDER BY id") == [(str(n),) for n in range(10)]
+
+    @pytest.mark.unit
+    def test_batch_size_and_unbatched_writes_end_a_batch(self, temp_db_path):
+        """Test that a batch closes at batch_size and before an unbatched write."""
+        database = ScreenshotDatabase(temp_db_path, batch_size=3)
+        try:
+            database.execute_write("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)")
+            release = _hold_writer(database)
+            futures = [database.submit(_insert(str(n)), batch=True) for n in range(4)]
+            futures.append(database.submit(_insert('alone')))
+            futures.append(database.submit(_insert('last'), batch=True))
+            commits = database.commits
+            release.set()
+
+            assert [future.result(timeout=5) for future in futures] == list(range(1, 7))
+            # The held write, batches of 3 and 1, the unbatched write, then a batch of 1
+            assert database.commits == commits + 5
+            assert database.largest_batch == 3
+        finally:
+            database.close()
+
+    @pytest.mark.unit
+    def test_failing_write_rolls_back_alone(self, db):
+        """Test that a failing batched write is undone without losing the rest of its batch."""
+        def insert_then_fail(conn):
+            conn.execute("INSERT INTO items (value) VALUES ('partial')")
+            raise ValueError("boom")
+
+        release = _hold_writer(db)
+        futures = [db.submit(_insert('a'), batch=True), db.submit(insert_then_fail, batch=True),
+                   db.submit(_insert('b'), batch=True)]
+        release.set()
+
+        assert futures[0].result(timeout=5) == 1
+        with pytest.raises(ValueError):
+            futures[1].result(timeout=5)
+        assert futures[2].result(timeout=5) is not None
+        assert db.read("SELECT value FROM items ORDER BY id") == [('a',), ('b',)]
+
+    @pytest.mark.unit
+    def test_window_gathers_later_writes(self, temp_db_path):
+        """Test that batch_ms keeps a batch open for writes submitted shortly after its first."""
+        database = ScreenshotDatabase(temp_db_path, batch_ms=500)
+        try:
+            database.execute_write("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)")
+            commits = database.commits
+            first = database.submit(_insert('first'), batch=True)
+            time.sleep(0.05)
+            second = database.submit(_insert('second'), batch=True)
+            database.submit(_insert('flush')).result(timeout=5)
+
+            assert (first.result(timeout=5), second.result(timeout=5)) == (1, 2)
+            assert database.commits == commits + 2
+        finally:
+            database.close()
+
+
+def _track(events, name, fail=False):
+    """A write that registers callbacks recording name's outcome (and raises if fail)."""
+    def write(conn):
+        conn.execute("INSERT INTO items (value) VALUES (?)", (name,))
+        after_commit(conn, lambda: events.append(('commit', name)))
+        after_rollback(conn, lambda: events.append(('rollback', name)))
+        if fail:
+            raise ValueError("boom")
+    return write
+
+
+class TestTransactionCallbacks:
+    """Test cases for after_commit and after_rollback."""
+
+    @pytest.mark.unit
+    def test_callbacks_follow_the_outcome(self, db):
+        """Test that only the callbacks matching a write's outcome run, before its future resolves."""
+        events = []
+        db.write(_track(events, 'a'))
+        assert events == [('commit', 'a')]
+        with pytest.raises(ValueError):
+            db.write(_track(events, 'b', fail=True))
+        assert events == [('commit', 'a'), ('rollback', 'b')]
+
+    @pytest.mark.unit
+    def test_savepoint_rollback_runs_only_its_own_callbacks(self, db):
+        """Test that a failing batched write's callbacks roll back alone, the rest commit together."""
+        events = []
+        release = _hold_writer(db)
+        futures = [db.submit(_track(events, name, fail=(name == 'b')), batch=True) for name in 'abc']
+        release.set()
+        for future in futures:
+            future.exception(timeout=5)
+
+        assert events == [('rollback', 'b'), ('commit', 'a'), ('commit', 'c')]
+
+    @pytest.mark.unit
+    def test_failed_callback_is_reported(self, db, capsys):
+        def write(conn):
+            after_commit(conn, lambda: 1 / 0)
+            return 'ok'
+
+        assert db.write(write) == 'ok'
+        assert 'commit callback' in capsys.readouterr().out
+
+    @pytest.mark.unit
+    def test_plain_connection_commits_right_away(self):
+        conn = sqlite3.connect(':memory:')
+        events = []
+        after_commit(conn, lambda: events.append('commit'))
+        after_rollback(conn, lambda: events.append('rollback'))
+        conn.close()
+        assert events == ['commit']
@@ -0,0 +1,159 @@
+"""
+Test suite for the materialized screenshot stats.
+
+This module tests that the trigger-maintained summary tables match a full
+recount after inserts, references, deletes and re-encryption, that an
+existing database is backfilled, and that get_stats never scans the
+screenshots table.
+"""
+
+import pytest
+import io
+import os
+import sys
+import sqlite3
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    from PIL import Image
+    from services import screenshot_summary
+    from services.screenshot import ScreenshotCapture
+except ImportError as e:
+    pytest.skip(f"Screenshot summary module not available: {e}", allow_module_level=True)
+
+SUMMARY_TABLES = ('screenshot_app_stats', 'screenshot_format_stats', 'blob_key_stats')
+
+
+@pytest.fixture
+def capture(temp_dir, temp_db_path, monkeypatch):
+    """A real capture with near-duplicate references, closed afterwards."""
+    monkeypatch.chdir(temp_dir)
+    capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0)
+    yield capture
+    capture.close()
+
+
+def _png(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _window(application):
+    return {'application': application, 'window_title': application, 'pid': 1}
+
+
+def _summaries(temp_db_path):
+    conn = sqlite3.connect(temp_db_path)
+    summaries = {table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall()) for table in SUMMARY_TABLES}
+    conn.close()
+    return summaries
+
+
+def _recounted(temp_db_path):
+    """The summaries rebuilt from scratch, on a copy so the real tables stay as the triggers left them."""
+    source = sqlite3.connect(temp_db_path)
+    copy = sqlite3.connect(':memory:')
+    source.backup(copy)
+    source.close()
+    screenshot_summary.rebuild(copy)
+    summaries = {table: sorted(copy.execute(f"SELECT * FROM {table}").fetchall()) for table in SUMMARY_TABLES}
+    copy.close()
+    return summaries
+
+
+class TestSummaryTriggers:
+    """Test cases for keeping the summaries exact as rows change."""
+
+    @pytest.mark.unit
+    def test_matches_recount_through_writes(self, capture, temp_db_path):
+        """Test inserts, references, heirs, deletes and re-encryption against a full recount."""
+        for color, application in [('red', 'game.exe'), ('red', 'game.exe'), ('blue', 'game.exe'),
+                                   ('green', 'chrome.exe'), ('white', 'chrome.exe')]:
+            capture.save_screenshot(_png(color), _window(application), frame_info={'encode_ms': 2.5})
+        assert _summaries(temp_db_path) == _recounted(temp_db_path)
+
+        stats = capture.get_stats()
+        assert stats['total_screenshots'] == 5
+        assert stats['deduplication']['referenced'] == 4
+        assert dict(stats['applications']) == {'game.exe': 3, 'chrome.exe': 2}
+
+        # The original is deleted and its oldest reference takes over its data
+        capture.delete_screenshot(1)
+        assert _summaries(temp_db_path) == _recounted(temp_db_path)
+        capture.delete_screenshots([4, 5])
+        assert _summaries(temp_db_path) == _recounted(temp_db_path)
+
+        capture.keyring.rotate()
+        capture.reencryption.run_once()
+        assert _summaries(temp_db_path) == _recounted(temp_db_path)
+
+        stats = capture.get_stats()
+        assert stats['applications'] == [('game.exe', 2)]
+        assert stats['blob_store']['blobs'] == 1
+        assert stats['encryption']['blobs_by_key'] == {'2': 1}
+
+    @pytest.mark.unit
+    def test_time_bounds_follow_deletes(self, capture):
+        """Test that deleting the oldest or newest frame of an application moves its bounds."""
+        for i in range(3):
+            capture.save_screenshot(_png('red'), _window('game.exe'))
+            capture.db.execute_write('UPDATE screenshots SET timestamp = ? WHERE id = ?',
+                                     (f'2024-01-01T10:0{i}:00', i + 1))
+        assert capture.get_stats()['date_range'] == ('2024-01-01T10:00:00', '2024-01-01T10:02:00')
+
+        capture.delete_screenshots([1, 3])
+
+        stats = capture.get_stats()
+        assert stats['date_range'] == ('2024-01-01T10:01:00', '2024-01-01T10:01:00')
+        assert stats['by_application'][0]['first_seen'] == stats['by_application'][0]['last_seen']
+
+        capture.delete_screenshot(2)
+        stats = capture.get_stats()
+        assert stats['applications'] == []
+        assert stats['date_range'] == (None, None)
+
+    @pytest.mark.unit
+    def test_existing_database_is_backfilled(self, temp_dir, temp_db_path, monkeypatch):
+        """Test that a database from before the summaries gets them filled on open."""
+        monkeypatch.chdir(temp_dir)
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, dedup_threshold=-1)
+        for color in ('red', 'blue'):
+            capture.save_screenshot(_png(color), _window('game.exe'))
+        capture.close()
+        conn = sqlite3.connect(temp_db_path)
+        for table in SUMMARY_TABLES:
+            conn.execute(f"DROP TABLE {table}")
+        for trigger in screenshot_summary.TRIGGERS:
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("PRAGMA user_version = 6")
+        conn.commit()
+        conn.close()
+
+        capture = ScreenshotCapture(db_path=temp_db_path, capture_workers=0, dedup_threshold=-1)
+        try:
+            assert capture.get_stats()['applications'] == [('game.exe', 2)]
+            assert _summaries(temp_db_path) == _recounted(temp_db_path)
+        finally:
+            capture.close()
+
+    @pytest.mark.unit
+    def test_stats_do_not_scan_screenshots(self, capture):
+        """Test that get_stats reads only the summary tables."""
+        capture.save_screenshot(_png('red'), _window('game.exe'))
+        statements = []
+
+        with capture.db.reader() as conn:
+            conn.set_trace_callback(statements.append)
+            try:
+                stats = capture._read_stats(conn.cursor())
+            finally:
+                conn.set_trace_callback(None)
+
+        assert stats['total_screenshots'] == 1
+        assert statements
+        assert not any('FROM screenshots' in statement or 'FROM blobs' in statement for statement in statements)
@@ -24,52 +24,59 @@ try:
         search_knowledge,
         get_game_stats,
         list_available_games,
-        vector_service
     )
 except ImportError as e:
     pytest.skip(f"Vector service module not available: {e}", allow_module_level=True)
 
 
+@pytest.fixture(autouse=True)
+def offline_backends(temp_dir, monkeypatch):
+    """Stand-ins for chromadb and sentence_transformers; the default vector_db dir lands in temp_dir."""
+    chromadb = Mock()
+    sentence_transformers = Mock()
+    monkeypatch.chdir(temp_dir)
+    with patch.dict(sys.modules, {'chromadb': chromadb, 'chromadb.config': chromadb.config,
+                                  'sentence_transformers': sentence_transformers}):
+        yield chromadb, sentence_transformers
+
+
 class TestVectorService:
     """Test cases for the VectorService class."""
     
     @pytest.mark.unit
-    def test_vector_service_init(self, temp_vector_db_dir):
+    def test_vector_service_init(self, temp_vector_db_dir, offline_backends):
         """Test VectorService initialization."""
-        with patch('chromadb.PersistentClient') as mock_chroma, \
-             patch('backend.vector_service.SentenceTransformer') as mock_transformer:
-            
-            service = VectorService(vector_db_dir=temp_vector_db_dir)
-            
-            assert service.vector_db_dir == temp_vector_db_dir
-            assert service.chroma_client is not None
-            assert service.embedding_model is not None
-            assert service.collections == {}
-            
-            mock_chroma.assert_called()
-            # Some environments may lazy-init; don't require a call
+        chromadb, sentence_transformers = offline_backends
+        
+        service = VectorService(vector_db_dir=temp_vector_db_dir)
+        
+        assert service.vector_db_dir == temp_vector_db_dir
+        assert service.chroma_client is chromadb.PersistentClient.return_value
+        assert service.embedding_model is sentence_transformers.SentenceTransformer.return_value
+        assert service.collections == {}
+        assert chromadb.PersistentClient.call_args.kwargs['path'] == temp_vector_db_dir
     
     @pytest.mark.unit
-    def test_vector_service_init_chroma_error(self, temp_vector_db_dir):
+    def test_vector_service_init_chroma_error(self, temp_vector_db_dir, offline_backends):
         """Test VectorService initialization with ChromaDB error."""
-        with patch('chromadb.PersistentClient', side_effect=Exception("Chroma error")), \
-             patch('sentence_transformers.SentenceTransformer'):
-            
-            service = VectorService(vector_db_dir=temp_vector_db_dir)
-            
-            assert service.chroma_client is None
-            assert service.embedding_model is not None
+        chromadb, _ = offline_backends
+        chromadb.PersistentClient.side_effect = Exception("Chroma error")
+        
+        service = VectorService(vector_db_dir=temp_vector_db_dir)
+        
+        assert service.chroma_client is None
+        assert service.embedding_model is not None
     
     @pytest.mark.unit
-    def test_vector_service_init_transformer_error(self, temp_vector_db_dir):
+    def test_vector_service_init_transformer_error(self, temp_vector_db_dir, offline_backends):
         """Test VectorService initialization with SentenceTransformer error."""
-        with patch('chromadb.PersistentClient'), \
-             patch('backend.vector_service.SentenceTransformer', side_effect=Exception("Transformer error")):
-            
-            service = VectorService(vector_db_dir=temp_vector_db_dir)
-            
-            assert service.chroma_client is not None
-            assert service.embedding_model is None
+        _, sentence_transformers = offline_backends
+        sentence_transformers.SentenceTransformer.side_effect = Exception("Transformer error")
+        
+        service = VectorService(vector_db_dir=temp_vector_db_dir)
+        
+        assert service.chroma_client is not None
+        assert service.embedding_model is None
     
     @pytest.mark.unit
     def test_get_or_create_collection_existing(self, mock_chroma_client, mock_chroma_collection):
@@ -212,7 +219,7 @@ class TestVectorService:
     @pytest.mark.unit
     def test_add_game_knowledge_success(self, mock_knowledge_data, mock_chroma_client, mock_chroma_collection, mock_embedding_model):
         """Test successful game knowledge addition."""
-        with patch('backend.vector_service.process_game_knowledge', return_value=mock_knowledge_data) as mock_process:
+        with patch('services.vector_service.process_game_knowledge', return_value=mock_knowledge_data) as mock_process:
             service = VectorService()
             service.chroma_client = mock_chroma_client
             service.embedding_model = mock_embedding_model
@@ -230,7 +237,7 @@ class TestVectorService:
     @pytest.mark.unit
     def test_add_game_knowledge_no_client(self, mock_knowledge_data):
         """Test adding game knowledge without ChromaDB client."""
-        with patch('backend.vector_service.process_game_knowledge', return_value=mock_knowledge_data):
+        with patch('services.vector_service.process_game_knowledge', return_value=mock_knowledge_data):
             service = VectorService()
             service.chroma_client = None
             
@@ -241,7 +248,7 @@ class TestVectorService:
     @pytest.mark.unit
     def test_add_game_knowledge_no_model(self, mock_knowledge_data, mock_chroma_client):
         """Test adding game knowledge without embedding model."""
-        with patch('backend.vector_service.process_game_knowledge', return_value=mock_knowledge_data):
+        with patch('services.vector_service.process_game_knowledge', return_value=mock_knowledge_data):
             service = VectorService()
             service.chroma_client = mock_chroma_client
             service.embedding_model = None
@@ -255,7 +262,7 @@ class TestVectorService:
         """Test adding game knowledge with empty knowledge data."""
         empty_knowledge = {'wiki': [], 'youtube': [], 'forum': []}
         
-        with patch('backend.vector_service.process_game_knowledge', return_value=empty_knowledge):
+        with patch('services.vector_service.process_game_knowledge', return_value=empty_knowledge):
             service = VectorService()
             service.chroma_client = mock_chroma_client
             service.embedding_model = mock_embedding_model
@@ -268,7 +275,7 @@ class TestVectorService:
     @pytest.mark.unit
     def test_add_game_knowledge_error(self, mock_knowledge_data):
         """Test adding game knowledge with error."""
-        with patch('backend.vector_service.process_game_knowledge', side_effect=Exception("Process error")):
+        with patch('services.vector_service.process_game_knowledge', side_effect=Exception("Process error")):
             service = VectorService()
             
             result = service.add_game_knowledge('test_game')
@@ -510,7 +517,9 @@ class TestVectorServiceModuleFunctions:
     @pytest.mark.unit
     def test_add_game_knowledge_function(self):
         """Test add_game_knowledge module function."""
-        with patch.object(vector_service, 'add_game_knowledge', return_value=True) as mock_add:
+        with patch('services.vector_service.get_vector_service') as get_service:
+            mock_add = get_service.return_value.add_game_knowledge
+            mock_add.return_value = True
             result = add_game_knowledge('test_game')
             
             assert result is True
@@ -519,7 +528,9 @@ class TestVectorServiceModuleFunctions:
     @pytest.mark.unit
     def test_search_knowledge_function(self, mock_vector_search_results):
         """Test search_knowledge module function."""
-        with patch.object(vector_service, 'search_knowledge', return_value=mock_vector_search_results) as mock_search:
+        with patch('services.vector_service.get_vector_service') as get_service:
+            mock_search = get_service.return_value.search_knowledge
+            mock_search.return_value = mock_vector_search_results
             result = search_knowledge('test_game', 'query', limit=3)
             
             assert result == mock_vector_search_results
@@ -530,7 +541,9 @@ class TestVectorServiceModuleFunctions:
         """Test get_game_stats module function."""
         mock_stats = {'wiki': 10, 'youtube': 5, 'forum': 15}
         
-        with patch.object(vector_service, 'get_game_stats', return_value=mock_stats) as mock_stats_func:
+        with patch('services.vector_service.get_vector_service') as get_service:
+            mock_stats_func = get_service.return_value.get_game_stats
+            mock_stats_func.return_value = mock_stats
             result = get_game_stats('test_game')
             
             assert result == mock_stats
@@ -541,7 +554,9 @@ class TestVectorServiceModuleFunctions:
         """Test list_available_games module function."""
         mock_games = ['minecraft', 'elden_ring', 'test_game']
         
-        with patch.object(vector_service, 'list_available_games', return_value=mock_games) as mock_list:
+        with patch('services.vector_service.get_vector_service') as get_service:
+            mock_list = get_service.return_value.list_available_games
+            mock_list.return_value = mock_games
             result = list_available_games()
             
             assert result == mock_games
@@ -554,7 +569,7 @@ class TestVectorServiceIntegration:
     @pytest.mark.integration
     def test_full_knowledge_workflow(self, mock_knowledge_data, mock_chroma_client, mock_embedding_model):
         """Test complete knowledge addition and search workflow."""
-        with patch('backend.vector_service.process_game_knowledge', return_value=mock_knowledge_data):
+        with patch('services.vector_service.process_game_knowledge', return_value=mock_knowledge_data):
             service = VectorService()
             service.chroma_client = mock_chroma_client
             service.embedding_model = mock_embedding_model
@@ -585,7 +600,7 @@ class TestVectorServiceIntegration:
     @pytest.mark.integration
     def test_knowledge_lifecycle(self, mock_knowledge_data, mock_chroma_client, mock_embedding_model):
         """Test complete knowledge lifecycle (add, search, delete)."""
-        with patch('backend.vector_service.process_game_knowledge', return_value=mock_knowledge_data):
+        with patch('services.vector_service.process_game_knowledge', return_value=mock_knowledge_data):
             service = VectorService()
             service.chroma_client = mock_chroma_client
             service.embedding_model = mock_embedding_model
@@ -657,7 +672,7 @@ class TestVectorServiceEdgeCases:
             'forum': [{'content': 'Valid content', 'title': 'Test'}]
         }
         
-        with patch('backend.vector_service.process_game_knowledge', return_value=malformed_knowledge):
+        with patch('services.vector_service.process_game_knowledge', return_value=malformed_knowledge):
             service = VectorService()
             service.chroma_client = mock_chroma_client
             service.embedding_model = mock_embedding_model